@@ -3,31 +3,17 @@ The api module contains a set of handy functions to invoke compilation,
 linking and assembling.
 """
 
+import importlib
 import io
 import logging
 import os
 import stat
 import xml
-from .lang.c import preprocess, c_to_ir, COptions
-from .lang.c3 import c3_to_ir
-from .lang.bf import bf_to_ir
-from .lang.fortran import fortran_to_ir
-from .lang.llvmir import llvm_to_ir
-from .lang.pascal import pascal_to_ir
-from .lang.ws import ws_to_ir
-from .lang.python import python_to_ir, ir_to_python
-from .wasm import wasm_to_ir, read_wasm
 from .irutils import verify_module
 from .utils.reporting import DummyReportGenerator, HtmlReportGenerator
-from .opt.transform import DeleteUnusedInstructionsPass
-from .opt.transform import RemoveAddZeroPass
-from .opt import CommonSubexpressionEliminationPass
-from .opt import ConstantFolder
-from .opt import LoadAfterStorePass
-from .opt import CleanPass
-from .opt.mem2reg import Mem2RegPromotor
-from .opt.cjmp import CJumpPass
-from .opt.tailcall import TailCallOptimization
+from .utils.cache import get_object_cache
+from .utils.timing import timed
+from .opt.pipelines import OPT_LEVELS, create_pass_manager, get_codegen_goal
 from .codegen import CodeGenerator
 from .binutils.linker import link
 from .binutils.archive import archive
@@ -68,6 +54,57 @@ __all__ = [
     "ws_to_ir",
 ]
 
+# The frontends are imported when they are first used, such that importing
+# this module is fast. These names can still be imported from this module:
+_frontend_names = {
+    "c_to_ir": ".lang.c",
+    "COptions": ".lang.c",
+    "c3_to_ir": ".lang.c3",
+    "fortran_to_ir": ".lang.fortran",
+    "llvm_to_ir": ".lang.llvmir",
+    "pascal_to_ir": ".lang.pascal",
+    "python_to_ir": ".lang.python",
+    "wasm_to_ir": ".wasm",
+    "read_wasm": ".wasm",
+}
+
+
+def __getattr__(name):
+    if name in _frontend_names:
+        module = importlib.import_module(_frontend_names[name], __package__)
+        return getattr(module, name)
+    raise AttributeError(
+        "module {} has no attribute {}".format(__name__, name)
+    )
+
+
+def preprocess(f, output_file, coptions=None):
+    """ Pre-process a file into the other file. """
+    from .lang.c import preprocess as c_preprocess
+
+    c_preprocess(f, output_file, coptions=coptions)
+
+
+def bf_to_ir(source, target):
+    """ Compile brainfuck source into ir code """
+    from .lang.bf import bf_to_ir as bf_to_ir_
+
+    return bf_to_ir_(source, target)
+
+
+def ws_to_ir(source):
+    """ Compile whitespace source """
+    from .lang.ws import ws_to_ir as ws_to_ir_
+
+    return ws_to_ir_(source)
+
+
+def ir_to_python(ir_modules, f, reporter=None):
+    """ Convert ir-code to python code """
+    from .lang.python import ir_to_python as ir_to_python_
+
+    return ir_to_python_(ir_modules, f, reporter=reporter)
+
 
 def get_reporter(reporter):
     if reporter is None:
@@ -91,9 +128,15 @@ def is_platform_supported():
     return get_current_arch() is not None
 
 
-def construct(buildfile, targets=()):
+def construct(buildfile, targets=(), jobs=1):
     """Construct the given buildfile.
 
+    Args:
+        buildfile: a filename or file like object with the build recipe.
+        targets: the targets to construct, the default target is used
+            when no targets are given.
+        jobs: the number of targets which can be constructed in parallel.
+
     Raise task error if something goes wrong.
     """
     # Ensure file:
@@ -111,7 +154,7 @@ def construct(buildfile, targets=()):
     if not project:
         raise TaskError("No project loaded")
 
-    runner = TaskRunner()
+    runner = TaskRunner(jobs=jobs)
     runner.run(project, list(targets))
 
 
@@ -181,9 +224,6 @@ def disasm(data, march):
     disassembler.disasm(data, ostream)
 
 
-OPT_LEVELS = ("0", "1", "2", "s")
-
-
 def optimize(ir_module, level=0, reporter=None):
     """Run a bag of tricks against the :doc:`ir-code<ir/index>`.
 
@@ -191,10 +231,11 @@ def optimize(ir_module, level=0, reporter=None):
 
     Args:
         ir_module (ppci.ir.Module): The ir module to optimize.
-        level: The optimization level, 0 is default. Can be 0,1,2 or s
+        level: The optimization level, 0 is default. Can be 0,1,2,3 or s
             0: No optimization
-            1: some optimization
+            1: some optimization, fast
             2: more optimization
+            3: aggressive optimization, which can make the code larger
             s: optimize for size
         reporter: Report detailed log to this reporter
     """
@@ -212,29 +253,15 @@ def optimize(ir_module, level=0, reporter=None):
     if level == "0":
         return
 
-    # TODO: differentiate between optimization levels!
+    # The optimization passes (bag of tricks) for this level:
+    pass_manager = create_pass_manager(level)
 
-    # Optimization passes (bag of tricks) run them three times:
-    opt_passes = [
-        Mem2RegPromotor(),
-        RemoveAddZeroPass(),
-        ConstantFolder(),
-        CommonSubexpressionEliminationPass(),
-        TailCallOptimization(),
-        LoadAfterStorePass(),
-        DeleteUnusedInstructionsPass(),
-        CleanPass(),
-    ] * 3
-
-    if level == "3":
-        opt_passes.append(CJumpPass())
-
-    # Run the passes over the module:
-    verify_module(ir_module)
-    for opt_pass in opt_passes:
-        opt_pass.run(ir_module)
-        # reporter.message('{} after {}:'.format(ir_module, opt_pass))
-        # reporter.dump_ir(ir_module)
+    # Run the passes over the module, the control flow graphs built
+    # to verify the module are reused by the passes:
+    analysis_manager = pass_manager.analysis_manager
+    verify_module(ir_module, analysis_manager=analysis_manager)
+    with timed("optimize"):
+        pass_manager.run(ir_module)
 
     if reporter:
         # Dump report:
@@ -331,6 +358,7 @@ def cc(
     opt_level=0,
     debug=False,
     reporter=None,
+    dependencies=None,
 ):
     """C compiler. compiles a single source file into an object file.
 
@@ -339,10 +367,15 @@ def cc(
         march: The architecture for which to compile
         coptions: options for the C frontend
         debug: Create debug info when set to True
+        dependencies: when given, a list to which the files included by
+            the source are appended
 
     Returns:
         an object file
 
+    When the ``PPCI_CACHE_DIR`` environment variable is set, compiled
+    objects are cached, see :mod:`ppci.utils.cache`.
+
     .. doctest::
 
         >>> import io
@@ -353,21 +386,87 @@ def cc(
         CodeObject of 20 bytes
 
     """
+    from .lang.c import CBuilder, CPreProcessor, CTokenPrinter, COptions
+
     if not reporter:  # pragma: no cover
         reporter = DummyReportGenerator()
 
     if not coptions:
         coptions = COptions()
 
-    ir_module = c_to_ir(source, march, coptions=coptions, reporter=reporter)
+    march = get_arch(march)
+    filename = getattr(source, "name", None)
+    cache = get_object_cache()
+    if cache:
+        # Key the result on the preprocessed source, this covers changes
+        # in included headers as well. When the object is not cached, the
+        # same tokens are compiled:
+        preprocessor = CPreProcessor(coptions)
+        with timed("preprocess"):
+            tokens = list(preprocessor.process_file(source, filename))
+        preprocessed = io.StringIO()
+        CTokenPrinter().dump(tokens, file=preprocessed)
+        key = cache.make_key(
+            "cc",
+            preprocessed.getvalue(),
+            sorted(coptions.settings.items()),
+            coptions.include_directories,
+            coptions.macros,
+            coptions.undefine_macros,
+            march.make_id_str(),
+            str(opt_level),
+            debug,
+        )
+        if dependencies is not None:
+            dependencies.extend(preprocessor.get_dependencies())
+        obj = cache.get(key, arch=march)
+        if obj:
+            reporter.message("Using cached object {}".format(key))
+            return obj
+        cbuilder = CBuilder(march.info, coptions)
+        ir_module = cbuilder.build_tokens(tokens, filename, reporter=reporter)
+    else:
+        cbuilder = CBuilder(march.info, coptions)
+        ir_module = cbuilder.build(source, filename, reporter=reporter)
+        if dependencies is not None:
+            dependencies.extend(cbuilder.preprocessor.get_dependencies())
     reporter.message("{} {}".format(ir_module, ir_module.stats()))
     reporter.dump_ir(ir_module)
     optimize(ir_module, level=opt_level, reporter=reporter)
-    return ir_to_object([ir_module], march, debug=debug, reporter=reporter)
+    obj = ir_to_object(
+        [ir_module],
+        march,
+        debug=debug,
+        reporter=reporter,
+        opt=get_codegen_goal(opt_level),
+    )
+    if cache:
+        cache.put(key, obj)
+    return obj
+
+
+def _buffer_source(source):
+    """Read a source completely into memory.
+
+    This allows to hash the source before compiling it. The name of the
+    original file is retained for diagnostics and debug info.
+    """
+    f = get_file(source)
+    buffered = io.StringIO(f.read())
+    if hasattr(f, "name"):
+        buffered.name = f.name
+    return buffered
+
+
+def _source_key(sources):
+    """ Create the part of a cache key which identifies the sources """
+    return [(getattr(s, "name", None), s.getvalue()) for s in sources]
 
 
 def wasmcompile(source: io.TextIOBase, march, opt_level=2, reporter=None):
     """ Webassembly compile """
+    from .wasm import wasm_to_ir, read_wasm
+
     march = get_arch(march)
 
     if not reporter:  # pragma: no cover
@@ -387,6 +486,8 @@ def wasmcompile(source: io.TextIOBase, march, opt_level=2, reporter=None):
 
 def llc(source, march):
     """ Compile llvm assembly source into machine code """
+    from .lang.llvmir import llvm_to_ir
+
     march = get_arch(march)
     ir_module = llvm_to_ir(source)
     return ir_to_object([ir_module], march)
@@ -423,21 +524,45 @@ def c3c(
         >>> print(obj)
         CodeObject of 4 bytes
     """
+    from .lang.c3 import c3_to_ir
+
     reporter = get_reporter(reporter)
     march = get_arch(march)
+
+    # The instructions of a cached object cannot be replayed into the
+    # outstream, so bypass the cache in that case:
+    cache = None if outstream else get_object_cache()
+    if cache:
+        sources = [_buffer_source(source) for source in sources]
+        includes = [_buffer_source(source) for source in includes]
+        key = cache.make_key(
+            "c3c",
+            _source_key(sources),
+            _source_key(includes),
+            march.make_id_str(),
+            str(opt_level),
+            debug,
+        )
+        obj = cache.get(key, arch=march)
+        if obj:
+            reporter.message("Using cached object {}".format(key))
+            return obj
+
     ir_module = c3_to_ir(sources, includes, march, reporter=reporter)
 
     optimize(ir_module, level=opt_level, reporter=reporter)
 
-    opt_cg = "size" if opt_level == "s" else "speed"
-    return ir_to_object(
+    obj = ir_to_object(
         [ir_module],
         march,
         debug=debug,
         reporter=reporter,
-        opt=opt_cg,
+        opt=get_codegen_goal(opt_level),
         outstream=outstream,
     )
+    if cache:
+        cache.put(key, obj)
+    return obj
 
 
 def pascal(sources, march, opt_level=0, reporter=None, debug=False):
@@ -450,12 +575,34 @@ def pascal(sources, march, opt_level=0, reporter=None, debug=False):
     Returns:
         An object file
     """
+    from .lang.pascal import pascal_to_ir
+
     march = get_arch(march)
     if not reporter:  # pragma: no cover
         reporter = DummyReportGenerator()
-    sources = [get_file(fn) for fn in sources]
+
+    cache = get_object_cache()
+    if cache:
+        sources = [_buffer_source(source) for source in sources]
+        key = cache.make_key(
+            "pascal",
+            _source_key(sources),
+            march.make_id_str(),
+            str(opt_level),
+            debug,
+        )
+        obj = cache.get(key, arch=march)
+        if obj:
+            reporter.message("Using cached object {}".format(key))
+            return obj
+    else:
+        sources = [get_file(fn) for fn in sources]
+
     ir_modules = pascal_to_ir(sources, march)
-    return ir_to_object(ir_modules, march, reporter=reporter, debug=debug)
+    obj = ir_to_object(ir_modules, march, reporter=reporter, debug=debug)
+    if cache:
+        cache.put(key, obj)
+    return obj
 
 
 def bfcompile(source, target, reporter=None):
@@ -477,6 +624,8 @@ def bfcompile(source, target, reporter=None):
         >>> print(obj) # doctest: +ELLIPSIS
         CodeObject of ... bytes
     """
+    from .lang.bf import bf_to_ir
+
     if not reporter:
         reporter = DummyReportGenerator()
     reporter.message("brainfuck compilation listings")
@@ -496,6 +645,8 @@ def pycompile(source, march, reporter=None):
     Note that the python code must be type annotated for this
     to work.
     """
+    from .lang.python import python_to_ir
+
     march = get_arch(march)
     ir_module = python_to_ir(source)
     return ir_to_object([ir_module], march)
@@ -503,6 +654,8 @@ def pycompile(source, march, reporter=None):
 
 def fortrancompile(sources, target, reporter=DummyReportGenerator()):
     """ Compile fortran code to target """
+    from .lang.fortran import fortran_to_ir
+
     # TODO!
     ir_modules = fortran_to_ir(sources[0])
     return ir_to_object(ir_modules, target, reporter=reporter)
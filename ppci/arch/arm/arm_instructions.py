@@ -8,7 +8,7 @@ from ..generic_instructions import RegisterUseDef, Global
 from ...utils.bitfun import encode_imm32
 from ...utils.tree import Tree
 from .registers import ArmRegister, Coreg, Coproc, RegisterSet, R11
-from .registers import R0, R1, R2
+from .registers import R0, R1, R2, PC
 from .arm_relocations import Imm24Relocation
 from .arm_relocations import LdrImm12Relocation, AdrImm12Relocation
 
@@ -940,6 +940,11 @@ def pattern_jmp(context, tree):
     context.emit(B(tgt.name, jumps=[tgt]))
 
 
+@arm_isa.pattern("stm", "IJMP(reg)", size=4)
+def pattern_ijmp(context, tree, c0):
+    context.emit(Mov2(PC, c0, NoShift(), jumps=tree.value))
+
+
 @arm_isa.pattern("reg", "REGI32", size=0, cycles=0, energy=0)
 @arm_isa.pattern("reg", "REGU32", size=0, cycles=0, energy=0)
 def pattern_reg32(context, tree):
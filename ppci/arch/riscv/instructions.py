@@ -699,6 +699,11 @@ def pattern_jmp(context, tree):
     context.emit(B(tgt.name, jumps=[tgt]))
 
 
+@isa.pattern("stm", "IJMP(reg)", size=4)
+def pattern_ijmp(context, tree, c0):
+    context.emit(Blr(R0, c0, 0, jumps=tree.value))
+
+
 @isa.pattern("stm", "MOVB(reg, reg)", size=40)
 def pattern_movb(context, tree, c0, c1):
     # Emit memcpy
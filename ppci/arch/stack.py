@@ -60,6 +60,9 @@ class Frame:
         self.constants = []
         self.literal_number = 0
 
+        # Tables of addresses for indirect jumps:
+        self.jump_tables = []
+
     def __repr__(self):
         return "Frame {}".format(self.name)
 
@@ -1,40 +1,38 @@
-""" Contains a list of instantiated targets. """
+""" Contains a list of instantiated targets.
 
+The target modules are large, so they are imported only when a target is
+used for the first time.
+"""
+
+import importlib
 from functools import lru_cache
-from .arm import ArmArch
-from .avr import AvrArch
-from .example import ExampleArch
-from .msp430 import Msp430Arch
-from .x86_64 import X86_64Arch
-from .m68k import M68kArch
-from .mcs6500 import Mcs6500Arch
-from .mips import MipsArch
-from .microblaze import MicroBlazeArch
-from .or1k import Or1kArch
-from .riscv import RiscvArch
-from .stm8 import Stm8Arch
-from .xtensa import XtensaArch
-
-
-target_classes = [
-    ArmArch,
-    AvrArch,
-    ExampleArch,
-    M68kArch,
-    Mcs6500Arch,
-    MicroBlazeArch,
-    MipsArch,
-    Msp430Arch,
-    Or1kArch,
-    RiscvArch,
-    Stm8Arch,
-    X86_64Arch,
-    XtensaArch,
-]
-
-
-target_class_map = {t.name: t for t in target_classes}
-target_names = tuple(sorted(target_class_map.keys()))
+
+
+# Map of target names to the module and class which implement the target:
+target_modules = {
+    "arm": ("arm", "ArmArch"),
+    "avr": ("avr", "AvrArch"),
+    "example": ("example", "ExampleArch"),
+    "m68k": ("m68k", "M68kArch"),
+    "mcs6500": ("mcs6500", "Mcs6500Arch"),
+    "microblaze": ("microblaze", "MicroBlazeArch"),
+    "mips": ("mips", "MipsArch"),
+    "msp430": ("msp430", "Msp430Arch"),
+    "or1k": ("or1k", "Or1kArch"),
+    "riscv": ("riscv", "RiscvArch"),
+    "stm8": ("stm8", "Stm8Arch"),
+    "x86_64": ("x86_64", "X86_64Arch"),
+    "xtensa": ("xtensa", "XtensaArch"),
+}
+
+target_names = tuple(sorted(target_modules.keys()))
+
+
+def get_target_class(name):
+    """ Import the module of the given target, and return the target class """
+    module_name, class_name = target_modules[name]
+    module = importlib.import_module("." + module_name, __package__)
+    return getattr(module, class_name)
 
 
 @lru_cache(maxsize=30)
@@ -43,5 +41,16 @@ def create_arch(name, options=None):
     given.
     """
     # Create the instance!
-    target = target_class_map[name](options=options)
+    target = get_target_class(name)(options=options)
     return target
+
+
+def __getattr__(name):
+    # The list of all target classes imports every target module:
+    if name == "target_classes":
+        return [get_target_class(n) for n in target_names]
+    elif name == "target_class_map":
+        return {n: get_target_class(n) for n in target_names}
+    raise AttributeError(
+        "module {} has no attribute {}".format(__name__, name)
+    )
@@ -1353,6 +1353,11 @@ def pattern_jmp(context, tree):
     context.emit(NearJump(tgt.name, jumps=[tgt]))
 
 
+@isa.pattern("stm", "IJMP(reg64)", size=3)
+def pattern_ijmp(context, tree, c0):
+    context.emit(Jmp(RmReg64(c0), jumps=tree.value))
+
+
 jump_opnames = {"<": Jl, ">": Jg, "==": Je, "!=": Jne, ">=": Jge, "<=": Jle}
 
 unsigned_jump_opnames = {
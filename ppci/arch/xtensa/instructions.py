@@ -557,6 +557,15 @@ class Callx0(XtensaCoreInstruction):
     syntax = Syntax(["call0", " ", s])
 
 
+class Jx(XtensaCoreInstruction):
+    """ Jump to the address in a register """
+
+    tokens = [RrrToken]
+    s = Operand("s", AddressRegister, read=True)
+    patterns = {"op2": 0, "op1": 0, "r": 0, "s": s, "t": 0xA, "op0": 0}
+    syntax = Syntax(["jx", " ", s])
+
+
 class J(XtensaCoreInstruction):
     """ Unconditional jump """
 
@@ -1362,6 +1371,11 @@ def pattern_jmp(context, tree):
     context.emit(J(tgt.name, jumps=[tgt]))
 
 
+@core_isa.pattern("stm", "IJMP(reg)")
+def pattern_ijmp(context, tree, c0):
+    context.emit(Jx(c0, jumps=tree.value))
+
+
 @core_isa.pattern("stm", "CJMPI32(reg, reg)")
 @core_isa.pattern("stm", "CJMPI8(reg, reg)")
 def pattern_cjmp_signed(context, tree, c0, c1):
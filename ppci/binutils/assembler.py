@@ -110,6 +110,7 @@ class BaseAssembler:
         self.parser.emit = self.emit
         self.lexer = AsmLexer()
         self.typ2nt = {}
+        self.pending_isas = []
 
         # Register basic types:
         self.typ2nt[int] = self.int_id
@@ -161,13 +162,23 @@ class BaseAssembler:
 
     # Functions to automate the adding of instructions to asm syntax:
     def gen_asm_parser(self, isa):
-        """ Generate assembly rules from isa """
-        # Generate rules for instructions that have a syntax:
-        for instruction in isa.instructions:
-            if instruction.syntax:
-                self.generate_syntax_rule(
-                    instruction, "instruction", instruction.syntax
-                )
+        """Generate assembly rules from isa.
+
+        Most uses of an architecture never parse assembly code, so the
+        rules are generated when the assembler is used for the first time.
+        """
+        self.pending_isas.append(isa)
+
+    def generate_pending_rules(self):
+        """ Generate the rules for the isas given to gen_asm_parser """
+        while self.pending_isas:
+            isa = self.pending_isas.pop(0)
+            # Generate rules for instructions that have a syntax:
+            for instruction in isa.instructions:
+                if instruction.syntax:
+                    self.generate_syntax_rule(
+                        instruction, "instruction", instruction.syntax
+                    )
         # self.parser.g.dump()
 
     def generate_syntax_rule(self, cls, nt, stx):
@@ -275,6 +286,7 @@ class BaseAssembler:
     # Top level interface:
     def parse_line(self, line):
         """ Parse line into assembly instructions """
+        self.generate_pending_rules()
         try:
             self.lexer.feed(line)
             self.parser.parse(self.lexer)
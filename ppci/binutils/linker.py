@@ -8,6 +8,7 @@ from .layout import Layout, Section, SectionData, SymbolDefinition, Align
 from .layout import get_layout
 from .debuginfo import SymbolIdAdjustingReplicator, DebugInfo
 from .archive import get_archive
+from ..utils.timing import timed
 
 
 def link(
@@ -67,15 +68,16 @@ def link(
     libraries = list(map(get_archive, libraries)) if libraries else []
 
     linker = Linker(march, reporter)
-    output_obj = linker.link(
-        objects,
-        layout=layout,
-        partial_link=partial_link,
-        debug=debug,
-        extra_symbols=extra_symbols,
-        libraries=libraries,
-        entry_symbol_name=entry,
-    )
+    with timed("link"):
+        output_obj = linker.link(
+            objects,
+            layout=layout,
+            partial_link=partial_link,
+            debug=debug,
+            extra_symbols=extra_symbols,
+            libraries=libraries,
+            entry_symbol_name=entry,
+        )
     return output_obj
 
 
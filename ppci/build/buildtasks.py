@@ -6,9 +6,12 @@ These task are wrappers around the functions provided in the buildfunctions
 module
 """
 
+import hashlib
+import json
+import os
 from .tasks import Task, TaskError, register_task
 from ..utils.reporting import HtmlReportGenerator, DummyReportGenerator
-from .. import api
+from .. import api, __version__
 from ..lang.tools.common import ParserException
 from ..common import CompilerError
 
@@ -45,12 +48,118 @@ class BuildTask(Task):
         api.construct(project)
 
 
+def file_digest(filename):
+    """ Calculate the sha256 hash of the contents of a file """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 class OutputtingTask(Task):
-    """ Base task for tasks that create an object file """
+    """Base task for tasks that create an output file.
+
+    Subclasses implement the build method and list their inputs in
+    input_files. Files which are only found during the build, such as
+    included headers, are added to dependencies by the build method.
+    After a successful build a stamp file is written next to the output,
+    containing the task arguments and the hashes of all these files. When
+    these have not changed since, the task is skipped.
+    """
+
+    def run(self):
+        if self.is_up_to_date():
+            self.logger.info('%s is up to date', self.output_filename)
+        else:
+            self.dependencies = []
+            self.build()
+            self.save_stamp()
+
+    def build(self):  # pragma: no cover
+        """ Implement this method to create the output """
+        raise NotImplementedError("Implement this abstract method!")
+
+    def input_files(self):
+        """ Get a list of all files the output is created from """
+        return []
+
+    @property
+    def output_filename(self):
+        return self.relpath(self.get_argument('output'))
+
+    @property
+    def stamp_filename(self):
+        return self.output_filename + '.stamp'
+
+    def load_stamp(self):
+        """ Load the stamp of the previous build, if any """
+        try:
+            with open(self.stamp_filename, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return
+
+    def save_stamp(self):
+        """ Record the arguments and inputs of this build """
+        sources = sorted(set(self.input_files()))
+        inputs = {}
+        for filename in sources + self.dependencies:
+            stat = os.stat(filename)
+            inputs[filename] = {
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'digest': file_digest(filename),
+            }
+        stamp = {
+            'version': __version__,
+            'task': self.name,
+            'arguments': self.arguments,
+            'sources': sources,
+            'inputs': inputs,
+        }
+        with open(self.stamp_filename, 'w') as f:
+            json.dump(stamp, f, indent=2, sort_keys=True)
+
+    def is_up_to_date(self):
+        """ Check if the output was created from the current inputs """
+        stamp = self.load_stamp()
+        if not stamp or not os.path.exists(self.output_filename):
+            return False
+
+        if stamp['version'] != __version__ or stamp['task'] != self.name:
+            return False
+
+        if stamp['arguments'] != self.arguments:
+            self.logger.debug('Arguments changed')
+            return False
+
+        # Files could have been added to or removed from the given file
+        # patterns:
+        if stamp.get('sources') != sorted(set(self.input_files())):
+            self.logger.debug('Input files changed')
+            return False
+
+        for filename, info in stamp['inputs'].items():
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                return False
+
+            # When file size and time are the same, assume the file did
+            # not change, otherwise compare the contents:
+            if stat.st_mtime == info['mtime'] and \
+                    stat.st_size == info['size']:
+                continue
+
+            if file_digest(filename) != info['digest']:
+                self.logger.debug('%s changed', filename)
+                return False
+        return True
 
     def store_object(self, obj):
         """ Store the object in the specified file """
-        output_filename = self.relpath(self.get_argument('output'))
+        output_filename = self.output_filename
         self.ensure_path(output_filename)
         with open(output_filename, 'wt', encoding='utf8') as output_file:
             obj.save(output_file)
@@ -61,7 +170,10 @@ class AssembleTask(OutputtingTask):
     """ Task that can runs the assembler over the source and enters the
         output into an object file """
 
-    def run(self):
+    def input_files(self):
+        return [self.relpath(self.get_argument('source'))]
+
+    def build(self):
         arch = self.get_argument('arch')
         source = self.relpath(self.get_argument('source'))
         if 'debug' in self.arguments:
@@ -85,7 +197,13 @@ class AssembleTask(OutputtingTask):
 @register_task
 class C3CompileTask(OutputtingTask):
     """ Task that compiles C3 source for some target into an object file """
-    def run(self):
+    def input_files(self):
+        filenames = self.open_file_set(self.arguments['sources'])
+        if 'includes' in self.arguments:
+            filenames.extend(self.open_file_set(self.arguments['includes']))
+        return filenames
+
+    def build(self):
         arch = self.get_argument('arch')
         sources = self.open_file_set(self.arguments['sources'])
         if 'includes' in self.arguments:
@@ -115,7 +233,12 @@ class C3CompileTask(OutputtingTask):
 @register_task
 class CCompileTask(OutputtingTask):
     """ Task that compiles C code for some target into an object file """
-    def run(self):
+    def input_files(self):
+        # The included headers are recorded as dependencies during the
+        # build:
+        return self.open_file_set(self.arguments['sources'])
+
+    def build(self):
         arch = self.get_argument('arch')
         sources = self.open_file_set(self.arguments['sources'])
         if 'includes' in self.arguments:
@@ -143,7 +266,8 @@ class CCompileTask(OutputtingTask):
                 with open(source, 'r') as f:
                     obj = api.cc(
                         f, arch, coptions=coptions, opt_level=opt,
-                        reporter=reporter, debug=debug)
+                        reporter=reporter, debug=debug,
+                        dependencies=self.dependencies)
                 objs.append(obj)
             obj = api.link(
                 objs, partial_link=True, reporter=reporter, debug=debug)
@@ -154,7 +278,10 @@ class CCompileTask(OutputtingTask):
 @register_task
 class PascalCompileTask(OutputtingTask):
     """ Task that compiles pascal code for some target into an object file """
-    def run(self):
+    def input_files(self):
+        return self.open_file_set(self.arguments['sources'])
+
+    def build(self):
         arch = self.get_argument('arch')
         sources = self.open_file_set(self.arguments['sources'])
 
@@ -180,7 +307,10 @@ class PascalCompileTask(OutputtingTask):
 @register_task
 class WasmCompileTask(OutputtingTask):
     """ Task that compiles a wasm module into an object file """
-    def run(self):
+    def input_files(self):
+        return self.open_file_set(self.arguments['source'])
+
+    def build(self):
         arch = self.get_argument('arch')
         source = self.open_file_set(self.arguments['source'])
         opt = int(self.get_argument('optimize', default='0'))
@@ -204,7 +334,13 @@ class WasmCompileTask(OutputtingTask):
 @register_task
 class LinkTask(OutputtingTask):
     """ Link together a collection of object files """
-    def run(self):
+    def input_files(self):
+        filenames = self.open_file_set(self.get_argument('objects'))
+        if 'layout' in self.arguments:
+            filenames.append(self.relpath(self.get_argument('layout')))
+        return filenames
+
+    def build(self):
         if 'layout' in self.arguments:
             layout = self.relpath(self.get_argument('layout'))
         else:
@@ -224,11 +360,14 @@ class LinkTask(OutputtingTask):
 
 
 @register_task
-class ObjCopyTask(Task):
+class ObjCopyTask(OutputtingTask):
     """ Binary move parts of object code. """
-    def run(self):
+    def input_files(self):
+        return [self.relpath(self.get_argument('objectfile'))]
+
+    def build(self):
         image_name = self.get_argument('imagename')
-        output_filename = self.relpath(self.get_argument('output'))
+        output_filename = self.output_filename
         object_filename = self.relpath(self.get_argument('objectfile'))
         fmt = self.get_argument('format')
 
@@ -3,10 +3,12 @@
     have dependencies and it can be determined if they need to be run.
 """
 
+import concurrent.futures
 import logging
 import re
 import os
 import glob
+from ..utils.timing import call_timed, current_timings, merge_timings
 
 
 task_map = {}
@@ -168,9 +170,14 @@ class Task:
 
 
 class TaskRunner:
-    """ Basic task runner that can run some tasks in sequence """
-    def __init__(self):
+    """Task runner that runs the targets of a project in dependency order.
+
+    When jobs is larger than one, targets whose dependencies are ready
+    are run at the same time in a pool of worker processes.
+    """
+    def __init__(self, jobs=1):
         self.logger = logging.getLogger('taskrunner')
+        self.jobs = jobs
 
     def get_task(self, name):
         """ Tries to load the task type """
@@ -206,19 +213,89 @@ class TaskRunner:
 
         # Lookup actual targets:
         target_list = [project.get_target(target_name)
-                       for target_name in target_list]
-        target_list.sort()
-
-        self.logger.info('Target sequence: {}'.format(target_list))
+                       for target_name in sorted(target_list)]
 
-        # Run tasks:
-        for target in target_list:
-            self.logger.info('Target {} Started'.format(target.name))
-            for tname, props in target.tasks:
-                for arg in props:
-                    props[arg] = project.expand_macros(props[arg])
-                task = self.get_task(tname)(target, props)
-                self.logger.info('Running {}'.format(task))
-                task.run()
-            self.logger.info('Target {} Ready'.format(target.name))
+        if self.jobs > 1:
+            self.run_parallel(project, target_list)
+        else:
+            for target in self.topological_order(target_list):
+                run_target(target, self.get_tasks(target))
         self.logger.info('All targets done!')
+
+    def get_tasks(self, target):
+        """ Resolve the task classes of the given target """
+        return [(self.get_task(tname), props) for tname, props in target.tasks]
+
+    @staticmethod
+    def ready_targets(target_list, done):
+        """ Get the targets of which all dependencies are done """
+        return [
+            target for target in target_list
+            if target.name not in done and target.dependencies <= done]
+
+    def topological_order(self, target_list):
+        """ Sort the targets, such that dependencies come first """
+        done = set()
+        order = []
+        while len(order) < len(target_list):
+            ready = self.ready_targets(target_list, done)
+            assert ready
+            order.extend(ready)
+            done.update(target.name for target in ready)
+        self.logger.info('Target sequence: {}'.format(order))
+        return order
+
+    def run_parallel(self, project, target_list):
+        """Run targets on a pool of worker processes.
+
+        A target is submitted as soon as all its dependencies are done. The
+        properties set by a target are passed on to the targets that depend
+        on it. When a target fails, no new targets are started.
+        """
+        self.logger.info('Running targets with %s jobs', self.jobs)
+        record = current_timings() is not None
+        done = set()
+        running = {}
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.jobs) as executor:
+            while len(done) < len(target_list):
+                # Submit all targets which are ready to run:
+                for target in self.ready_targets(target_list, done):
+                    if target.name not in running:
+                        future = executor.submit(
+                            call_timed, record, run_target, target,
+                            self.get_tasks(target))
+                        running[target.name] = future
+
+                finished, _ = concurrent.futures.wait(
+                    running.values(),
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for name, future in list(running.items()):
+                    if future in finished:
+                        del running[name]
+                        if future.exception():
+                            for other in running.values():
+                                other.cancel()
+                            raise future.exception()
+                        properties, timings = future.result()
+                        project.properties.update(properties)
+                        merge_timings(timings)
+                        done.add(name)
+
+
+def run_target(target, tasks):
+    """Run the given tasks of a target.
+
+    Returns the project properties, since tasks can change them.
+    """
+    logger = logging.getLogger('taskrunner')
+    project = target.project
+    logger.info('Target {} Started'.format(target.name))
+    for task_class, props in tasks:
+        for arg in props:
+            props[arg] = project.expand_macros(props[arg])
+        task = task_class(target, props)
+        logger.info('Running {}'.format(task))
+        task.run()
+    logger.info('Target {} Ready'.format(target.name))
+    return project.properties
@@ -2,7 +2,6 @@
 
 import argparse
 import logging
-import cgitb
 import platform
 import sys
 from .. import __version__
@@ -11,6 +10,7 @@ from ..build.tasks import TaskError
 from ..common import logformat, CompilerError
 from ..utils.reporting import HtmlReportGenerator, DummyReportGenerator
 from ..utils.reporting import TextReportGenerator
+from ..utils.timing import Timings
 
 
 version_text = "ppci {} on {} {} on {}".format(
@@ -67,6 +67,17 @@ base_parser.add_argument(
     help="Write a report into a text file",
     type=argparse.FileType("w"),
 )
+base_parser.add_argument(
+    "--timings",
+    choices=["text", "json"],
+    help="Report the time spent in each compilation phase and function",
+)
+base_parser.add_argument(
+    "--timings-file",
+    metavar="timings-file",
+    help="Write the timings into this file instead of to stderr",
+    type=argparse.FileType("w"),
+)
 base_parser.add_argument(
     "--verbose",
     "-v",
@@ -151,7 +162,10 @@ class LogSetup:
         self.args = args
         self.console_handler = None
         self.file_handler = None
+        self.timings = None
         self.logger = logging.getLogger()
+        import cgitb
+
         cgitb.enable(format="text")
 
         if args.drop_into_pudb:
@@ -188,9 +202,16 @@ class LogSetup:
         self.logger.debug("Reporting to %s", self.reporter)
         self.logger.debug("Loggers attached")
         self.logger.info(version_text)
+
+        if self.args.timings:
+            self.timings = Timings().__enter__()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        if self.timings:
+            self.timings.__exit__(exc_type, exc_value, traceback)
+            self.write_timings()
+
         if exc_type:
             self.reporter.dump_exception((exc_type, exc_value, traceback))
 
@@ -241,3 +262,14 @@ class LogSetup:
         # exit code when error:
         if err:
             sys.exit(1)
+
+    def write_timings(self):
+        """ Write the recorded timings in the requested format """
+        output = self.args.timings_file or sys.stderr
+        if self.args.timings == "json":
+            self.timings.dump_json(output)
+        else:
+            self.timings.print_table(output)
+
+        if self.args.timings_file:
+            self.args.timings_file.close()
@@ -17,6 +17,14 @@ parser.add_argument(
     help="use buildfile, otherwise build.xml is the default",
     default="build.xml",
 )
+parser.add_argument(
+    "-j",
+    "--jobs",
+    metavar="N",
+    type=int,
+    default=1,
+    help="Build up to N independent targets in parallel",
+)
 parser.add_argument("targets", metavar="target", nargs="*")
 
 
@@ -24,7 +32,7 @@ def build(args=None):
     """ Run the build command from command line. Used by ppci-build.py """
     args = parser.parse_args(args)
     with LogSetup(args):
-        api.construct(args.buildfile, args.targets)
+        api.construct(args.buildfile, args.targets, jobs=args.jobs)
 
 
 if __name__ == "__main__":
@@ -6,12 +6,21 @@ computer architectures.
 
 
 import argparse
+import io
+import os
+import sys
 from .base import base_parser, march_parser
-from .compile_base import compile_parser, do_compile
+from .compile_base import compile_parser, do_compile, run_jobs
+from .compile_base import generates_object, prepare_modules
+from .compile_base import generate_output, save_objects
 from .base import LogSetup, get_arch_from_args
 from .. import api
+from ..binutils.objectfile import ObjectFile
+from ..irutils import to_json, from_json
 from ..lang.c import create_ast, CAstPrinter
+from ..lang.c.builder import CBuilder
 from ..lang.c.options import COptions, coptions_parser
+from ..lang.c.preprocessor import CPreProcessor
 
 
 parser = argparse.ArgumentParser(
@@ -28,6 +37,29 @@ parser.add_argument(
     default=False,
     help="Instead of preprocessing, emit a makefile rule with dependencies",
 )
+parser.add_argument(
+    "-MM",
+    action="store_true",
+    default=False,
+    help="Like -M, but omit system headers",
+)
+parser.add_argument(
+    "-MD",
+    action="store_true",
+    default=False,
+    help="Write a makefile rule with dependencies while compiling",
+)
+parser.add_argument(
+    "-MMD",
+    action="store_true",
+    default=False,
+    help="Like -MD, but omit system headers",
+)
+parser.add_argument(
+    "-MF",
+    metavar="file",
+    help="Write the makefile rules to the given file",
+)
 parser.add_argument(
     "--ast",
     action="store_true",
@@ -37,6 +69,14 @@ parser.add_argument(
 parser.add_argument(
     "-c", action="store_true", default=False, help="Compile, but do not link"
 )
+parser.add_argument(
+    "-j",
+    "--jobs",
+    metavar="N",
+    type=int,
+    default=1,
+    help="Compile the sources using N parallel processes",
+)
 parser.add_argument(
     "sources",
     metavar="source",
@@ -59,10 +99,8 @@ def cc(args=None):
             with open(args.output, "w") as output:
                 for src in args.sources:
                     api.preprocess(src, output, coptions)
-        elif args.M:  # Emit a makefile dep line.
-            dependencies = []
-            for filename in dependencies:
-                print(filename)
+        elif args.M or args.MM:  # Emit a makefile dep line.
+            emit_dependencies(args, coptions)
         elif args.ast:
             with open(args.output, "w") as output:
                 printer = CAstPrinter(file=output)
@@ -73,17 +111,172 @@ def cc(args=None):
                         src, march.info, filename=filename, coptions=coptions
                     )
                     printer.print(ast)
+        elif args.jobs > 1:
+            compile_parallel(args, march, coptions, log_setup.reporter)
         else:
             ir_modules = []
-            
+            dependencies = []
+
             for src in args.sources:
                 # Compile and optimize in any case:
-                ir_module = api.c_to_ir(
-                    src, march, coptions=coptions, reporter=log_setup.reporter
+                ir_module, included = translate(
+                    src,
+                    march,
+                    coptions,
+                    reporter=log_setup.reporter,
+                    system=not args.MMD,
                 )
                 ir_modules.append(ir_module)
+                dependencies.append(included)
 
             do_compile(ir_modules, march, log_setup.reporter, log_setup.args)
+            save_dependencies(args, dependencies)
+
+
+def translate(src, march, coptions, reporter=None, system=True):
+    """Translate a C source into an ir-module.
+
+    Returns the ir-module and the files included by the source, which
+    are recorded while compiling.
+    """
+    filename = src.name if hasattr(src, "name") else None
+    cbuilder = CBuilder(march.info, coptions)
+    ir_module = cbuilder.build(src, filename, reporter=reporter)
+    dependencies = cbuilder.preprocessor.get_dependencies(system=system)
+    return ir_module, dependencies
+
+
+def emit_dependencies(args, coptions):
+    """ Preprocess the sources, and write a make rule for each source """
+    rules = []
+    for src in args.sources:
+        preprocessor = CPreProcessor(coptions)
+        for _ in preprocessor.process_file(src, src.name):
+            pass
+        target = os.path.splitext(os.path.basename(src.name))[0] + ".o"
+        dependencies = preprocessor.get_dependencies(system=not args.MM)
+        rules.append((target, [src.name] + dependencies))
+
+    if args.MF:
+        with open(args.MF, "w") as output:
+            write_make_rules(rules, output)
+    else:
+        write_make_rules(rules, sys.stdout)
+
+
+def save_dependencies(args, dependencies):
+    """Write the dependency file when compiling with -MD or -MMD.
+
+    The rule names the output file as target, and depends on all the
+    sources and the files they included.
+    """
+    if not (args.MD or args.MMD):
+        return
+
+    filenames = []
+    for src, included in zip(args.sources, dependencies):
+        for filename in [src.name] + included:
+            if filename not in filenames:
+                filenames.append(filename)
+
+    if args.MF:
+        depfile = args.MF
+    else:
+        depfile = os.path.splitext(args.output)[0] + ".d"
+
+    with open(depfile, "w") as output:
+        write_make_rules([(args.output, filenames)], output)
+
+
+def write_make_rules(rules, output):
+    """Write rules in a format suitable for inclusion in a makefile.
+
+    Long rules are split over multiple lines, as is done by gcc.
+    """
+    for target, dependencies in rules:
+        line = make_escape(target) + ":"
+        for dependency in dependencies:
+            dependency = make_escape(dependency)
+            if len(line) + len(dependency) > 75:
+                print(line + " \\", file=output)
+                line = ""
+            line += " " + dependency
+        print(line, file=output)
+
+
+def make_escape(filename):
+    """ Escape special characters in a filename for make """
+    filename = filename.replace("$", "$$").replace("#", "\\#")
+    return filename.replace(" ", "\\ ")
+
+
+def compile_parallel(args, march, coptions, reporter):
+    """Compile all sources using a pool of worker processes.
+
+    Each worker takes a translation unit through all compilation stages.
+    The results are transferred back in serialized form and merged in the
+    order of the sources, so the output equals that of a serial build.
+    """
+    object_output = generates_object(args)
+    units = [
+        (
+            src.name,
+            src.read(),
+            march.make_id_str(),
+            coptions,
+            args.O,
+            args.instrument_functions,
+            args.g,
+            object_output,
+            not args.MMD,
+        )
+        for src in args.sources
+    ]
+    results = run_jobs(compile_unit, units, jobs=args.jobs)
+    results, dependencies = zip(*results)
+
+    if object_output:
+        objs = [ObjectFile.load(io.StringIO(result)) for result in results]
+        save_objects(objs, args)
+    else:
+        ir_modules = [from_json(result) for result in results]
+        generate_output(ir_modules, march, reporter, args)
+    save_dependencies(args, dependencies)
+
+
+def compile_unit(unit):
+    """Compile a single translation unit, intended to run in a worker.
+
+    Returns the object file or the prepared ir-module as json text, together
+    with the files included by the unit.
+    """
+    (
+        filename,
+        text,
+        march,
+        coptions,
+        opt_level,
+        instrument,
+        debug,
+        obj,
+        system,
+    ) = unit
+    args = argparse.Namespace(O=opt_level, instrument_functions=instrument)
+    march = api.get_arch(march)
+    source = io.StringIO(text)
+    source.name = filename
+    ir_module, dependencies = translate(
+        source, march, coptions, system=system
+    )
+    prepare_modules([ir_module], None, args)
+
+    if obj:
+        output = io.StringIO()
+        api.ir_to_object([ir_module], march, debug=debug).save(output)
+        return output.getvalue(), dependencies
+    else:
+        return to_json(ir_module), dependencies
+
 
 if __name__ == "__main__":
     cc()
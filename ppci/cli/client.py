@@ -0,0 +1,126 @@
+""" Client for the ppci compile server.
+
+Run a ppci command line tool via a running ppci-server, for example:
+
+    $ ppci-client cc -m arm -c main.c -o main.oj
+
+The command is executed by the server, in the current directory and with
+the current environment. This avoids the startup cost of python and the
+construction of the target architectures on each invocation. When no
+server is running, the tool is run in this process instead.
+
+This module is kept small, and only imports the tool itself when no
+server is available.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import socket
+import sys
+import tempfile
+
+
+# Map of tool names to the function which implements the tool:
+tools = {
+    "archive": "ppci.cli.archive:archive",
+    "asm": "ppci.cli.asm:asm",
+    "build": "ppci.cli.build:build",
+    "c3c": "ppci.cli.c3c:c3c",
+    "cc": "ppci.cli.cc:cc",
+    "disasm": "ppci.cli.disasm:disasm",
+    "hexdump": "ppci.cli.hexdump:hexdump",
+    "ld": "ppci.cli.link:link",
+    "llc": "ppci.cli.llc:llc",
+    "objcopy": "ppci.cli.objcopy:objcopy",
+    "objdump": "ppci.cli.objdump:objdump",
+    "opt": "ppci.cli.opt:opt",
+    "pascal": "ppci.cli.pascal:pascal",
+    "wasmcompile": "ppci.cli.wasmcompile:wasmcompile",
+}
+
+
+parser = argparse.ArgumentParser(
+    description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+)
+parser.add_argument(
+    "--socket",
+    metavar="path",
+    help="The socket of the server, defaults to $PPCI_SERVER_SOCKET",
+)
+parser.add_argument("tool", choices=sorted(tools), help="The tool to run")
+parser.add_argument(
+    "arguments",
+    nargs=argparse.REMAINDER,
+    help="The arguments passed to the tool",
+)
+
+
+def default_socket_path():
+    """ Determine the socket on which the server listens by default """
+    path = os.environ.get("PPCI_SERVER_SOCKET")
+    if not path:
+        name = "ppci-server-{}.sock".format(os.getuid())
+        path = os.path.join(tempfile.gettempdir(), name)
+    return path
+
+
+def load_tool(name):
+    """ Import the function which implements the given tool """
+    module_name, function_name = tools[name].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def run_tool(name, arguments):
+    """Run the given tool in this process.
+
+    Returns the exit status of the tool.
+    """
+    try:
+        load_tool(name)(arguments)
+    except SystemExit as ex:
+        if ex.code is None:
+            return 0
+        elif isinstance(ex.code, int):
+            return ex.code
+        else:
+            print(ex.code, file=sys.stderr)
+            return 1
+    return 0
+
+
+def send_request(path, request):
+    """ Send a request to the server and wait for the response """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        with connection.makefile("rwb") as stream:
+            stream.write(json.dumps(request).encode("utf8") + b"\n")
+            stream.flush()
+            return json.loads(stream.readline().decode("utf8"))
+
+
+def client(args=None):
+    """ Run a tool via the compile server """
+    args = parser.parse_args(args)
+    request = {
+        "tool": args.tool,
+        "arguments": args.arguments,
+        "cwd": os.getcwd(),
+        "environment": dict(os.environ),
+    }
+
+    try:
+        path = args.socket or default_socket_path()
+        response = send_request(path, request)
+    except (AttributeError, OSError, ValueError):
+        # No (working) server, run the tool ourselves:
+        sys.exit(run_tool(args.tool, args.arguments))
+
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    sys.exit(response["status"])
+
+
+if __name__ == "__main__":
+    client()
@@ -3,12 +3,16 @@
 """
 
 import argparse
+import concurrent.futures
+import itertools
 import logging
 from .. import api, irutils
 from ..binutils.outstream import TextOutputStream
 from .base import out_parser
 from ..wasm import ir_to_wasm
 from ..irutils.instrument import add_tracer
+from ..opt.pipelines import get_codegen_goal
+from ..utils.timing import call_timed, current_timings, merge_timings
 
 
 compile_parser = argparse.ArgumentParser(add_help=False, parents=[out_parser])
@@ -49,6 +53,12 @@ compile_parser.add_argument(
 
 def do_compile(ir_modules, march, reporter, args):
     """ Handle the proper output action """
+    prepare_modules(ir_modules, reporter, args)
+    generate_output(ir_modules, march, reporter, args)
+
+
+def prepare_modules(ir_modules, reporter, args):
+    """ Optimize and instrument the ir-modules as requested by args """
 
     # Optimize:
     for ir_module in ir_modules:
@@ -59,6 +69,15 @@ def do_compile(ir_modules, march, reporter, args):
         for ir_module in ir_modules:
             add_tracer(ir_module)
 
+
+def generates_object(args):
+    """ Determine if the given arguments request object file output """
+    return not (args.ir or args.S or args.wasm or args.pycode)
+
+
+def generate_output(ir_modules, march, reporter, args):
+    """ Write the prepared ir-modules in the requested output format """
+
     # TODO: what to do with the -c option? Add it here?
 
     # Generate output of choice:
@@ -70,7 +89,13 @@ def do_compile(ir_modules, march, reporter, args):
         with open(args.output, "w") as output:
             stream = TextOutputStream(printer=march.asm_printer, f=output)
             for ir_module in ir_modules:
-                api.ir_to_stream(ir_module, march, stream, reporter=reporter)
+                api.ir_to_stream(
+                    ir_module,
+                    march,
+                    stream,
+                    reporter=reporter,
+                    opt=get_codegen_goal(args.O),
+                )
     elif args.wasm:  # Output web-assembly code
         assert len(ir_modules) == 1
         ir_module = ir_modules[0]
@@ -81,11 +106,60 @@ def do_compile(ir_modules, march, reporter, args):
         with open(args.output, "w") as output:
             api.ir_to_python(ir_modules, output, reporter=reporter)
     else:  # Full object output
-        obj = api.ir_to_object(
-            ir_modules, march, reporter=reporter, debug=args.g
-        )
-        with open(args.output, "w") as output:
-            obj.save(output)
+        # Generate an object per module, such that local symbols of
+        # different modules do not clash:
+        objs = [
+            api.ir_to_object(
+                [ir_module],
+                march,
+                reporter=reporter,
+                debug=args.g,
+                opt=get_codegen_goal(args.O),
+            )
+            for ir_module in ir_modules
+        ]
+        save_objects(objs, args)
+
+
+def save_objects(objs, args):
+    """ Merge objects in the given order and save them to the output """
+    if len(objs) == 1:
+        obj = objs[0]
+    else:
+        obj = api.link(objs, partial_link=True, debug=args.g)
+
+    with open(args.output, "w") as output:
+        obj.save(output)
+
+    # TODO: link objects together?
+    logging.warning("TODO: Linking with stdlibs")
+
+
+def run_jobs(function, items, jobs=1):
+    """Apply function to all items, using a pool of jobs processes.
+
+    The results are returned in the order of the items, regardless
+    of the order in which the worker processes finish. This keeps
+    the output of a parallel build identical to a serial build.
 
-        # TODO: link objects together?
-        logging.warning("TODO: Linking with stdlibs")
+    When timings are recorded, the timings of the workers are added to
+    them.
+    """
+    if jobs > 1 and len(items) > 1:
+        record = current_timings() is not None
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs
+        ) as executor:
+            results = list(
+                executor.map(
+                    call_timed,
+                    itertools.repeat(record),
+                    itertools.repeat(function),
+                    items,
+                )
+            )
+        for _, timings in results:
+            merge_timings(timings)
+        return [result for result, _ in results]
+    else:
+        return [function(item) for item in items]
@@ -7,7 +7,9 @@ from .. import api, irutils
 
 
 parser = argparse.ArgumentParser(description=__doc__, parents=[base_parser])
-parser.add_argument("-O", help="Optimization level", default=2, type=int)
+parser.add_argument(
+    "-O", help="Optimization level", default="2", choices=api.OPT_LEVELS
+)
 parser.add_argument("input", help="input file", type=argparse.FileType("r"))
 parser.add_argument("output", help="output file", type=argparse.FileType("w"))
 
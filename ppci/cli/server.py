@@ -0,0 +1,157 @@
+""" Compile server.
+
+Keeps the python interpreter, the imported modules and the target
+architectures warm, and runs the command line tools on behalf of
+ppci-client, on a local unix socket. Each request is handled in a
+forked copy of the server, such that requests run in parallel and
+do not influence each other.
+
+At startup, the runtime libraries and the instruction selection tables of
+the targets are created. Headers are not cached, they are preprocessed
+again for each compilation, since their meaning depends on the macros
+defined when they are included.
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import socketserver
+import sys
+import traceback
+from .base import base_parser, LogSetup
+from .client import default_socket_path, load_tool, run_tool, tools
+from ..arch.target_list import create_arch, target_names
+
+
+parser = argparse.ArgumentParser(description=__doc__, parents=[base_parser])
+parser.add_argument(
+    "--socket",
+    metavar="path",
+    help="The socket to listen on, defaults to $PPCI_SERVER_SOCKET",
+)
+parser.add_argument(
+    "--machine",
+    "-m",
+    dest="machines",
+    action="append",
+    choices=target_names,
+    help="Prepare this target architecture, defaults to all targets",
+)
+
+
+class CompileServer(
+    socketserver.ForkingMixIn, socketserver.UnixStreamServer
+):
+    """ A server which runs each request in a forked process """
+
+    logger = logging.getLogger("server")
+
+
+class CompileRequestHandler(socketserver.StreamRequestHandler):
+    """ Handle a single tool invocation """
+
+    def handle(self):
+        request = json.loads(self.rfile.readline().decode("utf8"))
+        self.server.logger.info(
+            "Running %s %s", request["tool"], " ".join(request["arguments"])
+        )
+        response = handle_request(request)
+        self.wfile.write(json.dumps(response).encode("utf8") + b"\n")
+
+
+def handle_request(request):
+    """Run a tool with the arguments, directory and environment of the
+    request.
+
+    This modifies the state of the process, so it must be called in a
+    forked process.
+    """
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["environment"])
+
+    # Use fresh logging, the tool configures its own:
+    logger = logging.getLogger()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    sys.argv = ["ppci-" + request["tool"]] + request["arguments"]
+    stdout, stderr = io.StringIO(), io.StringIO()
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        if request["tool"] in tools:
+            status = run_tool(request["tool"], request["arguments"])
+        else:
+            print("Unknown tool {}".format(request["tool"]), file=stderr)
+            status = 1
+    except Exception:
+        traceback.print_exc(file=stderr)
+        status = 1
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+
+    return {
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "status": status,
+    }
+
+
+def warm_up(machines):
+    """Prepare everything which can be shared between requests.
+
+    This imports all tools, and creates the target architectures, their
+    runtime libraries and instruction selection tables, such that a request
+    can use them right away.
+    """
+    for name in tools:
+        load_tool(name)
+
+    from .. import api
+
+    for machine in machines:
+        # The command line tools create architectures without options:
+        arch = create_arch(machine, options=())
+        try:
+            arch.runtime
+            # Create the instruction selection tables for both code
+            # generation goals:
+            for level in ("0", "s"):
+                api.cc(
+                    io.StringIO("int main() { return 0; }"),
+                    arch,
+                    opt_level=level,
+                )
+        except Exception as ex:
+            # Not all frontends work for all targets, this is fine.
+            CompileServer.logger.info(
+                "Could not prepare %s: %s", machine, ex
+            )
+
+
+def server(args=None):
+    """ Run the compile server """
+    args = parser.parse_args(args)
+    with LogSetup(args):
+        path = args.socket or default_socket_path()
+        machines = args.machines or target_names
+        warm_up(machines)
+
+        if os.path.exists(path):
+            os.remove(path)
+
+        compile_server = CompileServer(path, CompileRequestHandler)
+        compile_server.logger.info("Listening on %s", path)
+        try:
+            compile_server.serve_forever()
+        except KeyboardInterrupt:
+            compile_server.logger.info("Stopping")
+        finally:
+            compile_server.server_close()
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    server()
@@ -5,7 +5,8 @@ The architecture is provided when the generator is created.
 
 import logging
 from .. import ir
-from ..irutils import Verifier, split_block
+from ..irutils import Verifier, split_block, expand_jump_table
+from ..irutils.builder import is_dense
 from ..arch.arch import Architecture
 from ..arch.generic_instructions import Label, Comment, Global, DebugData
 from ..arch.generic_instructions import RegisterUseDef, VirtualInstruction
@@ -22,6 +23,15 @@ from .instructionselector import InstructionSelector1
 from .instructionscheduler import InstructionScheduler
 from .registerallocator import GraphColoringRegisterAllocator
 from .peephole import PeepHoleStream
+from ..utils.timing import timed
+
+
+# Data instructions for the address of a label per pointer size:
+LABEL_REFERENCES = {
+    (2, Endianness.LITTLE): data_instructions.Dw2,
+    (4, Endianness.LITTLE): data_instructions.Dcd2,
+    (8, Endianness.LITTLE): data_instructions.Dq2,
+}
 
 
 class CodeGenerator:
@@ -50,6 +60,14 @@ class CodeGenerator:
             arch, self.instruction_selector, reporter
         )
 
+        # Jump tables require an indirect jump instruction, and a table
+        # with addresses:
+        self.jump_tables = any(
+            pattern.tree.name == "IJMP" for pattern in arch.isa.patterns
+        ) and (arch.info.get_size(ir.ptr), arch.info.endianness) in (
+            LABEL_REFERENCES
+        )
+
     def generate(self, ircode: ir.Module, output_stream, debug=False):
         """ Generate machine code from ir-code into output stream """
         assert isinstance(ircode, ir.Module)
@@ -79,7 +97,8 @@ class CodeGenerator:
         # Each frame has a flat list of abstract instructions.
         output_stream.select_section("code")
         for function in ircode.functions:
-            self.generate_function(function, output_stream, debug=debug)
+            with timed("codegen", function=function.name):
+                self.generate_function(function, output_stream, debug=debug)
 
         # Output debug type data:
         if debug:
@@ -108,17 +127,7 @@ class CodeGenerator:
                     elif isinstance(part, tuple) and part[0] is ir.ptr:
                         # Emit reference to a label:
                         assert isinstance(part[1], str)
-                        labels_refs = {
-                            (2, Endianness.LITTLE): data_instructions.Dw2,
-                            (4, Endianness.LITTLE): data_instructions.Dcd2,
-                            (8, Endianness.LITTLE): data_instructions.Dq2,
-                        }
-                        key = (
-                            self.arch.info.get_size(part[0]),
-                            self.arch.info.endianness,
-                        )
-                        op_cls = labels_refs[key]
-                        output_stream.emit(op_cls(part[1]))
+                        output_stream.emit(self.make_address(part[1]))
                     else:
                         raise NotImplementedError(str(part))
             else:
@@ -131,6 +140,12 @@ class CodeGenerator:
             dv.address = label.name
             output_stream.emit(DebugData(dv))
 
+    def make_address(self, name):
+        """ Create data containing the address of a label """
+        key = (self.arch.info.get_size(ir.ptr), self.arch.info.endianness)
+        op_cls = LABEL_REFERENCES[key]
+        return op_cls(name)
+
     def generate_function(self, ir_function, output_stream, debug=False):
         """ Generate code for one function into a frame """
         self.logger.info(
@@ -157,6 +172,18 @@ class CodeGenerator:
                     block, pos=max_block_len, newname=newname
                 )
 
+        for jump_table in list(
+            ir_function.get_instructions_of_type(ir.JumpTable)
+        ):
+            if (
+                self.jump_tables
+                and jump_table.v.ty.is_integer
+                and is_dense(jump_table.table)
+            ):
+                self.prepare_jump_table(jump_table)
+            else:
+                expand_jump_table(jump_table)
+
         self._mark_global(output_stream, ir_function)
         output_stream.emit(SetSymbolType(ir_function.name, "func"))
 
@@ -167,12 +194,14 @@ class CodeGenerator:
         self.debug_db.map(ir_function, frame)
 
         # Select instructions and schedule them:
-        self.select_and_schedule(ir_function, frame)
+        with timed("selection"):
+            self.select_and_schedule(ir_function, frame)
 
         self.reporter.dump_frame(frame)
 
         # Do register allocation:
-        self.register_allocator.alloc_frame(frame)
+        with timed("register allocation"):
+            self.register_allocator.alloc_frame(frame)
 
         # TODO: Peep-hole here?
         # frame.instructions = [i for i in frame.instructions]
@@ -187,8 +216,9 @@ class CodeGenerator:
             [FunctionOutputStream(instruction_list.append), output_stream]
         )
         peep_hole_stream = PeepHoleStream(output_stream)
-        self.emit_frame_to_stream(frame, peep_hole_stream, debug=debug)
-        peep_hole_stream.flush()
+        with timed("emission"):
+            self.emit_frame_to_stream(frame, peep_hole_stream, debug=debug)
+            peep_hole_stream.flush()
 
         # Emit function debug info:
         if self.debug_db.contains(frame) and debug:
@@ -202,6 +232,58 @@ class CodeGenerator:
 
         self.reporter.dump_instructions(instruction_list, self.arch)
 
+    def prepare_jump_table(self, jump_table):
+        """Check that the value of a jump table is in range, and turn it
+        into an index into a table with an entry for each value in range.
+        """
+        block = jump_table.block
+        v, table = jump_table.v, jump_table.table
+        default = jump_table.lab_default
+        low = min(value for value, _ in table)
+        high = max(value for value, _ in table)
+        unsigned = {8: ir.u8, 16: ir.u16, 32: ir.u32, 64: ir.u64}[v.ty.bits]
+
+        # The phis of the targets get their value from the new blocks:
+        phis = {}
+        for target in set(jump_table.targets):
+            for phi in target.phis:
+                phis[phi] = phi.get_value(block)
+                phi.del_incoming(block)
+        block.remove_instruction(jump_table)
+        jump_table.delete()
+
+        # Values below the lowest value wrap around to large indices:
+        dispatch = ir.Block("{}_dispatch".format(block.name))
+        block.function.add_block(dispatch)
+        lowest = ir.Const(low, "lowest", v.ty)
+        index = ir.Binop(v, "-", lowest, "index", v.ty)
+        unsigned_index = ir.Cast(index, "index", unsigned)
+        limit = ir.Const(high - low, "limit", unsigned)
+        for instruction in [lowest, index, unsigned_index, limit]:
+            block.add_instruction(instruction)
+        block.add_instruction(
+            ir.CJump(unsigned_index, ">", limit, default, dispatch)
+        )
+
+        targets = dict(table)
+        offset = ir.Cast(unsigned_index, "offset", ir.ptr)
+        dispatch.add_instruction(offset)
+        dispatch.add_instruction(
+            ir.JumpTable(
+                offset,
+                [
+                    (value - low, targets.get(value, default))
+                    for value in range(low, high + 1)
+                ],
+                default,
+            )
+        )
+
+        for phi, value in phis.items():
+            for predecessor in phi.block.predecessors:
+                if predecessor not in phi.inputs:
+                    phi.set_incoming(predecessor, value)
+
     def select_and_schedule(self, ir_function, frame):
         """ Perform instruction selection and scheduling """
         self.logger.debug("Selecting instructions")
@@ -273,6 +355,13 @@ class CodeGenerator:
         # Postfix code, like register restore and stack adjust:
         output_stream.emit_all(self.arch.gen_epilogue(frame))
 
+        # The jump tables are placed after the code:
+        for label, targets in frame.jump_tables:
+            output_stream.emit(Alignment(self.arch.info.get_size(ir.ptr)))
+            output_stream.emit(Label(label))
+            for target in targets:
+                output_stream.emit(self.make_address(target.name))
+
         # Last but not least, emit debug infos:
         for dd in debug_data:
             output_stream.emit(dd)
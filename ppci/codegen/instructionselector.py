@@ -43,6 +43,9 @@ operations are listed in the below table:
 +---------------+---------+-----------------------------------------+
 | CJMP          | I,U     | Conditional jump to a label             |
 +---------------+---------+-----------------------------------------+
+| IJMP(c0)      |         | Jump to the address c0, which is one of |
+|               |         | the labels in the value of the node     |
++---------------+---------+-----------------------------------------+
 
 ...
 
@@ -56,6 +59,7 @@ Memory move operations:
 
 import abc
 import logging
+from functools import lru_cache
 from ..utils.tree import Tree
 from .treematcher import State
 from .. import ir
@@ -109,6 +113,7 @@ terminals = tuple(x + y for x in ops for y in data_types) + (
     "LABEL",
     "MOVB",  # Attempts at blob data copies
     "JMP",
+    "IJMP",  # Indirect jump, used for jump tables
     "EXIT",
     "ENTRY",
     "ALLOCA",
@@ -257,19 +262,28 @@ class InstructionSelector1:
         self.arch = arch
         self.reporter = reporter
         self.dag_splitter = DagSplitter(arch)
+        self.sys = self.create_burg_system(arch, tuple(weights))
+        self.tree_selector = TreeSelector(self.sys)
 
-        # Generate burm table of rules:
-        self.sys = BurgSystem()
+    @classmethod
+    @lru_cache(maxsize=30)
+    def create_burg_system(cls, arch, weights):
+        """Generate burm table of rules.
+
+        The rules only depend on the architecture and the weights, so the
+        table is created once, and shared by all instruction selectors.
+        """
+        system = BurgSystem()
 
         for terminal in terminals:
-            self.sys.add_terminal(terminal)
+            system.add_terminal(terminal)
 
         # Add special case nodes:
-        self.sys.add_rule("stm", Tree("CALL"), 0, None, self.call_function)
-        self.sys.add_rule("stm", Tree("ASM"), 0, None, self.inline_asm)
+        system.add_rule("stm", Tree("CALL"), 0, None, cls.call_function)
+        system.add_rule("stm", Tree("ASM"), 0, None, cls.inline_asm)
 
         # Add undefined value for register classes:
-        self._create_undefined_rules()
+        cls._create_undefined_rules(system, arch)
 
         # Add all isa patterns:
         for pattern in arch.isa.patterns:
@@ -278,7 +292,7 @@ class InstructionSelector1:
                 + pattern.cycles * weights[1]
                 + pattern.energy * weights[2]
             )
-            self.sys.add_rule(
+            system.add_rule(
                 pattern.non_term,
                 pattern.tree,
                 cost,
@@ -286,22 +300,24 @@ class InstructionSelector1:
                 pattern.method,
             )
 
-        self.sys.check()
-        self.tree_selector = TreeSelector(self.sys)
+        system.check()
+        return system
 
-    def _create_undefined_rules(self):
+    @classmethod
+    def _create_undefined_rules(cls, system, arch):
         """Create rules for undefined values based on register classes."""
         und_map = {}
-        for register_class in self.arch.info.register_classes:
+        for register_class in arch.info.register_classes:
             for ir_typ in register_class.ir_types:
                 if ir_typ in ir.value_types:
                     und_map[ir_typ] = (register_class.name, register_class.typ)
 
         for ir_typ, info in und_map.items():
             reg_class_name, reg_class = info
-            self._mk_undefined_rule(reg_class_name, reg_class, ir_typ)
+            cls._mk_undefined_rule(system, reg_class_name, reg_class, ir_typ)
 
-    def _mk_undefined_rule(self, reg_class_name, reg_class, ir_ty):
+    @staticmethod
+    def _mk_undefined_rule(system, reg_class_name, reg_class, ir_ty):
         """Create rule for undefined value.
 
         For example, create UNDU16 which defines
@@ -314,16 +330,19 @@ class InstructionSelector1:
             context.emit(RegisterUseDef(defs=(r,)))
             return r
 
-        self.sys.add_rule(
+        system.add_rule(
             reg_class_name, Tree("UND{}".format(suffix)), 0, None, und_pattern
         )
 
-    def call_function(self, context, tree):
+    @staticmethod
+    def call_function(context, tree):
         label, args, rv = tree.value
-        for instruction in self.arch.gen_call(context.frame, label, args, rv):
+        arch = context.arch
+        for instruction in arch.gen_call(context.frame, label, args, rv):
             context.emit(instruction)
 
-    def inline_asm(self, context, tree):
+    @staticmethod
+    def inline_asm(context, tree):
         """ Run assembler on inline assembly code. """
         template, output_registers, input_registers, clobbers = tree.value
         context.emit(
@@ -286,6 +286,38 @@ class SelectionGraphBuilder:
         self.chain(sgnode)
         self.debug_db.map(node, sgnode)
 
+    def do_jump_table(self, node):
+        """Load the address to jump to from a table, and jump to it.
+
+        The code generator has prepared the jump table, such that the
+        value is an index into the table which is known to be in range.
+        """
+        labels = [self.function_info.label_map[b] for _, b in node.table]
+        assert [value for value, _ in node.table] == list(range(len(labels)))
+        table_label = "{}_table".format(node.block.name)
+        self.function_info.frame.jump_tables.append((table_label, labels))
+
+        # Scale the index by the size of an address:
+        offset = self.get_value(node.v)
+        size = self.arch.info.get_size(ir.ptr)
+        while size > 1:
+            sgnode = self.new_node("ADD", ir.ptr, offset, offset)
+            offset = sgnode.new_output("offset")
+            size //= 2
+
+        table = self.new_node("LABEL", ir.ptr, value=table_label)
+        table = table.new_output("table")
+        sgnode = self.new_node("ADD", ir.ptr, table, offset)
+        sgnode = self.new_node("LDR", ir.ptr, sgnode.new_output("address"))
+        self.chain(sgnode)
+        target = sgnode.new_output("target")
+
+        # The jump can go to each label in the table:
+        targets = list(dict.fromkeys(labels))
+        sgnode = self.new_node("IJMP", None, target, value=targets)
+        self.chain(sgnode)
+        self.debug_db.map(node, sgnode)
+
     def do_exit(self, node):
         # Jump to epilog:
         sgnode = self.new_node("JMP", None)
@@ -114,7 +114,6 @@ The following class can be used to perform register allocation.
 """
 
 import logging
-from functools import lru_cache
 from .flowgraph import FlowGraph
 from .interferencegraph import InterferenceGraph
 from ..arch.arch import Architecture, Frame
@@ -224,6 +223,10 @@ class GraphColoringRegisterAllocator:
             self.K[kls] = len(regs)
             self.cls_regs[kls] = OrderedSet(regs)
 
+        # Cache of the q function. An lru_cache on the method would keep
+        # each allocator, and its last frame, alive forever:
+        self._q_cache = {}
+
     def alloc_frame(self, frame: Frame):
         """Do iterated register allocation for a single frame.
 
@@ -387,9 +390,10 @@ class GraphColoringRegisterAllocator:
 
         return False
 
-    @lru_cache(maxsize=None)
     def q(self, B, C) -> int:
         """ The number of class B registers that can be blocked by class C. """
+        if (B, C) in self._q_cache:
+            return self._q_cache[(B, C)]
         assert issubclass(B, Register)
         assert issubclass(C, Register)
         B_regs = self.cls_regs[B]
@@ -399,6 +403,7 @@ class GraphColoringRegisterAllocator:
             self.logger.debug(
                 "Class %s register can block max %s class %s register", C, x, B
             )
+        self._q_cache[(B, C)] = x
         return x
 
     def is_colorable(self, node) -> bool:
@@ -614,7 +619,6 @@ class GraphColoringRegisterAllocator:
             self.freeze_worklist.remove(u)
             self.spill_worklist.add(u)
 
-    @lru_cache(maxsize=None)
     def common_reg_class(self, u, v):
         """ Determine the smallest common register class of two nodes """
         if issubclass(u, v):
@@ -2,33 +2,71 @@
 
 """
 
-from .digraph import DiGraph, DiNode
+from .digraph import DiGraph, DiNode, strongly_connected_components
 from .. import ir
 
 
 class CallGraph(DiGraph):
-    pass
+    """ A graph with an edge from each routine to the routines it calls """
+
+    def __init__(self):
+        super().__init__()
+        self.node_map = {}
+
+    def add_routine(self, routine):
+        """ Add a node for the given routine """
+        node = CallGraphNode(self, routine)
+        self.node_map[routine] = node
+        return node
+
+    def get_node(self, routine):
+        """ Get the node of the given routine """
+        return self.node_map[routine]
+
+    def bottom_up(self):
+        """Get the strongly connected components of this graph, as lists
+        of routines.
+
+        A component comes after all components which it calls, so callees
+        are visited before their callers. Routines which call each other
+        recursively are in the same component.
+        """
+        return [
+            [node.routine for node in component]
+            for component in strongly_connected_components(self.nodes)
+        ]
+
+
+class CallGraphNode(DiNode):
+    """ A node in the call graph, referring to a routine """
+
+    def __init__(self, graph, routine):
+        super().__init__(graph)
+        self.routine = routine
 
 
 def mod_to_call_graph(ir_module) -> CallGraph:
-    """ Create a call graph for an ir-module """
+    """Create a call graph for an ir-module.
+
+    Calls via a function pointer are not part of the call graph.
+    """
     cg = CallGraph()
 
     # Create call graph nodes:
-    node_map = {}
     for routine in ir_module.functions:
-        node_map[routine] = DiNode(cg)
+        cg.add_routine(routine)
     for routine in ir_module.externals:
         if isinstance(routine, ir.ExternalSubRoutine):
-            node_map[routine] = DiNode(cg)
+            cg.add_routine(routine)
 
     # Add call graph edges:
     for routine in ir_module.functions:
-        n1 = node_map[routine]
+        n1 = cg.get_node(routine)
         for instruction in routine.get_instructions():
             if isinstance(instruction, (ir.FunctionCall, ir.ProcedureCall)):
                 routine2 = instruction.callee
-                n2 = node_map[routine2]
-                cg.add_edge(n1, n2)
+                if routine2 in cg.node_map:
+                    n2 = cg.get_node(routine2)
+                    cg.add_edge(n1, n2)
 
     return cg
@@ -306,24 +306,22 @@ class ControlFlowGraph(DiGraph):
 
     def calculate_loops(self):
         """ Calculate loops by use of the dominator info """
-        if self._reach is None:
-            self.calculate_reach()
-
         loops = []
         for node in self.nodes:
             for header in self.successors(node):
                 if header.dominates(node):
                     # Back edge!
-                    # Determine the other nodes in the loop:
-                    loop_nodes = [
-                        ln
-                        for ln in self._reach[header]
-                        if (
-                            header.dominates(ln)
-                            and ln.can_reach(header)
-                            and ln is not header
-                        )
-                    ]
+                    # The other nodes in the loop are the nodes which can
+                    # reach the back edge without passing the header:
+                    loop_nodes = []
+                    seen = {header}
+                    worklist = [node]
+                    while worklist:
+                        ln = worklist.pop()
+                        if ln not in seen:
+                            seen.add(ln)
+                            loop_nodes.append(ln)
+                            worklist.extend(self.predecessors(ln))
                     loop = Loop(header=header, rest=loop_nodes)
                     loops.append(loop)
         return loops
@@ -101,3 +101,50 @@ def dfs(start_node, reverse=False):
             else:
                 for successor in node.successors:
                     worklist.append((node, successor))
+
+
+def strongly_connected_components(nodes):
+    """Find the strongly connected components, using Tarjan's algorithm.
+
+    Returns a list of components, each a list of nodes. A component comes
+    after all components it has an edge towards.
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        worklist = [(root, iter(root.successors))]
+        while worklist:
+            node, successors = worklist[-1]
+            for successor in successors:
+                if successor not in index:
+                    index[successor] = lowlink[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    worklist.append((successor, iter(successor.successors)))
+                    break
+                elif successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                worklist.pop()
+                if worklist:
+                    parent = worklist[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    components.append(component)
+    return components
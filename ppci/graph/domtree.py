@@ -10,8 +10,7 @@ class CfgInfo:
         self.function = function
         self.cfg, self._block_map = ir_function_to_graph(function)
         self._node_map = {n: b for b, n in self._block_map.items()}
-
-        self._calculate_df()
+        self._df = None
 
     def __repr__(self):
         return "CfgInfo(function={})".format(self.function)
@@ -25,9 +24,16 @@ class CfgInfo:
     def has_block(self, node):
         return node in self._node_map
 
+    @property
+    def df(self):
+        """ The dominance frontier of each block """
+        if self._df is None:
+            self._calculate_df()
+        return self._df
+
     def _calculate_df(self):
         self.cfg.calculate_dominance_frontier()
-        self.df = {
+        self._df = {
             self._node_map[n]: set(
                 self.get_block(o) for o in m if self.has_block(o)
             )
@@ -55,7 +55,10 @@ class LengauerTarjan:
 
             # Determine semi dominator for n:
             s = p
-            for v in n.predecessors:
+            for v in self.predecessors(n):
+                if v not in self.dfnum:
+                    # Not reachable from the entry
+                    continue
                 if self.dfnum[v] <= self.dfnum[n]:
                     s2 = v
                 else:
@@ -87,9 +90,16 @@ class LengauerTarjan:
                 assert n in idom
         return idom
 
+    def predecessors(self, node):
+        """ Get the predecessors of a node, or its successors in reverse """
+        if self._reverse:
+            return node.successors
+        else:
+            return node.predecessors
+
     def dfs(self, start_node):
         """ Depth first search nodes """
-        for dfnum, pair in enumerate(dfs(start_node)):
+        for dfnum, pair in enumerate(dfs(start_node, reverse=self._reverse)):
             parent, node = pair
             assert node not in self.dfnum
             self.dfnum[node] = dfnum
@@ -192,6 +192,24 @@ class Module:
         self._functions.append(function)
         function.module = self
 
+    def remove_function(self, function):
+        """ Remove a function from this module.
+
+        The instructions of the function stop using other values, so the
+        functions it called are no longer used by it.
+        """
+        for block in function:
+            for instruction in block:
+                for value in list(instruction.uses):
+                    instruction.del_use(value)
+        self._functions.remove(function)
+        function.module = None
+
+    def remove_variable(self, variable):
+        """ Remove a variable from this module """
+        self._variables.remove(variable)
+        variable.module = None
+
     def add_variable(self, variable):
         """ Add a variable to this module """
         assert isinstance(variable, Variable)
@@ -686,9 +704,7 @@ def value_use(name):
             raise TypeError(
                 "Expecting a Value instance, but got {}".format(value)
             )
-        # If value was already set, remove usage
-        if name in self._var_map:
-            self.del_use(self._var_map[name])
+        old = self._var_map.get(name, None)
 
         # Place the value in the var map:
         self._var_map[name] = value
@@ -696,6 +712,10 @@ def value_use(name):
         # Add usage:
         self.add_use(value)
 
+        # If a value was already set, remove its usage:
+        if old is not None:
+            self.drop_use(old)
+
     return property(getter, setter)
 
 
@@ -726,6 +746,17 @@ class Instruction:
         self.uses.remove(v)
         v.del_user(self)
 
+    def drop_use(self, value):
+        """ Delete the usage of a value, unless the value is still used
+        in another place of this instruction.
+        """
+        if value in self.uses and not self.references(value):
+            self.del_use(value)
+
+    def references(self, value):
+        """ Check if this instruction refers to the given value """
+        return any(v is value for v in self._var_map.values())
+
     def delete(self):
         for use in list(self.uses):
             self.del_use(use)
@@ -741,13 +772,11 @@ class Instruction:
         """ replace value usage 'old' with new value, updating the def-use
             information.
         """
-        # TODO: update reference
-        # assert old in self._var_map.values()
         for name in self._var_map:
             if self._var_map[name] is old:
-                self.del_use(old)
                 self._var_map[name] = new
-                self.add_use(new)
+        self.add_use(new)
+        self.drop_use(old)
 
     def remove_from_block(self):
         for use in list(self.uses):
@@ -892,12 +921,13 @@ class FunctionCall(LocalValue):
             self.add_use(arg)
 
     def replace_use(self, old, new):
+        self.arguments[:] = [new if a is old else a for a in self.arguments]
         super().replace_use(old, new)
-        if old in self.arguments:
-            idx = self.arguments.index(old)
-            self.del_use(old)
-            self.arguments[idx] = new
-            self.add_use(new)
+
+    def references(self, value):
+        return super().references(value) or any(
+            a is value for a in self.arguments
+        )
 
     def __str__(self):
         args = ", ".join(arg.name for arg in self.arguments)
@@ -927,12 +957,13 @@ class ProcedureCall(Instruction):
             self.add_use(arg)
 
     def replace_use(self, old, new):
+        self.arguments[:] = [new if a is old else a for a in self.arguments]
         super().replace_use(old, new)
-        if old in self.arguments:
-            idx = self.arguments.index(old)
-            self.del_use(old)
-            self.arguments[idx] = new
-            self.add_use(new)
+
+    def references(self, value):
+        return super().references(value) or any(
+            a is value for a in self.arguments
+        )
 
     def __str__(self):
         args = ", ".join(arg.name for arg in self.arguments)
@@ -1036,10 +1067,13 @@ class Phi(LocalValue):
         """ Replace old value reference by new value reference """
         assert old in self.inputs.values()
         for inp in self.inputs:
-            if self.inputs[inp] == old:
-                self.del_use(old)
+            if self.inputs[inp] is old:
                 self.inputs[inp] = new
-                self.add_use(new)
+        self.add_use(new)
+        self.drop_use(old)
+
+    def references(self, value):
+        return any(v is value for v in self.inputs.values())
 
     def set_incoming(self, block, value):
         """ Set the value for the phi node when entering through block """
@@ -1049,10 +1083,11 @@ class Phi(LocalValue):
                     value.ty, self.ty
                 )
             )
-        if block in self.inputs:
-            self.del_use(self.inputs[block])
+        old = self.inputs.get(block, None)
         self.inputs[block] = value
         self.add_use(value)
+        if old is not None:
+            self.drop_use(old)
 
     def get_value(self, block):
         """ Get the value for the incoming branch """
@@ -1061,7 +1096,7 @@ class Phi(LocalValue):
     def del_incoming(self, block):
         """ Remove incoming branch from this phi node and delete the usage """
         value = self.inputs.pop(block)
-        self.del_use(value)
+        self.drop_use(value)
 
 
 class Alloc(LocalValue):
@@ -1230,12 +1265,15 @@ class InlineAsm(Instruction):
         self.add_use(value)
 
     def replace_use(self, old, new):
+        self.input_values[:] = [
+            new if v is old else v for v in self.input_values
+        ]
         super().replace_use(old, new)
-        if old in self.input_values:
-            idx = self.input_values.index(old)
-            self.del_use(old)
-            self.input_values[idx] = new
-            self.add_use(new)
+
+    def references(self, value):
+        return super().references(value) or any(
+            v is value for v in self.input_values + self.output_values
+        )
 
     def __str__(self):
         return 'asm ({})'.format(self.template)
@@ -1328,7 +1366,9 @@ class JumpBase(FinalInstruction):
         """ Clear references """
         while self._block_map:
             _, block = self._block_map.popitem()
-            block.references.remove(self)
+            # A block can be the target more than once:
+            if block not in self._block_map.values():
+                block.references.remove(self)
 
     @property
     def targets(self):
@@ -1387,7 +1427,12 @@ class CJump(JumpBase):
 class JumpTable(JumpBase):
     """ Jump table.
 
-    In the worst case, this is expanded to a whole bunch of CJump statements.
+    Jump to the block which belongs to the value of v in the table, or to
+    the default block when the value is not in the table. The table is a
+    list of pairs of an integer value and a block.
+
+    Depending on the target, this is implemented by a table of addresses,
+    or expanded into a tree of CJump statements.
     """
 
     v = value_use("v")
@@ -1396,9 +1441,34 @@ class JumpTable(JumpBase):
     def __init__(self, v, table, default):
         super().__init__()
         self.v = v
-        self.table = table
         self.lab_default = default
-        raise NotImplementedError("TODO")
+        self.values = []
+        for value, block in table:
+            if value in self.values:
+                raise ValueError("Duplicate value {}".format(value))
+            name = "case{}".format(len(self.values))
+            self.set_target_block(name, block)
+            self.values.append(value)
 
     def __str__(self):
-        return "jmp_table {}".format(self.v.name)
+        cases = ", ".join(
+            "{}: {}".format(value, block.name) for value, block in self.table
+        )
+        return "jmp_table {} [{}] default {}".format(
+            self.v.name, cases, self.lab_default.name
+        )
+
+    @property
+    def table(self):
+        """ Gets the values and the blocks they jump to """
+        return [
+            (value, self._block_map["case{}".format(index)])
+            for index, value in enumerate(self.values)
+        ]
+
+    def get_target(self, value):
+        """ Get the block to which the given value jumps """
+        for case, block in self.table:
+            if case == value:
+                return block
+        return self.lab_default
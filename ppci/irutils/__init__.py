@@ -4,13 +4,14 @@
 from .verify import verify_module, Verifier
 from .writer import Writer, print_module
 from .reader import Reader, read_module
-from .builder import Builder, split_block
+from .builder import Builder, split_block, expand_jump_table
 from .link import ir_link
 from .io import to_json, from_json
 from .instrument import add_tracer
 
 __all__ = [
     "Builder",
+    "expand_jump_table",
     "ir_link",
     "print_module",
     "read_module",
@@ -44,6 +44,46 @@ def split_block(block, pos=None, newname="splitblock"):
     return block, block2
 
 
+def expand_jump_table(jump_table):
+    """Replace a jump table by a tree of conditional jumps.
+
+    This is used when jumping to an address taken from a table is not
+    possible.
+    """
+    block, value = jump_table.block, jump_table.v
+    table, default = jump_table.table, jump_table.lab_default
+
+    # The phis of the targets get their value from the new blocks:
+    phis = {}
+    for target in set(jump_table.targets):
+        for phi in target.phis:
+            phis[phi] = phi.get_value(block)
+            phi.del_incoming(block)
+    block.remove_instruction(jump_table)
+    jump_table.delete()
+
+    builder = Builder()
+    builder.set_function(block.function)
+    builder.set_block(block)
+    builder.emit_switch(value, table, default, jump_tables=False)
+
+    for phi, incoming in phis.items():
+        for predecessor in phi.block.predecessors:
+            if predecessor not in phi.inputs:
+                phi.set_incoming(predecessor, incoming)
+
+
+def is_dense(table):
+    """Test if a jump table for the given cases is at least 40 percent
+    filled.
+    """
+    if not table:
+        return False
+    values = [value for value, _ in table]
+    span = max(values) - min(values) + 1
+    return len(values) * 10 >= span * 4
+
+
 class Builder:
     """Helper class for IR-code generators.
 
@@ -53,6 +93,9 @@ class Builder:
     frontends.
     """
 
+    #: Switches with up to this many cases are a chain of comparisons:
+    max_compare_chain = 3
+
     def __init__(self):
         self.block = None
         self.module = None
@@ -173,6 +216,50 @@ class Builder:
         """ Emit a type cast instruction. """
         return self.emit(ir.Cast(value, "typecast", ty))
 
+    def emit_switch(self, value, table, default, jump_tables=True):
+        """Emit a jump to the block which belongs to the value.
+
+        Args:
+            value: the integer value to switch on.
+            table: pairs of a constant integer and the block to jump to.
+            default: the block to jump to for all other values.
+            jump_tables: whether jump tables may be emitted.
+
+        A few cases are tested one after the other. Otherwise, the cases
+        are split in two halves by a comparison, until the cases are few
+        enough to test them one by one, or dense enough for a jump table.
+        """
+        if value.ty.is_integer:
+            mask = (1 << value.ty.bits) - 1
+            sign = 1 << (value.ty.bits - 1) if value.ty.signed else 0
+            table = [((case & mask ^ sign) - sign, b) for case, b in table]
+        table = sorted(table, key=lambda case: case[0])
+        self._emit_switch(value, table, default, jump_tables)
+
+    def _emit_switch(self, value, table, default, jump_tables):
+        if len(table) <= self.max_compare_chain:
+            for index, (case, target) in enumerate(table):
+                if index + 1 < len(table):
+                    next_block = self.new_block()
+                else:
+                    next_block = default
+                case = self.emit_const(case, value.ty)
+                self.emit(ir.CJump(value, "==", case, target, next_block))
+                self.set_block(next_block)
+            if not table:
+                self.emit_jump(default)
+        elif jump_tables and is_dense(table):
+            self.emit(ir.JumpTable(value, table, default))
+        else:
+            middle = len(table) // 2
+            pivot = self.emit_const(table[middle][0], value.ty)
+            lower, upper = self.new_block(), self.new_block()
+            self.emit(ir.CJump(value, "<", pivot, lower, upper))
+            self.set_block(lower)
+            self._emit_switch(value, table[:middle], default, jump_tables)
+            self.set_block(upper)
+            self._emit_switch(value, table[middle:], default, jump_tables)
+
     # Debug helpers:
     def set_location(self, location):
         """Set the current source code location.
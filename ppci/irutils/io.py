@@ -252,6 +252,18 @@ class DictWriter:
                 "yes_block": self.write_block_ref(instruction.lab_yes),
                 "no_block": self.write_block_ref(instruction.lab_no),
             }
+        elif isinstance(instruction, ir.JumpTable):
+            json_instruction = {
+                "kind": "jumptable",
+                "v": self.write_value_ref(instruction.v),
+                "table": [
+                    {"value": value, "block": self.write_block_ref(block)}
+                    for value, block in instruction.table
+                ],
+                "default_block": self.write_block_ref(
+                    instruction.lab_default
+                ),
+            }
         elif isinstance(instruction, ir.Cast):
             json_instruction = {
                 "kind": "cast",
@@ -536,6 +548,14 @@ class DictReader:
             lab_yes = self.get_block_ref(json_instruction["yes_block"])
             lab_no = self.get_block_ref(json_instruction["no_block"])
             instruction = ir.CJump(a, cond, b, lab_yes, lab_no)
+        elif itype == "jumptable":
+            v = self.get_value_ref(json_instruction["v"])
+            table = [
+                (json_case["value"], self.get_block_ref(json_case["block"]))
+                for json_case in json_instruction["table"]
+            ]
+            default = self.get_block_ref(json_instruction["default_block"])
+            instruction = ir.JumpTable(v, table, default)
         elif itype == "procedurecall":
             callee = self.get_value_ref(json_instruction["callee"])
             arguments = []
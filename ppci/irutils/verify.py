@@ -7,17 +7,21 @@ bugs in the compiler itself.
 import logging
 from collections import defaultdict
 from ..graph.domtree import CfgInfo
+from ..opt.analysis import CfgAnalysis
 from ..common import IrFormError
 from .. import ir
 
 
-def verify_module(module: ir.Module):
+def verify_module(module: ir.Module, analysis_manager=None):
     """Check if the module is properly constructed
 
     Args:
         module: The module to verify.
+        analysis_manager: An optional
+            :class:`ppci.opt.analysis.AnalysisManager` which keeps the
+            calculated control flow graphs, so that they can be reused.
     """
-    Verifier().verify(module)
+    Verifier(analysis_manager=analysis_manager).verify(module)
 
 
 class Verifier:
@@ -25,8 +29,9 @@ class Verifier:
 
     logger = logging.getLogger("verifier")
 
-    def __init__(self):
+    def __init__(self, analysis_manager=None):
         self.name_map = {}
+        self.analysis_manager = analysis_manager
 
     def verify(self, module):
         """ Verifies a module for some sanity """
@@ -91,8 +96,11 @@ class Verifier:
                 ranks[instruction] = rank
         self._ranks = ranks
 
-        # Now we can build a dominator tree
+        # Now we can build a dominator tree. Never use a cached one, since
+        # it might be outdated by a pass which did not invalidate it:
         self.cfg_info = CfgInfo(function)
+        if self.analysis_manager:
+            self.analysis_manager.store(CfgAnalysis, function, self.cfg_info)
 
         for block in function:
             assert block.function is function
@@ -167,6 +175,14 @@ class Verifier:
                         instruction.a.ty, instruction.b.ty, instruction
                     )
                 )
+        elif isinstance(instruction, ir.JumpTable):
+            ty = instruction.v.ty
+            if not (ty.is_integer or ty is ir.ptr):
+                raise IrFormError(
+                    "Type {} is not an integer type in {}".format(
+                        instruction.v.ty, instruction
+                    )
+                )
         elif isinstance(instruction, (ir.FunctionCall, ir.ProcedureCall)):
             if isinstance(
                 instruction.callee, (ir.SubRoutine, ir.ExternalSubRoutine)
@@ -7,6 +7,7 @@ from .semantics import CSemantics
 from .preprocessor import CPreProcessor, prepare_for_parsing
 from .codegenerator import CCodeGenerator
 from .utils import print_ast
+from ...utils.timing import timed, timed_iter
 
 
 class CBuilder:
@@ -18,8 +19,16 @@ class CBuilder:
         self.arch_info = arch_info
         self.coptions = coptions
         self.cgen = None
+        self.preprocessor = None
 
     def build(self, src: io.TextIOBase, filename: str, reporter=None):
+        # Keep the preprocessor, it knows which files were included:
+        self.preprocessor = CPreProcessor(self.coptions)
+        tokens = self.preprocessor.process_file(src, filename)
+        return self.build_tokens(tokens, filename, reporter=reporter)
+
+    def build_tokens(self, tokens, filename: str, reporter=None):
+        """ Build ir-code from the tokens of a preprocessed source """
         if reporter:
             reporter.heading(2, "C builder")
             reporter.message(
@@ -29,14 +38,15 @@ class CBuilder:
         self.logger.info("Starting C compilation (%s)", cdialect)
 
         context = CContext(self.coptions, self.arch_info)
-        compile_unit = _parse(src, filename, context)
+        compile_unit = _parse_tokens(tokens, context)
 
         if reporter:
             f = io.StringIO()
             print_ast(compile_unit, file=f)
             reporter.dump_source("C-ast", f.getvalue())
-        cgen = CCodeGenerator(context)
-        return cgen.gen_code(compile_unit)
+        with timed("irgen"):
+            cgen = CCodeGenerator(context)
+            return cgen.gen_code(compile_unit)
 
     def _create_ast(self, src, filename):
         return create_ast(
@@ -66,10 +76,17 @@ def create_ast(src, arch_info, filename="<snippet>", coptions=None):
 def _parse(src, filename, context):
     preprocessor = CPreProcessor(context.coptions)
     tokens = preprocessor.process_file(src, filename)
+    return _parse_tokens(tokens, context)
+
+
+def _parse_tokens(tokens, context):
+    tokens = timed_iter("preprocess", tokens)
     semantics = CSemantics(context)
     parser = CParser(context.coptions, semantics)
     tokens = prepare_for_parsing(tokens, parser.keywords)
-    ast = parser.parse(tokens)
+    # The semantic analysis is done during parsing:
+    with timed("parse"):
+        ast = parser.parse(tokens)
     return ast
 
 
@@ -575,7 +575,8 @@ class CCodeGenerator:
             https://www.codeproject.com/Articles/100473/
             Something-You-May-Not-Know-About-the-Switch-Statem
 
-        For now, implemented as a gigantic if-then forest.
+        Depending on the case values, this becomes a chain of
+        comparisons, a binary search tree or a jump table.
         """
         backup = self.switch_options
         self.switch_options = {}
@@ -594,24 +595,17 @@ class CCodeGenerator:
         self.break_block_stack.pop()
 
         # Implement switching logic, now that we have the branches:
-        # TODO: implement jump tables and other performance related stuff.
         self.builder.set_block(test_block)
         test_value = self.gen_expr(stmt.expression, rvalue=True)
-        switch_ir_typ = self.get_ir_type(stmt.expression.typ)
-        for option, target_block in self.switch_options.items():
-            if option != "default":
-                option = self.builder.emit_const(option, switch_ir_typ)
-                next_test_block = self.builder.new_block()
-                self.emit(
-                    ir.CJump(
-                        test_value, "==", option, target_block, next_test_block
-                    )
-                )
-                self.builder.set_block(next_test_block)
+        table = [
+            (option, target_block)
+            for option, target_block in self.switch_options.items()
+            if option != "default"
+        ]
 
         # If all else fails, jump to the default case if we have it.
-        target_block = self.switch_options.get("default", final_block)
-        self.builder.emit_jump(target_block)
+        default_block = self.switch_options.get("default", final_block)
+        self.builder.emit_switch(test_value, table, default_block)
 
         # Set continuation point:
         self.builder.set_block(final_block)
@@ -37,6 +37,8 @@ class CPreProcessor:
         self.macros = {}  # A mapping of macros
         self.files = []  # Stack of included files.
         self.counter = 0  # For the __COUNTER__ macro
+        self.dependencies = []  # All included files, in order of inclusion
+        self.system_dependencies = set()  # Files included as system header
         self._int_type = types.BasicType(types.BasicType.INT)
 
         self.predefine_builtin_macros()
@@ -166,13 +168,13 @@ class CPreProcessor:
         else:
             return False
 
-    def process_file(self, f, filename=None):
+    def process_file(self, f, filename=None, system=False):
         """ Process the given open file into tokens. """
         self.logger.debug("Processing %s", filename)
         source_file = SourceFile(filename)
         clexer = CLexer(self.coptions)
         tokens = clexer.lex(f, source_file)
-        ex = FileExpander(source_file, tokens)
+        ex = FileExpander(source_file, tokens, system=system)
         self.files.append(ex)
         yield LineInfo(1, source_file.filename)
         for token in self.process_tokens():
@@ -248,10 +250,39 @@ class CPreProcessor:
         self.logger.debug("Including %s", full_path)
         source_file = SourceFile(full_path)
         self.files[-1].dependencies.append(source_file)
+
+        # Headers included via <...>, and everything they include, are
+        # considered system headers:
+        system = not use_current_dir or self.files[-1].system
+        self.add_dependency(full_path, system)
+
         with open(full_path, "r") as f:
-            for token in self.process_file(f, full_path):
+            for token in self.process_file(f, full_path, system=system):
                 yield token
 
+    def add_dependency(self, filename, system):
+        """ Record that the given file was included. """
+        if filename not in self.dependencies:
+            self.dependencies.append(filename)
+            if system:
+                self.system_dependencies.add(filename)
+        elif not system:
+            self.system_dependencies.discard(filename)
+
+    def get_dependencies(self, system=True):
+        """Get the files included so far.
+
+        When system is False, system headers are omitted.
+        """
+        if system:
+            return list(self.dependencies)
+        else:
+            return [
+                filename
+                for filename in self.dependencies
+                if filename not in self.system_dependencies
+            ]
+
     # Token consume / peeking:
     @property
     def token(self):
@@ -1139,8 +1170,9 @@ class FileExpander:
       and processing continues over there.
     """
 
-    def __init__(self, source_file, tokens):
+    def __init__(self, source_file, tokens, system=False):
         self.source_file = source_file
+        self.system = system  # Whether this is a system header
         self.dependencies = []  # List of dependent files.
         self.if_stack = []  # If-def stack
         self.token_buffer = []  # Token undo stack
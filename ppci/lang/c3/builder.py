@@ -9,6 +9,7 @@ from ...common import DiagnosticsManager, get_file, CompilerError
 from ...build.tasks import TaskError
 from ...utils.reporting import DummyReportGenerator
 from ...irutils import Verifier, verify_module
+from ...utils.timing import timed
 from .lexer import Lexer
 from .parser import Parser
 from .typechecker import TypeChecker
@@ -81,21 +82,24 @@ class C3Builder:
         context = Context(self.arch_info)
 
         # Phase 1: Lexing and parsing stage
-        for src in itertools.chain(sources, imps):
-            self.do_parse(src, context)
+        with timed("parse"):
+            for src in itertools.chain(sources, imps):
+                self.do_parse(src, context)
 
-        # Phase 1.8: Handle imports:
-        try:
-            context.link_imports()
-        except SemanticError as ex:
-            self.diag.error(ex.msg, ex.loc)
-            raise
+        with timed("semantics"):
+            # Phase 1.8: Handle imports:
+            try:
+                context.link_imports()
+            except SemanticError as ex:
+                self.diag.error(ex.msg, ex.loc)
+                raise
 
-        type_checker = TypeChecker(self.diag, context)
-        type_checker.check()
+            type_checker = TypeChecker(self.diag, context)
+            type_checker.check()
 
         # Phase 2: Generate intermediate code
-        ir_module = self.codegen.gen(context)
+        with timed("irgen"):
+            ir_module = self.codegen.gen(context)
 
         # Check modules
         self.verifier.verify(ir_module)
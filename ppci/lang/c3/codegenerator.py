@@ -500,6 +500,7 @@ class CodeGenerator:
         self.emit(ir.Jump(test_block))
 
         def_block = None
+        table = []
         # Generate code in linear way:
         for option_val, option_code in switch.options:
             # Generate code for case:
@@ -513,21 +514,14 @@ class CodeGenerator:
                 def_block = code_block
             else:
                 # TODO: type check constant:
-                loc = option_val.loc
-                self.builder.set_block(test_block)
                 o_val = self.context.eval_const(option_val)
-                ir_val2 = self.emit(
-                    ir.Const(o_val, "cmpval", self.get_ir_int()), loc=loc
-                )
-                tb2 = self.new_block()
-                self.emit(
-                    ir.CJump(ir_val, "==", ir_val2, code_block, tb2), loc=loc
-                )
-                test_block = tb2
+                # Only the first case with a value can be reached:
+                if all(o_val != value for value, _ in table):
+                    table.append((o_val, code_block))
 
         self.builder.set_block(test_block)
         assert def_block
-        self.emit(ir.Jump(def_block))
+        self.builder.emit_switch(ir_val, table, def_block)
         self.builder.set_block(final_block)
 
     def gen_cond_code(self, expr, bbtrue, bbfalse):
@@ -574,6 +574,7 @@ class CodeGenerator:
         self.emit(ir.Jump(test_block))
 
         default_block = None
+        table = []
         # Generate code in linear way:
         for option_values, option_code in switch.options:
             # Generate code for case:
@@ -590,17 +591,22 @@ class CodeGenerator:
                 for option in option_values:
                     self.builder.set_block(test_block)
                     o_val = self.gen_expr_code(option, rvalue=True)
-                    new_test_block = self.builder.new_block()
-                    self.emit(
-                        ir.CJump(
-                            ir_val, "==", o_val, code_block, new_test_block
+                    if isinstance(o_val, ir.Const):
+                        # Only the first case with a value can be reached:
+                        if all(o_val.value != value for value, _ in table):
+                            table.append((o_val.value, code_block))
+                    else:
+                        new_test_block = self.builder.new_block()
+                        self.emit(
+                            ir.CJump(
+                                ir_val, "==", o_val, code_block, new_test_block
+                            )
                         )
-                    )
-                    test_block = new_test_block
+                        test_block = new_test_block
 
         self.builder.set_block(test_block)
         assert default_block
-        self.emit(ir.Jump(default_block))
+        self.builder.emit_switch(ir_val, table, default_block)
         self.builder.set_block(final_block)
 
     def gen_procedure_call(self, call: statements.ProcedureCall):
@@ -344,6 +344,8 @@ class IrToPythonCompiler:
             self.gen_cjump(ins)
         elif isinstance(ins, ir.Jump):
             self.gen_jump(ins)
+        elif isinstance(ins, ir.JumpTable):
+            self.gen_jump_table(ins)
         elif isinstance(ins, ir.Alloc):
             self.emit("{} = _irpy_alloca({})".format(ins.name, ins.amount))
             self.stack_size += ins.amount
@@ -432,6 +434,18 @@ class IrToPythonCompiler:
         else:
             self.emit_jump(ins.target)
 
+    def gen_jump_table(self, ins):
+        v = self.fetch_value(ins.v)
+        cases = ", ".join(
+            '{}: "{}"'.format(value, block.name) for value, block in ins.table
+        )
+        self.emit("_irpy_prev_block = _irpy_current_block")
+        self.emit(
+            '_irpy_current_block = {{{}}}.get({}, "{}")'.format(
+                cases, v, ins.lab_default.name
+            )
+        )
+
     def gen_binop(self, ins):
         a = self.fetch_value(ins.a)
         b = self.fetch_value(ins.b)
@@ -6,6 +6,8 @@ from .load_after_store import LoadAfterStorePass
 from .transform import RemoveAddZeroPass
 from .transform import DeleteUnusedInstructionsPass
 from .transform import ModulePass, FunctionPass, BlockPass, InstructionPass
+from .analysis import AnalysisManager
+from .pass_manager import PassManager
 
 
 __all__ = [
@@ -13,6 +15,8 @@ __all__ = [
     "FunctionPass",
     "BlockPass",
     "InstructionPass",
+    "AnalysisManager",
+    "PassManager",
     "CleanPass",
     "CommonSubexpressionEliminationPass",
     "ConstantFolder",
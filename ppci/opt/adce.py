@@ -0,0 +1,184 @@
+""" Aggressive dead code elimination.
+
+Instead of removing the values which are not used, this pass assumes that
+every instruction is dead, until it is shown to be needed. Instructions
+with side effects, such as stores, calls and returns, are needed. So are
+the values they use, and the branches which decide whether they are
+executed. The instructions which are not found to be needed are removed.
+
+Since a value is only needed when a needed instruction uses it, this also
+removes cycles of phis which only use each other, and whole loops which
+do not compute a value that is used after the loop.
+
+The algorithm is described in:
+Cytron et al., "Efficiently computing static single assignment form and
+the control dependence graph", 1991.
+"""
+
+from .. import ir
+from .analysis import CFG_ANALYSES, PostDominatorTreeAnalysis
+from .cjmp import replace_by_jump
+from .transform import FunctionPass
+
+
+# Instructions which are needed for their effect, not for their value:
+SIDE_EFFECTS = (
+    ir.Store,
+    ir.CopyBlob,
+    ir.FunctionCall,
+    ir.ProcedureCall,
+    ir.InlineAsm,
+    ir.Return,
+    ir.Exit,
+)
+
+
+class AggressiveDeadCodeEliminationPass(FunctionPass):
+    """Remove the instructions which do not contribute to the effects of
+    a function.
+
+    Conditional jumps are needed when a needed instruction depends on the
+    direction they take. The other conditional jumps are replaced by a jump
+    to the nearest block after them which contains a needed instruction.
+
+    A loop which does not compute anything which is used afterwards is
+    assumed to end, and is removed. Loops which can never reach the end of
+    the function are kept.
+    """
+
+    requires = (PostDominatorTreeAnalysis,)
+    preserves = CFG_ANALYSES
+
+    def on_function(self, function):
+        self.post_dominator_tree = self.get_analysis(
+            PostDominatorTreeAnalysis, function
+        )
+        self.control_dependencies = self.get_control_dependencies(function)
+        self.live = set()
+        self.live_blocks = set()
+        self.worklist = []
+
+        for block in function:
+            if not self.post_dominator_tree.reaches_exit(block):
+                # Keep loops which never end:
+                self.mark(block.last_instruction)
+            for instruction in block:
+                if self.is_needed(instruction):
+                    self.mark(instruction)
+
+        # Find the new targets of the branches which are not needed. When
+        # such a target has phis, the branch is needed after all:
+        while True:
+            self.propagate()
+            targets = {}
+            for block in function:
+                branch = block.last_instruction
+                if (
+                    isinstance(branch, (ir.CJump, ir.JumpTable))
+                    and branch not in self.live
+                ):
+                    target = self.find_live_post_dominator(block)
+                    if target is None or any(
+                        phi in self.live for phi in target.phis
+                    ):
+                        self.mark(branch)
+                    else:
+                        targets[branch] = target
+            if not self.worklist:
+                break
+
+        dead = [
+            instruction
+            for block in function
+            for instruction in block
+            if instruction not in self.live
+            and not isinstance(instruction, ir.JumpBase)
+        ]
+        for branch, target in targets.items():
+            replace_by_jump(branch, target)
+        for instruction in dead:
+            for value in list(instruction.uses):
+                instruction.del_use(value)
+        for instruction in dead:
+            instruction.block.remove_instruction(instruction)
+
+        if targets:
+            function.delete_unreachable()
+            self.analysis_manager.invalidate(function)
+
+        self.post_dominator_tree = None
+        self.control_dependencies = None
+        self.live = None
+        self.live_blocks = None
+        self.worklist = None
+
+        if dead or targets:
+            self.logger.debug(
+                "Removed %i instructions and %i branches",
+                len(dead),
+                len(targets),
+            )
+        return bool(dead or targets)
+
+    def is_needed(self, instruction):
+        """ Test if an instruction is needed for its side effects """
+        if isinstance(instruction, ir.Load):
+            return instruction.volatile
+        return isinstance(instruction, SIDE_EFFECTS)
+
+    def mark(self, instruction):
+        """ Mark an instruction as needed """
+        if instruction not in self.live:
+            self.live.add(instruction)
+            self.worklist.append(instruction)
+
+    def propagate(self):
+        """ Mark the instructions needed by the needed instructions """
+        while self.worklist:
+            instruction = self.worklist.pop()
+            for value in instruction.uses:
+                if isinstance(value, ir.Instruction) and not isinstance(
+                    value, ir.Parameter
+                ):
+                    self.mark(value)
+
+            if isinstance(instruction, ir.Phi):
+                # The jumps which select the input are needed:
+                for block in instruction.inputs:
+                    self.mark(block.last_instruction)
+
+            block = instruction.block
+            if block not in self.live_blocks:
+                self.live_blocks.add(block)
+                for branch_block in self.control_dependencies[block]:
+                    self.mark(branch_block.last_instruction)
+
+    def get_control_dependencies(self, function):
+        """Determine for each block the blocks ending in a branch which
+        decides whether the block is executed.
+        """
+        post_dominator_tree = self.post_dominator_tree
+        dependencies = {block: set() for block in function}
+        for block in function:
+            successors = set(block.successors)
+            if len(successors) < 2:
+                continue
+
+            # The blocks from a successor up to the post dominator of the
+            # branch are only executed for this successor:
+            end = post_dominator_tree.immediate_post_dominator(block)
+            for successor in successors:
+                runner = successor
+                while runner is not None and runner is not end:
+                    dependencies[runner].add(block)
+                    runner = post_dominator_tree.immediate_post_dominator(
+                        runner
+                    )
+        return dependencies
+
+    def find_live_post_dominator(self, block):
+        """ Find the nearest block after a block which is needed """
+        runner = self.post_dominator_tree.immediate_post_dominator(block)
+        while runner is not None and runner not in self.live_blocks:
+            runner = self.post_dominator_tree.immediate_post_dominator(runner)
+        return runner
@@ -0,0 +1,179 @@
+""" Alias analysis.
+
+Alias analysis tells whether two memory accesses might access the same
+memory. An address is split into a base value and a constant offset, so
+that ``s + 4`` and ``s + 8`` are known to be different fields of the same
+struct, even when the additions are computed in different blocks.
+
+Addresses are traced back to the object they point into. This is a local
+allocation or a global value, such as a variable. Distinct objects never
+overlap. An allocation of which the address does not escape from the
+function can only be accessed through addresses derived from it. It cannot
+be accessed through any other pointer, nor by a called function.
+"""
+
+from collections import namedtuple
+from .. import ir
+from .analysis import FunctionAnalysis
+from .transform import constant_value
+
+
+MemoryLocation = namedtuple("MemoryLocation", ["base", "offset", "size"])
+MemoryLocation.__doc__ = """A range of memory of size bytes, at a constant
+offset from a base address.
+
+The base is None for an absolute address, and the size is None when it is
+not known.
+"""
+
+# Pointers are not larger than this on any of the targets:
+MAX_POINTER_SIZE = 8
+
+
+class AliasInfo:
+    """ Alias information of a function """
+
+    def __init__(self, function):
+        self.local_objects = set(
+            alloc
+            for alloc in function.get_instructions_of_type(ir.Alloc)
+            if not address_escapes(alloc)
+        )
+
+    def get_location(self, address, size):
+        """ Get the memory location of size bytes at the given address """
+        offset = 0
+        while True:
+            if isinstance(address, ir.Binop) and address.operation in (
+                "+",
+                "-",
+            ):
+                delta = constant_value(address.b)
+                if delta is not None:
+                    if address.operation == "+":
+                        offset += delta
+                    else:
+                        offset -= delta
+                    address = address.a
+                    continue
+                delta = constant_value(address.a)
+                if delta is not None and address.operation == "+":
+                    offset += delta
+                    address = address.b
+                    continue
+            elif isinstance(address, ir.AddressOf):
+                address = address.src
+                continue
+            break
+
+        delta = constant_value(address)
+        if delta is not None:
+            address = None
+            offset += delta
+        return MemoryLocation(address, offset, size)
+
+    def get_access_location(self, instruction):
+        """Get the memory location which is accessed by a load or store
+        instruction.
+        """
+        if isinstance(instruction, ir.Load):
+            ty = instruction.ty
+        else:
+            ty = instruction.value.ty
+        return self.get_location(instruction.address, get_size(ty))
+
+    def get_object(self, address):
+        """Get the allocation or global value into which an address points,
+        or None when it is not known.
+        """
+        while True:
+            if isinstance(address, (ir.Alloc, ir.GlobalValue)):
+                return address
+            elif isinstance(address, ir.AddressOf):
+                address = address.src
+            elif isinstance(address, ir.Binop) and address.operation in (
+                "+",
+                "-",
+            ):
+                one = self.get_object(address.a)
+                if address.operation == "-":
+                    return one
+                another = self.get_object(address.b)
+                if one is None:
+                    return another
+                elif another is None:
+                    return one
+                else:
+                    return None
+            else:
+                return None
+
+    def is_local(self, location):
+        """Test if a location is in an allocation of which the address does
+        not escape. Called functions cannot access this memory.
+        """
+        return self.get_object(location.base) in self.local_objects
+
+    def may_alias(self, one, another):
+        """ Test if two memory locations might overlap """
+        if one.base is another.base:
+            return overlap(one, another)
+
+        objects = self.get_object(one.base), self.get_object(another.base)
+        if None in objects:
+            # An unknown pointer might point into any object, except the
+            # allocations of which the address did not escape:
+            return not any(obj in self.local_objects for obj in objects)
+        return objects[0] is objects[1]
+
+
+class AliasAnalysis(FunctionAnalysis):
+    """ The alias information of a function, as :class:`AliasInfo` """
+
+    def run(self, function, analysis_manager):
+        return AliasInfo(function)
+
+
+def address_escapes(alloc):
+    """Test if the address of an allocation is used for anything else than
+    accessing its memory.
+    """
+    worklist = [alloc]
+    while worklist:
+        address = worklist.pop()
+        for user in address.used_by:
+            if isinstance(user, ir.Store) and user.value is address:
+                # The value of an allocation is its contents when stored:
+                if address is not alloc:
+                    return True
+            elif isinstance(user, (ir.Load, ir.Store, ir.CopyBlob)):
+                pass
+            elif isinstance(user, ir.AddressOf) or (
+                isinstance(user, ir.Binop)
+                and user.ty is ir.ptr
+                and (
+                    user.operation == "+"
+                    or (user.operation == "-" and user.a is address)
+                )
+            ):
+                worklist.append(user)
+            else:
+                return True
+    return False
+
+
+def get_size(ty):
+    """ Get the size of a value of the given type, or None if unknown """
+    return getattr(ty, "size", None)
+
+
+def overlap(one, another):
+    """ Test if two locations with the same base overlap """
+
+    def end(location):
+        size = location.size
+        if size is None:
+            size = MAX_POINTER_SIZE
+        return location.offset + size
+
+    return one.offset < end(another) and another.offset < end(one)
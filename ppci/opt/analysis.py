@@ -0,0 +1,626 @@
+""" Analyses of ir-functions, which are shared between optimization passes.
+
+An analysis calculates information about a function, such as its control
+flow graph or its loops. The :class:`AnalysisManager` caches the result of
+an analysis, until a pass changes the function in a way which invalidates
+the result.
+
+Example usage:
+
+.. doctest::
+
+    >>> import io
+    >>> from ppci.api import c3_to_ir
+    >>> from ppci.opt.analysis import AnalysisManager, LoopAnalysis
+    >>> source = io.StringIO('''module main;
+    ... function int f(int n) {
+    ...   var int x = 0;
+    ...   while (n > 0) { x = x + n; n = n - 1; }
+    ...   return x;
+    ... }''')
+    >>> ir_module = c3_to_ir([source], [], 'arm')
+    >>> analyses = AnalysisManager()
+    >>> function = ir_module.functions[0]
+    >>> len(analyses.get(LoopAnalysis, function))
+    1
+"""
+
+from collections import namedtuple
+from .. import ir
+from ..graph import lt
+from ..graph.domtree import CfgInfo
+from ..utils.timing import timed
+
+
+class FunctionAnalysis:
+    """Base class of all analyses.
+
+    Subclasses list the analyses they are calculated from in requires.
+    When one of those is invalidated, the analysis is invalidated as well.
+    """
+
+    requires = ()
+
+    def __repr__(self):
+        return self.__class__.__name__
+
+    def run(self, function, analysis_manager):  # pragma: no cover
+        """ Calculate the analysis result for the given function """
+        raise NotImplementedError()
+
+
+class CfgAnalysis(FunctionAnalysis):
+    """ The control flow graph of a function, as a :class:`CfgInfo` """
+
+    def run(self, function, analysis_manager):
+        return CfgInfo(function)
+
+
+class DominatorTree:
+    """ Dominance relations between the blocks of a function """
+
+    def __init__(self, cfg_info):
+        self.cfg_info = cfg_info
+        self.cfg = cfg_info.cfg
+        self.cfg.get_immediate_dominator(self.cfg.entry_node)
+
+    def dominates(self, one, another):
+        """ Test if block one dominates block another """
+        return self.cfg.dominates(
+            self.cfg_info.get_node(one), self.cfg_info.get_node(another)
+        )
+
+    def strictly_dominates(self, one, another):
+        """ Test if block one strictly dominates block another """
+        return self.cfg.strictly_dominates(
+            self.cfg_info.get_node(one), self.cfg_info.get_node(another)
+        )
+
+    def immediate_dominator(self, block):
+        """ Get the immediate dominator of a block, None for the entry """
+        node = self.cfg.get_immediate_dominator(self.cfg_info.get_node(block))
+        if node is not None:
+            return self.cfg_info.get_block(node)
+
+    def children(self, block):
+        """ Get the blocks which are immediately dominated by a block """
+        return [
+            self.cfg_info.get_block(node)
+            for node in self.cfg.children(self.cfg_info.get_node(block))
+            if self.cfg_info.has_block(node)
+        ]
+
+    def pre_order(self):
+        """ Get all blocks such that a block comes before those it
+        dominates.
+        """
+        blocks = []
+        worklist = [self.cfg_info.function.entry]
+        while worklist:
+            block = worklist.pop()
+            blocks.append(block)
+            worklist.extend(reversed(self.children(block)))
+        return blocks
+
+
+class DominatorTreeAnalysis(FunctionAnalysis):
+    """ The dominator tree of a function, as a :class:`DominatorTree` """
+
+    requires = (CfgAnalysis,)
+
+    def run(self, function, analysis_manager):
+        return DominatorTree(analysis_manager.get(CfgAnalysis, function))
+
+
+class PostDominatorTree:
+    """Post dominance relations between the blocks of a function.
+
+    A block post dominates another block when each path from the other
+    block to the end of the function passes through it. Blocks in a loop
+    which never ends do not reach the end, and have no post dominators.
+    """
+
+    def __init__(self, cfg_info):
+        self.cfg_info = cfg_info
+        cfg = cfg_info.cfg
+        self._ipdom = lt.calculate_idom(cfg, cfg.exit_node, reverse=True)
+
+    def reaches_exit(self, block):
+        """ Test if the end of the function can be reached from a block """
+        return self.cfg_info.get_node(block) in self._ipdom
+
+    def immediate_post_dominator(self, block):
+        """Get the immediate post dominator of a block, None when it is
+        the end of the function, or when the end is never reached.
+        """
+        node = self._ipdom.get(self.cfg_info.get_node(block))
+        if node is not None and self.cfg_info.has_block(node):
+            return self.cfg_info.get_block(node)
+
+
+class PostDominatorTreeAnalysis(FunctionAnalysis):
+    """ The post dominator tree of a function, as a
+    :class:`PostDominatorTree`
+    """
+
+    requires = (CfgAnalysis,)
+
+    def run(self, function, analysis_manager):
+        return PostDominatorTree(analysis_manager.get(CfgAnalysis, function))
+
+
+class DominanceFrontierAnalysis(FunctionAnalysis):
+    """ The dominance frontier of a function, as a map of each block to
+    the set of blocks in its dominance frontier.
+    """
+
+    requires = (DominatorTreeAnalysis,)
+
+    def run(self, function, analysis_manager):
+        analysis_manager.get(DominatorTreeAnalysis, function)
+        return analysis_manager.get(CfgAnalysis, function).df
+
+
+def reverse_post_order(function):
+    """ Get the reachable blocks of a function in reverse post order """
+    visited = {function.entry}
+    order = []
+    worklist = [(function.entry, iter(function.entry.successors))]
+    while worklist:
+        block, successors = worklist[-1]
+        for successor in successors:
+            if successor not in visited:
+                visited.add(successor)
+                worklist.append((successor, iter(successor.successors)))
+                break
+        else:
+            worklist.pop()
+            order.append(block)
+    order.reverse()
+    return order
+
+
+Loop = namedtuple("Loop", ["header", "blocks"])
+
+
+class LoopAnalysis(FunctionAnalysis):
+    """The natural loops of a function.
+
+    The result is a list of loops, each with its header block and
+    the other blocks in the loop in function order.
+    """
+
+    requires = (DominatorTreeAnalysis,)
+
+    def run(self, function, analysis_manager):
+        analysis_manager.get(DominatorTreeAnalysis, function)
+        cfg_info = analysis_manager.get(CfgAnalysis, function)
+        block_order = {b: i for i, b in enumerate(function.blocks)}
+        loops = []
+        for loop in cfg_info.cfg.calculate_loops():
+            blocks = [
+                cfg_info.get_block(n)
+                for n in loop.rest
+                if cfg_info.has_block(n)
+            ]
+            blocks.sort(key=block_order.__getitem__)
+            loops.append(Loop(cfg_info.get_block(loop.header), blocks))
+        loops.sort(key=lambda loop: block_order[loop.header])
+        return loops
+
+
+class InductionVariable:
+    """A value which is a linear function of a basic induction variable.
+
+    The value is ``factor * basic + constant`` plus the sum of the loop
+    invariant values in invariants, each multiplied by its coefficient.
+    The basic induction variable is a phi in the loop header, or None for
+    a value which does not change in the loop.
+    """
+
+    def __init__(self, basic, factor, invariants, constant):
+        if not factor:
+            basic = None
+        self.basic = basic
+        self.factor = factor if basic is not None else 0
+        self.invariants = {v: c for v, c in invariants.items() if c}
+        self.constant = constant
+
+    def __repr__(self):
+        terms = [
+            "{}*{}".format(c, v.name) for v, c in self.invariants.items()
+        ]
+        if self.basic is not None:
+            terms.insert(0, "{}*{}".format(self.factor, self.basic.name))
+        terms.append(str(self.constant))
+        return " + ".join(terms)
+
+    @property
+    def is_constant(self):
+        """ Test if this value is a constant """
+        return not self.factor and not self.invariants
+
+    def __add__(self, other):
+        if self.basic is None:
+            basic = other.basic
+        elif other.basic is None or other.basic is self.basic:
+            basic = self.basic
+        else:
+            return None
+        invariants = dict(self.invariants)
+        for value, coefficient in other.invariants.items():
+            invariants[value] = invariants.get(value, 0) + coefficient
+        return InductionVariable(
+            basic,
+            self.factor + other.factor,
+            invariants,
+            self.constant + other.constant,
+        )
+
+    def scale(self, amount):
+        """ Get this value multiplied by a number """
+        return InductionVariable(
+            self.basic,
+            self.factor * amount,
+            {v: c * amount for v, c in self.invariants.items()},
+            self.constant * amount,
+        )
+
+
+BasicInductionVariable = namedtuple(
+    "BasicInductionVariable", ["phi", "init", "step", "update"]
+)
+
+
+class LoopInductionVariables:
+    """The induction variables of a loop.
+
+    The basic induction variables are the phis in the header, which are
+    incremented by a constant step in each iteration. The values map each
+    value in the loop, which is a linear function of a basic induction
+    variable, to its :class:`InductionVariable`.
+    """
+
+    def __init__(self, header, blocks, preheader):
+        self.header = header
+        self.blocks = blocks
+        self.preheader = preheader
+        self.basics = {}
+        self.values = {}
+
+
+class InductionVariableAnalysis(FunctionAnalysis):
+    """The induction variables of the loops of a function.
+
+    The result is a list of :class:`LoopInductionVariables`, one for each
+    loop header. Only loops which are entered from a single block outside
+    the loop are analyzed.
+    """
+
+    requires = (LoopAnalysis,)
+
+    def run(self, function, analysis_manager):
+        loops = {}
+        for loop in analysis_manager.get(LoopAnalysis, function):
+            loops.setdefault(loop.header, {loop.header}).update(loop.blocks)
+
+        result = []
+        for header, blocks in loops.items():
+            outside = [p for p in header.predecessors if p not in blocks]
+            if len(outside) == 1:
+                loop = LoopInductionVariables(header, blocks, outside[0])
+                self.find_induction_variables(function, loop)
+                result.append(loop)
+        return result
+
+    def find_induction_variables(self, function, loop):
+        """ Find the basic and derived induction variables of a loop """
+        # Assume each phi in the header is a basic induction variable:
+        candidates = {
+            phi: InductionVariable(phi, 1, {}, 0)
+            for phi in loop.header.phis
+            if _is_linear_type(phi.ty)
+        }
+        values = dict(candidates)
+        instructions = [
+            instruction
+            for block in function
+            if block in loop.blocks
+            for instruction in block
+            if isinstance(instruction, ir.Value)
+            and not isinstance(instruction, ir.Phi)
+        ]
+        change = True
+        while change:
+            change = False
+            for instruction in instructions:
+                if instruction not in values:
+                    value = self.get_linear(instruction, loop, values)
+                    if value is not None and not value.is_constant:
+                        values[instruction] = value
+                        change = True
+
+        # Keep the phis which are incremented by a constant:
+        for phi in candidates:
+            init = phi.get_value(loop.preheader)
+            updates = {
+                phi.get_value(block)
+                for block in phi.block.predecessors
+                if block is not loop.preheader
+            }
+            if len(updates) != 1:
+                continue
+            (update,) = updates
+            value = values.get(update)
+            if (
+                value is not None
+                and value.basic is phi
+                and value.factor == 1
+                and not value.invariants
+                and value.constant
+                and update.ty is phi.ty
+            ):
+                loop.basics[phi] = BasicInductionVariable(
+                    phi, init, value.constant, update
+                )
+
+        loop.values = {
+            instruction: value
+            for instruction, value in values.items()
+            if value.basic in loop.basics
+        }
+
+    def get_linear(self, instruction, loop, values):
+        """Try to write the value of an instruction as a linear function
+        of an induction variable, or return None.
+        """
+        if not _is_linear_type(instruction.ty):
+            return None
+
+        def operand(value):
+            if isinstance(value, ir.Const):
+                if isinstance(value.value, int):
+                    return InductionVariable(None, 0, {}, value.value)
+            elif value in values:
+                return values[value]
+            elif (
+                not isinstance(value, ir.Instruction)
+                or value.block not in loop.blocks
+            ):
+                return InductionVariable(None, 0, {value: 1}, 0)
+
+        if isinstance(instruction, ir.Binop):
+            a = operand(instruction.a)
+            b = operand(instruction.b)
+            if a is None or b is None:
+                return None
+            operation = instruction.operation
+            if operation == "+":
+                return a + b
+            elif operation == "-":
+                return a + b.scale(-1)
+            elif operation == "*":
+                if b.is_constant:
+                    return a.scale(b.constant)
+                elif a.is_constant:
+                    return b.scale(a.constant)
+            elif operation == "<<":
+                # Each type has at least 16 bits:
+                if b.is_constant and 0 <= b.constant < 16:
+                    return a.scale(1 << b.constant)
+        elif isinstance(instruction, ir.Unop):
+            a = operand(instruction.a)
+            if a is not None and instruction.operation == "-":
+                return a.scale(-1)
+        elif isinstance(instruction, ir.Cast):
+            # Only a sign extension of a value which does not overflow is
+            # linear. Signed overflow of int and wider types is undefined in
+            # C, but narrower values, such as a char which is incremented,
+            # wrap around. A truncation wraps around as well:
+            src_ty = instruction.src.ty
+            if (
+                src_ty.is_integer
+                and src_ty.is_signed
+                and src_ty.bits >= 32
+                and (
+                    instruction.ty is ir.ptr
+                    or (
+                        instruction.ty.is_integer
+                        and instruction.ty.bits >= src_ty.bits
+                    )
+                )
+            ):
+                return operand(instruction.src)
+
+
+def _is_linear_type(ty):
+    return ty.is_integer or ty is ir.ptr
+
+
+def trip_count(init, step, cond, limit):
+    """Determine how often a loop runs, which starts with a counter at
+    init, adds step to it in each iteration, and continues while the
+    counter <cond> limit holds.
+
+    Returns None when the loop does not run at all, or does not end.
+    """
+    # Imported here, since cjmp imports this module via transform:
+    from .cjmp import CONDITIONS
+
+    if not CONDITIONS[cond](init, limit):
+        return None
+    elif cond == "==":
+        return 1
+    elif cond == "!=":
+        distance, remainder = divmod(limit - init, step)
+        if remainder or distance <= 0:
+            return None
+        return distance
+    elif cond in ("<", "<=") and step > 0:
+        if cond == "<=":
+            limit += 1
+        return -((init - limit) // step)
+    elif cond in (">", ">=") and step < 0:
+        if cond == ">=":
+            limit -= 1
+        return -((limit - init) // -step)
+
+
+def constant_trip_count(loop, basic, test):
+    """Determine how often a loop runs, which is left by a conditional
+    jump comparing a basic induction variable to a constant.
+
+    Returns None when this is not a constant number of iterations, or
+    when the induction variable could wrap around.
+    """
+    from .cjmp import NEGATED_CONDITIONS, SWAPPED_CONDITIONS
+
+    phi = basic.phi
+    if not (
+        phi.ty.is_integer
+        and isinstance(basic.init, ir.Const)
+        and isinstance(basic.init.value, int)
+    ):
+        return None
+
+    # Write the test as phi <cond> limit, with the loop continuing
+    # while the condition holds:
+    if test.a is phi:
+        cond, limit = test.cond, test.b
+    elif test.b is phi:
+        cond, limit = SWAPPED_CONDITIONS[test.cond], test.a
+    else:
+        return None
+    if not (isinstance(limit, ir.Const) and isinstance(limit.value, int)):
+        return None
+    stays = test.lab_yes in loop.blocks
+    if stays == (test.lab_no in loop.blocks):
+        return None
+    if not stays:
+        cond = NEGATED_CONDITIONS[cond]
+
+    init = basic.init.value
+    iterations = trip_count(init, basic.step, cond, limit.value)
+    if iterations is None:
+        return None
+    final = init + iterations * basic.step
+    if not all(fits_type(v, phi.ty) for v in (init, final, limit.value)):
+        return None
+    return iterations
+
+
+def fits_type(value, ty):
+    """ Test if a number can be represented by an integer type """
+    if ty.is_signed:
+        return -(2 ** (ty.bits - 1)) <= value < 2 ** (ty.bits - 1)
+    else:
+        return 0 <= value < 2 ** ty.bits
+
+
+class UseDefInfo:
+    """ The definitions of a function, and their order """
+
+    def __init__(self, function, dominator_tree):
+        self.dominator_tree = dominator_tree
+        self.definitions = list(function.arguments)
+        self.ranks = {}
+        for block in function:
+            for rank, instruction in enumerate(block):
+                self.ranks[instruction] = rank
+                if isinstance(instruction, ir.Value):
+                    self.definitions.append(instruction)
+
+    def dominates(self, one, another):
+        """ Test if instruction one is executed before another on all
+        paths to another.
+        """
+        if one.block is another.block:
+            return self.ranks[one] < self.ranks[another]
+        else:
+            return self.dominator_tree.strictly_dominates(
+                one.block, another.block
+            )
+
+
+class UseDefAnalysis(FunctionAnalysis):
+    """ The values defined in a function, as :class:`UseDefInfo`. The uses
+    of a value are available as its used_by attribute.
+    """
+
+    requires = (DominatorTreeAnalysis,)
+
+    def run(self, function, analysis_manager):
+        return UseDefInfo(
+            function, analysis_manager.get(DominatorTreeAnalysis, function)
+        )
+
+
+# Analyses which only depend on the blocks and edges between them:
+CFG_ANALYSES = (
+    CfgAnalysis,
+    DominatorTreeAnalysis,
+    PostDominatorTreeAnalysis,
+    DominanceFrontierAnalysis,
+    LoopAnalysis,
+)
+
+
+class AnalysisManager:
+    """Calculates analyses on demand, and caches the results per function.
+
+    When a pass changes a function, it must invalidate the analyses it
+    did not preserve.
+    """
+
+    def __init__(self):
+        self._results = {}
+
+    def get(self, analysis, function):
+        """ Get the result of an analysis of the given function """
+        results = self._results.setdefault(function, {})
+        if analysis not in results:
+            with timed("analysis"):
+                results[analysis] = analysis().run(function, self)
+        return results[analysis]
+
+    def store(self, analysis, function, result):
+        """ Store a result of an analysis which was calculated elsewhere """
+        self.invalidate(function)
+        self._results.setdefault(function, {})[analysis] = result
+
+    def is_cached(self, analysis, function):
+        """ Test if the result of an analysis is available """
+        return analysis in self._results.get(function, ())
+
+    def invalidate(self, function, preserved=()):
+        """Invalidate the analyses of the given function.
+
+        The analyses in preserved are kept, as long as the analyses they
+        depend upon are also preserved.
+        """
+        results = self._results.get(function)
+        if results:
+            for analysis in list(results):
+                if not _is_preserved(analysis, preserved):
+                    del results[analysis]
+
+    def forget(self, function):
+        """ Forget the analyses of a function which was removed """
+        self._results.pop(function, None)
+
+    def clear(self):
+        """ Forget all cached analysis results """
+        self._results.clear()
+
+
+def _is_preserved(analysis, preserved):
+    return analysis in preserved and all(
+        _is_preserved(required, preserved) for required in analysis.requires
+    )
+
+
+def depends_on(analysis, other):
+    """ Test if an analysis is, or is calculated from, another analysis """
+    return analysis is other or any(
+        depends_on(required, other) for required in analysis.requires
+    )
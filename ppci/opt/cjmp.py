@@ -3,7 +3,62 @@ from .transform import InstructionPass
 from .. import ir
 
 
+CONDITIONS = {
+    "==": operator.eq,
+    "<": operator.lt,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "!=": operator.ne,
+}
+
+# The condition with the operands swapped:
+SWAPPED_CONDITIONS = {
+    "==": "==",
+    "!=": "!=",
+    "<": ">",
+    ">": "<",
+    "<=": ">=",
+    ">=": "<=",
+}
+
+# The condition which holds when the condition does not hold:
+NEGATED_CONDITIONS = {
+    "==": "!=",
+    "!=": "==",
+    "<": ">=",
+    ">": "<=",
+    "<=": ">",
+    ">=": "<",
+}
+
+
+def replace_by_jump(instruction, label):
+    """ Replace a conditional jump by a jump to one of its targets """
+    block = instruction.block
+    for other in set(instruction.targets):
+        if other is not label:
+            for phi in other.phis:
+                phi.del_incoming(block)
+    block.remove_instruction(instruction)
+    block.add_instruction(ir.Jump(label))
+    instruction.delete()
+
+
 class CJumpPass(InstructionPass):
+    """Replace conditional jumps on two constants, and jump tables on a
+    constant, by a jump.
+
+    The branch which is never taken is removed, together with the blocks
+    which are not reachable anymore.
+    """
+
+    def on_function(self, function):
+        changed = super().on_function(function)
+        if changed:
+            function.delete_unreachable()
+        return changed
+
     def on_instruction(self, instruction):
         if (
             isinstance(instruction, ir.CJump)
@@ -12,19 +67,16 @@ class CJumpPass(InstructionPass):
         ):
             a = instruction.a.value
             b = instruction.b.value
-            mp = {
-                "==": operator.eq,
-                "<": operator.lt,
-                ">": operator.gt,
-                ">=": operator.ge,
-                "<=": operator.le,
-                "!=": operator.ne,
-            }
-            if mp[instruction.cond](a, b):
+            if CONDITIONS[instruction.cond](a, b):
                 label = instruction.lab_yes
             else:
                 label = instruction.lab_no
-            block = instruction.block
-            block.remove_instruction(instruction)
-            block.add_instruction(ir.Jump(label))
-            instruction.delete()
+            replace_by_jump(instruction, label)
+            return True
+        elif isinstance(instruction, ir.JumpTable) and isinstance(
+            instruction.v, ir.Const
+        ):
+            label = instruction.get_target(instruction.v.value)
+            replace_by_jump(instruction, label)
+            return True
+        return False
@@ -25,8 +25,9 @@ class CleanPass(FunctionPass):
     """
 
     def on_function(self, function):
-        self.remove_empty_blocks(function)
-        self.remove_one_preds(function)
+        removed = self.remove_empty_blocks(function)
+        glued = self.remove_one_preds(function)
+        return removed or glued
 
     def find_empty_blocks(self, function):
         """ Look for all blocks containing only a jump in it """
@@ -49,12 +50,22 @@ class CleanPass(FunctionPass):
             if block in predecessors:
                 continue
 
+            # Do not remove if a predecessor also jumps to the target, with
+            # another value for a phi of the target:
+            tgt = block.last_instruction.target
+            if any(
+                phi.get_value(pred) is not phi.get_value(block)
+                for phi in tgt.phis
+                for pred in predecessors
+                if pred in phi.inputs
+            ):
+                continue
+
             # Update successor incoming blocks:
             for successor in successors:
                 successor.replace_incoming(block, predecessors)
 
             # Change the target of predecessors:
-            tgt = block.last_instruction.target
             for pred in predecessors:
                 pred.change_target(block, tgt)
 
@@ -64,6 +75,7 @@ class CleanPass(FunctionPass):
             stat += 1
         if stat > 0:
             self.logger.debug("Removed %s empty blocks", stat)
+        return stat > 0
 
     def find_single_predecessor_block(self, function):
         """ Find a block with a single predecessor """
@@ -86,6 +98,7 @@ class CleanPass(FunctionPass):
 
     def remove_one_preds(self, function):
         """ Remove basic blocks with only one predecessor """
+        glued = False
         change = True
         while change:
             change = False
@@ -93,7 +106,8 @@ class CleanPass(FunctionPass):
             if block is not None:
                 (pred,) = block.predecessors  # Unpack 1 block
                 self.glue_blocks(pred, block)
-                change = True
+                change = glued = True
+        return glued
 
     def glue_blocks(self, block1, block2):
         """ Glue two blocks together into the first block """
@@ -106,12 +120,17 @@ class CleanPass(FunctionPass):
         block1.remove_instruction(last_jump)
         last_jump.delete()
 
+        # Phis in block2 have a single input, from block1:
+        for phi in block2.phis:
+            phi.replace_by(phi.get_value(block1))
+            phi.remove_from_block()
+
         # Copy all instructions to block1:
         for instruction in block2:
             block1.add_instruction(instruction)
 
-        # Replace incoming info:
-        for successor in block2.successors:
+        # Replace incoming info, once for each successor:
+        for successor in dict.fromkeys(block2.successors):
             successor.replace_incoming(block2, [block1])
 
         # Remove block from function:
@@ -1,5 +1,6 @@
 import operator
 from .transform import BlockPass
+from .analysis import CFG_ANALYSES
 from .. import ir
 
 
@@ -28,19 +29,40 @@ def enhance(f):
     return lambda ty, a, b: correct(f(a, b), ty)
 
 
+def remainder(a, b):
+    """ Remainder of a division, which has the sign of a, as in C """
+    value = abs(a) % abs(b)
+    return -value if a < 0 else value
+
+
+# Integer operations which can be evaluated at compile time:
+OPERATIONS = {
+    "+": enhance(operator.add),
+    "-": enhance(operator.sub),
+    "*": enhance(operator.mul),
+    "%": enhance(remainder),
+    "<<": enhance(operator.lshift),
+    ">>": enhance(operator.rshift),
+}
+
+# Pointer operations, which are only folded when the result is the same on
+# each target. Pointers have at least 16 bits:
+POINTER_OPERATIONS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "<<": operator.lshift,
+}
+
+
 class ConstantFolder(BlockPass):
     """ Try to fold common constant expressions """
 
+    preserves = CFG_ANALYSES
+
     def __init__(self):
         super().__init__()
-        self.ops = {
-            "+": enhance(operator.add),
-            "-": enhance(operator.sub),
-            "*": enhance(operator.mul),
-            "%": enhance(operator.mod),
-            "<<": enhance(operator.lshift),
-            ">>": enhance(operator.rshift),
-        }
+        self.ops = OPERATIONS
 
     def is_const(self, value):
         """ Determine if a value can be evaluated as a constant value """
@@ -49,6 +71,13 @@ class ConstantFolder(BlockPass):
         elif isinstance(value, ir.Cast):
             return self.is_const(value.src)
         elif isinstance(value, ir.Binop):
+            if value.ty is ir.ptr:
+                return (
+                    value.operation in POINTER_OPERATIONS
+                    and self.is_const(value.a)
+                    and self.is_const(value.b)
+                    and 0 <= self.eval_const(value).value < 2 ** 16
+                )
             return (
                 value.operation in self.ops
                 and value.ty.is_integer
@@ -67,7 +96,10 @@ class ConstantFolder(BlockPass):
             b = self.eval_const(value.b)
             assert a.ty is b.ty
             assert a.ty is value.ty
-            res = self.ops[value.operation](value.ty, a.value, b.value)
+            if value.ty is ir.ptr:
+                res = POINTER_OPERATIONS[value.operation](a.value, b.value)
+            else:
+                res = self.ops[value.operation](value.ty, a.value, b.value)
             return ir.Const(res, "new_fold", a.ty)
         elif isinstance(value, ir.Cast):
             c_val = self.eval_const(value.src)
@@ -85,6 +117,10 @@ class ConstantFolder(BlockPass):
                 continue
 
             if self.is_const(instruction):
+                if not instruction.is_used:
+                    # Folded before, or dead code:
+                    continue
+
                 # Now we can replace x = (4+5) with x = 9
                 cnst = self.eval_const(instruction)
                 block.insert_instruction(cnst, before_instruction=instruction)
@@ -135,3 +171,4 @@ class ConstantFolder(BlockPass):
                     count += 1
         if count > 0:
             self.logger.debug("Folded %i expressions", count)
+        return count > 0
@@ -0,0 +1,178 @@
+""" Dead store elimination.
+
+A store is dead when the memory it writes is written again on each path
+after it, before the memory is read. A store into a local allocation is
+also dead when the allocation is not read anymore before the function
+returns. The alias analysis tells which instructions might read the
+memory.
+"""
+
+from .. import ir
+from .alias import AliasAnalysis
+from .analysis import CFG_ANALYSES, reverse_post_order
+from .transform import FunctionPass
+
+
+class DeadStoreEliminationPass(FunctionPass):
+    """Remove stores of which the value is overwritten before it is read.
+
+    For each block, the locations which are overwritten on all paths before
+    being read are determined, by iterating backwards over the blocks until
+    nothing changes anymore. Stores to these locations are removed.
+
+    Blocks in a loop which never ends do not reach the end of the function,
+    so no store is removed there.
+    """
+
+    requires = (AliasAnalysis,)
+    preserves = CFG_ANALYSES
+
+    def on_function(self, function):
+        self.alias_info = self.get_analysis(AliasAnalysis, function)
+        blocks = reverse_post_order(function)
+        exits = self.get_blocks_reaching_exit(blocks)
+
+        # At the end of the function, the local allocations are not read:
+        exit_locations = frozenset(
+            (self.alias_info.get_location(alloc, alloc.amount), None)
+            for alloc in self.alias_info.local_objects
+        )
+
+        # Determine the overwritten locations at the start of each block,
+        # where None means all locations:
+        overwritten = {block: None for block in blocks}
+        change = True
+        while change:
+            change = False
+            for block in reversed(blocks):
+                locations = self.on_block(
+                    block,
+                    self.get_overwritten(block, overwritten, exit_locations),
+                )
+                if block not in exits:
+                    locations = frozenset()
+                if locations != overwritten[block]:
+                    overwritten[block] = locations
+                    change = True
+
+        dead = []
+        for block in blocks:
+            self.on_block(
+                block,
+                self.get_overwritten(block, overwritten, exit_locations),
+                dead,
+            )
+        for store in dead:
+            store.remove_from_block()
+
+        self.alias_info = None
+        if dead:
+            self.logger.debug("Removed %i dead stores", len(dead))
+        return bool(dead)
+
+    def get_blocks_reaching_exit(self, blocks):
+        """ Get the blocks from which the end of the function is reached """
+        reached = set()
+        worklist = [block for block in blocks if not block.successors]
+        while worklist:
+            block = worklist.pop()
+            if block not in reached:
+                reached.add(block)
+                worklist.extend(block.predecessors)
+        return reached
+
+    def get_overwritten(self, block, overwritten, exit_locations):
+        """Get the locations which are overwritten before being read, at the
+        end of a block.
+        """
+        successors = block.successors
+        if not successors:
+            return exit_locations
+        locations = None
+        for successor in successors:
+            other = overwritten.get(successor, frozenset())
+            if other is None:
+                continue
+            elif locations is None:
+                locations = other
+            else:
+                locations = locations & other
+        return locations
+
+    def on_block(self, block, locations, dead=None):
+        """Get the locations which are overwritten before being read at the
+        start of a block, given those at its end.
+
+        The dead stores are added to dead, when given.
+        """
+        if locations is None:
+            return None
+
+        alias_info = self.alias_info
+        locations = set(locations)
+        for instruction in reversed(block.instructions):
+            if isinstance(instruction, ir.Value):
+                # Before its definition, a value might have been another
+                # address, for example in a previous iteration of a loop:
+                for key in list(locations):
+                    if key[0].base is instruction:
+                        locations.remove(key)
+
+            if isinstance(instruction, ir.Store):
+                location = alias_info.get_access_location(instruction)
+                key = (location, instruction.value.ty)
+                if dead is not None and not instruction.volatile:
+                    if key in locations or self.is_unused(location, locations):
+                        dead.append(instruction)
+                if isinstance(instruction.value, ir.Alloc):
+                    # The contents of the allocation are copied:
+                    self.remove_read(
+                        alias_info.get_location(
+                            instruction.value, instruction.value.amount
+                        ),
+                        locations,
+                    )
+                locations.add(key)
+            elif isinstance(instruction, ir.Load):
+                self.remove_read(
+                    alias_info.get_access_location(instruction), locations
+                )
+            elif isinstance(instruction, ir.CopyBlob):
+                self.remove_read(
+                    alias_info.get_location(
+                        instruction.src, instruction.amount
+                    ),
+                    locations,
+                )
+            elif isinstance(
+                instruction,
+                (
+                    ir.FunctionCall,
+                    ir.ProcedureCall,
+                    ir.InlineAsm,
+                    ir.Return,
+                    ir.Exit,
+                ),
+            ):
+                # Only the local allocations cannot be read:
+                locations = set(
+                    key for key in locations if alias_info.is_local(key[0])
+                )
+        return frozenset(locations)
+
+    def is_unused(self, location, locations):
+        """Test if location is in a local allocation which is not read
+        anymore.
+        """
+        alias_info = self.alias_info
+        obj = alias_info.get_object(location.base)
+        return (
+            obj in alias_info.local_objects
+            and (alias_info.get_location(obj, obj.amount), None) in locations
+        )
+
+    def remove_read(self, location, locations):
+        """ Remove the locations which might be read at location """
+        for key in list(locations):
+            if self.alias_info.may_alias(key[0], location):
+                locations.remove(key)
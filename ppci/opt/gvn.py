@@ -0,0 +1,135 @@
+""" Global value numbering.
+
+Value numbering finds instructions which compute the same value as an
+instruction before them, and replaces their uses by the earlier value.
+This pass visits the blocks in the order of the dominator tree, such that
+a value computed in a block can be reused in all blocks it dominates.
+"""
+
+from collections import ChainMap
+from .. import ir
+from .analysis import CFG_ANALYSES, DominatorTreeAnalysis
+from .transform import FunctionPass
+
+
+COMMUTATIVE_OPERATIONS = ("+", "*", "&", "|", "^")
+
+# Instructions which might change the contents of memory:
+MEMORY_WRITES = (
+    ir.Store,
+    ir.CopyBlob,
+    ir.FunctionCall,
+    ir.ProcedureCall,
+    ir.InlineAsm,
+)
+
+
+class GlobalValueNumberingPass(FunctionPass):
+    """Replace expressions which were already computed in a dominating
+    block by the earlier value.
+
+    Binary and unary operations, casts and addresses are looked up in a
+    scoped hash table. Each block adds a scope, which is visible in the
+    blocks it dominates.
+
+    Loads are reused as long as memory was not written in between. Since
+    memory might be written on another path into a block, loads are only
+    reused in blocks with a single predecessor, such as the branches of an
+    if statement.
+
+    Constants are only reused within a block, so they are not kept in a
+    register over a long distance.
+    """
+
+    requires = (DominatorTreeAnalysis,)
+    preserves = CFG_ANALYSES
+
+    def on_function(self, function):
+        dominator_tree = self.get_analysis(DominatorTreeAnalysis, function)
+        count = 0
+        worklist = [(function.entry, ChainMap(), {})]
+        while worklist:
+            block, values, loads = worklist.pop()
+            values = values.new_child()
+            if len(block.predecessors) != 1:
+                # Memory might be written on another path into this block:
+                loads = {}
+            else:
+                loads = dict(loads)
+            count += self.on_block(block, values, loads)
+            for child in reversed(dominator_tree.children(block)):
+                worklist.append((child, values, loads))
+
+        if count > 0:
+            self.logger.debug("Replaced %i redundant values", count)
+        return count > 0
+
+    def on_block(self, block, values, loads):
+        """Number the values in a block.
+
+        Returns the number of values which were replaced.
+        """
+        constants = {}
+        count = 0
+        for instruction in block:
+            if isinstance(instruction, ir.Load):
+                if instruction.volatile:
+                    continue
+                table = loads
+                key = (instruction.address, instruction.ty)
+            elif isinstance(instruction, MEMORY_WRITES):
+                loads.clear()
+                if isinstance(instruction, ir.Store):
+                    # A load after the store gives the stored value:
+                    key = (instruction.address, instruction.value.ty)
+                    loads[key] = instruction.value
+                continue
+            elif isinstance(instruction, ir.Const):
+                table = constants
+                key = constant_key(instruction)
+            else:
+                table = values
+                key = self.get_key(instruction)
+                if key is None:
+                    continue
+
+            if key in table:
+                if instruction.is_used:
+                    instruction.replace_by(table[key])
+                    count += 1
+            else:
+                table[key] = instruction
+        return count
+
+    def get_key(self, instruction):
+        """ Get a key which is equal for instructions with the same value """
+        if isinstance(instruction, ir.Binop):
+            a = self.get_operand_key(instruction.a)
+            b = self.get_operand_key(instruction.b)
+            operation = instruction.operation
+            if operation in COMMUTATIVE_OPERATIONS:
+                # Give a + b and b + a the same key:
+                return (frozenset((a, b)), operation, instruction.ty)
+            return (a, operation, b, instruction.ty)
+        elif isinstance(instruction, ir.Unop):
+            a = self.get_operand_key(instruction.a)
+            return (instruction.operation, a, instruction.ty)
+        elif isinstance(instruction, ir.Cast):
+            src = self.get_operand_key(instruction.src)
+            return ("cast", src, instruction.ty)
+        elif isinstance(instruction, ir.AddressOf):
+            return ("addressof", instruction.src)
+
+    def get_operand_key(self, value):
+        """Get a key for an operand. Each block has its own constants, so
+        constants are compared by their value.
+        """
+        if isinstance(value, ir.Const):
+            return constant_key(value)
+        return value
+
+
+def constant_key(constant):
+    """ Get a key which is equal for constants with the same value """
+    # The representation tells apart 0.0 and -0.0, which compare equal:
+    return ("const", repr(constant.value), constant.ty)
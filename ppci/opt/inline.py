@@ -1,12 +1,329 @@
+""" Function inlining.
+
+Inlining replaces a call by a copy of the body of the called function. This
+removes the overhead of the call, and allows the other passes to optimize the
+copied code together with the code around the call.
+"""
+
+from itertools import chain
 from .. import ir
+from ..graph.callgraph import mod_to_call_graph
+from .analysis import AnalysisManager, reverse_post_order
+from .transform import ModulePass, get_name_references
+
+
+def can_inline(call, function):
+    """ Test if the given call can be replaced by the body of function """
+    if not isinstance(function, ir.SubRoutine) or not function.blocks:
+        return False
+
+    if isinstance(call, ir.FunctionCall):
+        if not (function.is_function and function.return_ty is call.ty):
+            return False
+    elif not function.is_procedure:
+        return False
+
+    if len(call.arguments) != len(function.arguments):
+        return False
+    if any(
+        a.ty is not p.ty for a, p in zip(call.arguments, function.arguments)
+    ):
+        return False
+
+    # Inline assembly might define labels, which must be unique:
+    return not any(
+        isinstance(i, ir.InlineAsm) for i in function.get_instructions()
+    )
+
+
+def inline_function(call, function):
+    """Replace the call instruction with the function implementation.
+
+    The blocks of the called function are copied into the calling function,
+    the called function itself is not modified.
+    """
+    block = call.block
+    caller = block.function
+    num_blocks = len(caller.blocks)
+
+    # Block names are used as labels, so they must be unique in the module:
+    name = "{}_{}_return".format(caller.name, function.name)
+
+    # Move the instructions after the call into a new block:
+    tail = caller.add_block(ir.Block(name))
+    position = call.position
+    tail.instructions = block.instructions[position + 1:]
+    del block.instructions[position + 1:]
+    for instruction in tail:
+        instruction.block = tail
+    for successor in set(tail.successors):
+        successor.replace_incoming(block, [tail])
+
+    # Copy the blocks, such that values are defined before they are used:
+    value_map = dict(zip(function.arguments, call.arguments))
+    block_map = {}
+    blocks = reverse_post_order(function)
+    for original in blocks:
+        block_map[original] = caller.add_block(
+            ir.Block("{}_{}".format(caller.name, original.name))
+        )
+
+    phis = []
+    returns = []
+    for original in blocks:
+        copy = block_map[original]
+        for instruction in original:
+            if isinstance(instruction, ir.Phi):
+                new_instruction = ir.Phi(instruction.name, instruction.ty)
+                phis.append((instruction, new_instruction))
+            elif isinstance(instruction, (ir.Return, ir.Exit)):
+                if isinstance(instruction, ir.Return):
+                    result = instruction.result
+                    returns.append((copy, value_map.get(result, result)))
+                new_instruction = ir.Jump(tail)
+            elif isinstance(instruction, ir.Jump):
+                new_instruction = ir.Jump(block_map[instruction.target])
+            elif isinstance(instruction, ir.CJump):
+                new_instruction = ir.CJump(
+                    value_map.get(instruction.a, instruction.a),
+                    instruction.cond,
+                    value_map.get(instruction.b, instruction.b),
+                    block_map[instruction.lab_yes],
+                    block_map[instruction.lab_no],
+                )
+            elif isinstance(instruction, ir.JumpTable):
+                new_instruction = ir.JumpTable(
+                    value_map.get(instruction.v, instruction.v),
+                    [
+                        (value, block_map[target])
+                        for value, target in instruction.table
+                    ],
+                    block_map[instruction.lab_default],
+                )
+            else:
+                new_instruction = copy_instruction(instruction, value_map)
+            copy.add_instruction(new_instruction)
+            value_map[instruction] = new_instruction
+
+    for phi, new_phi in phis:
+        for incoming, value in phi.inputs.items():
+            if incoming in block_map:
+                new_phi.set_incoming(
+                    block_map[incoming], value_map.get(value, value)
+                )
+
+    # Replace the call by a jump into the copied blocks:
+    call.remove_from_block()
+    block.add_instruction(ir.Jump(block_map[function.entry]))
+    if isinstance(call, ir.FunctionCall):
+        if len(returns) == 1:
+            result = returns[0][1]
+        elif returns:
+            result = ir.Phi(call.name, call.ty)
+            tail.insert_instruction(result)
+            for return_block, value in returns:
+                result.set_incoming(return_block, value)
+        else:
+            # The function never returns:
+            result = ir.Undefined(call.name, call.ty)
+            tail.insert_instruction(result)
+        call.replace_by(result)
+
+    # Place the new blocks directly after the block with the call:
+    new_blocks = [block_map[b] for b in function.blocks if b in block_map]
+    del caller.blocks[num_blocks:]
+    index = caller.blocks.index(block) + 1
+    caller.blocks[index:index] = new_blocks + [tail]
+
+
+def copy_instruction(instruction, value_map):
+    """ Copy an instruction, and let it use the values in value_map """
+
+    def get(value):
+        return value_map.get(value, value)
+
+    if isinstance(instruction, ir.Alloc):
+        return ir.Alloc(
+            instruction.name, instruction.amount, instruction.alignment
+        )
+    elif isinstance(instruction, ir.AddressOf):
+        return ir.AddressOf(get(instruction.src), instruction.name)
+    elif isinstance(instruction, ir.Cast):
+        return ir.Cast(get(instruction.src), instruction.name, instruction.ty)
+    elif isinstance(instruction, ir.Undefined):
+        return ir.Undefined(instruction.name, instruction.ty)
+    elif isinstance(instruction, ir.Const):
+        return ir.Const(instruction.value, instruction.name, instruction.ty)
+    elif isinstance(instruction, ir.LiteralData):
+        return ir.LiteralData(instruction.data, instruction.name)
+    elif isinstance(instruction, ir.FunctionCall):
+        return ir.FunctionCall(
+            get(instruction.callee),
+            [get(a) for a in instruction.arguments],
+            instruction.name,
+            instruction.ty,
+        )
+    elif isinstance(instruction, ir.ProcedureCall):
+        return ir.ProcedureCall(
+            get(instruction.callee), [get(a) for a in instruction.arguments]
+        )
+    elif isinstance(instruction, ir.Unop):
+        return ir.Unop(
+            instruction.operation,
+            get(instruction.a),
+            instruction.name,
+            instruction.ty,
+        )
+    elif isinstance(instruction, ir.Binop):
+        return ir.Binop(
+            get(instruction.a),
+            instruction.operation,
+            get(instruction.b),
+            instruction.name,
+            instruction.ty,
+        )
+    elif isinstance(instruction, ir.Load):
+        return ir.Load(
+            get(instruction.address),
+            instruction.name,
+            instruction.ty,
+            volatile=instruction.volatile,
+        )
+    elif isinstance(instruction, ir.Store):
+        return ir.Store(
+            get(instruction.value),
+            get(instruction.address),
+            volatile=instruction.volatile,
+        )
+    elif isinstance(instruction, ir.CopyBlob):
+        return ir.CopyBlob(
+            get(instruction.dst), get(instruction.src), instruction.amount
+        )
+    else:  # pragma: no cover
+        raise NotImplementedError(str(instruction))
+
+
+class InlinePass(ModulePass):
+    """Inline calls to small functions, and to local functions which are
+    called only once.
+
+    The call graph is visited bottom-up, so a function is inlined after the
+    calls inside it were inlined. Calls between the functions of a
+    recursive cycle are not inlined.
+
+    The size of a function is its number of instructions, minus the
+    instructions needed for the call itself. A function is inlined when
+    its size is at most the threshold. A local function with a single
+    call is always inlined, and removed from the module afterwards.
+
+    Optionally, call_counts maps function names to the number of times
+    they were called in a profile run. The threshold of functions which
+    were called is multiplied by hot_factor, and functions which were
+    never called are only inlined when this does not make the code larger.
+
+    This pass leaves the cleanup of the inlined code, such as propagating
+    constant arguments, to the passes which run after it.
+    """
+
+    def __init__(self, threshold=10, call_counts=None, hot_factor=4):
+        super().__init__()
+        self.threshold = threshold
+        self.call_counts = call_counts
+        self.hot_factor = hot_factor
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, self.threshold)
+
+    def run(self, ir_module, analysis_manager=None):
+        self.analysis_manager = analysis_manager or AnalysisManager()
+        # Variables and inline assembly can refer to functions by name:
+        self.names = set(
+            name
+            for value in chain(ir_module.variables, ir_module.functions)
+            for name in get_name_references(value)
+        )
+        call_graph = mod_to_call_graph(ir_module)
+        inlined = set()
+        for component in call_graph.bottom_up():
+            for function in component:
+                if isinstance(function, ir.SubRoutine):
+                    inlined.update(self.on_function(function, component))
+
+        # Remove local functions which are not called anymore:
+        removed = 0
+        for function in list(ir_module.functions):
+            if function in inlined and not is_referenced(
+                function, self.names
+            ):
+                self.analysis_manager.forget(function)
+                ir_module.remove_function(function)
+                removed += 1
+        self.analysis_manager = None
+        self.names = None
+
+        if inlined:
+            self.logger.debug(
+                "Inlined %s functions, removed %s", len(inlined), removed
+            )
+        return bool(inlined)
+
+    def on_function(self, function, recursive):
+        """Inline the calls in the given function.
+
+        Returns the functions which were inlined.
+        """
+        inlined = set()
+        for call in function.get_out_calls():
+            callee = call.callee
+            if callee in recursive or not can_inline(call, callee):
+                continue
+
+            if self.should_inline(call, callee):
+                self.logger.debug(
+                    "Inlining %s into %s", callee.name, function.name
+                )
+                inline_function(call, callee)
+                inlined.add(callee)
+
+        if inlined:
+            function.delete_unreachable()
+            self.analysis_manager.invalidate(function)
+        return inlined
+
+    def should_inline(self, call, function):
+        """ Decide if inlining the function at the given call pays off """
+        if function.binding == ir.Binding.LOCAL and is_called_once(
+            function, self.names
+        ):
+            return True
+
+        threshold = self.threshold
+        if self.call_counts is not None:
+            if self.call_counts.get(function.name, 0):
+                threshold *= self.hot_factor
+            else:
+                threshold = 0
+
+        # The call itself, and the instructions to pass the arguments:
+        call_size = len(call.arguments) + 2
+        return function.num_instructions() - call_size <= threshold
+
+
+def is_referenced(function, names):
+    """Test if a function is used, either by an instruction or by its
+    name, which is in names.
+    """
+    return function.is_used or function.name in names
 
 
-def inline_function(call: ir.ProcedureCall, function: ir.SubRoutine):
-    """ Replace the call instruction with the function implementation """
-    dst_function = call.function
-    for block in function:
-        block_copy = block.copy
-        dst_function.add_block(block_copy)
+def is_called_once(function, names):
+    """ Test if a function is called once, and not referenced otherwise """
+    if len(function.used_by) != 1:
+        return False
 
-    for value, parameter in zip(call.arguments, function.arguments):
-        block
+    call = next(iter(function.used_by))
+    if not isinstance(call, (ir.FunctionCall, ir.ProcedureCall)):
+        return False
+    if any(a is function for a in call.arguments):
+        return False
+    return function.name not in names
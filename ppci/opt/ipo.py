@@ -0,0 +1,214 @@
+""" Interprocedural optimizations.
+
+These passes change the signature of a function together with all calls to
+it. This is only possible for functions with local binding, which are only
+called directly. The address of such a function is not used anywhere else,
+so all calls to it are known.
+
+When all calls pass the same constant for a parameter, the constant can be
+used in the function itself. A parameter which is not used by the function
+can then be removed from the function and from the calls, and so can a
+return value which is not used by any of the calls.
+"""
+
+from itertools import chain
+from .. import ir
+from .transform import ModulePass, get_name_references, same_value
+
+
+class InterproceduralConstantPropagationPass(ModulePass):
+    """Replace parameters by the constant which all calls pass for them.
+
+    The value passed by a recursive call for the same parameter does not
+    count. Instead of a constant, all calls can also pass the same global
+    value, such as the address of a variable.
+    """
+
+    def run(self, ir_module, analysis_manager=None):
+        propagated = 0
+        for function, calls in get_call_sites(ir_module).items():
+            for parameter, value in zip(
+                function.arguments, self.get_arguments(function, calls)
+            ):
+                if value is None or not parameter.is_used:
+                    continue
+                if isinstance(value, ir.Const):
+                    value = ir.Const(value.value, parameter.name, value.ty)
+                    entry = function.entry
+                    first = entry.instructions[len(entry.phis)]
+                    entry.insert_instruction(value, before_instruction=first)
+                parameter.replace_by(value)
+                propagated += 1
+                if analysis_manager:
+                    analysis_manager.invalidate(function)
+
+        if propagated > 0:
+            self.logger.debug("Propagated %i arguments", propagated)
+        return propagated > 0
+
+    def get_arguments(self, function, calls):
+        """Get the value which all calls pass for each parameter, or None
+        when the calls pass different values.
+        """
+        for parameter in function.arguments:
+            values = [
+                call.arguments[parameter.num]
+                for call in calls
+                if not (
+                    call.function is function
+                    and call.arguments[parameter.num] is parameter
+                )
+            ]
+            # Values local to a caller cannot be used in the function:
+            if (
+                values
+                and isinstance(values[0], (ir.Const, ir.GlobalValue))
+                and all(same_value(values[0], v) for v in values)
+            ):
+                yield values[0]
+            else:
+                yield None
+
+
+class DeadArgumentEliminationPass(ModulePass):
+    """Remove the parameters which a function does not use, and the return
+    value of a function when no call uses it.
+
+    The arguments are removed from the calls as well. A function without a
+    used return value becomes a procedure.
+    """
+
+    def run(self, ir_module, analysis_manager=None):
+        removed = 0
+        for function, calls in get_call_sites(ir_module).items():
+            callers = {call.function for call in calls}
+            changed = False
+            unused = [p for p in function.arguments if not p.is_used]
+            if unused:
+                self.remove_parameters(function, calls, unused)
+                removed += len(unused)
+                changed = True
+
+            if function.is_function and not any(c.is_used for c in calls):
+                new_function = self.remove_return_value(
+                    ir_module, function, calls
+                )
+                if analysis_manager:
+                    analysis_manager.forget(function)
+                function = new_function
+                removed += 1
+                changed = True
+
+            if changed and analysis_manager:
+                analysis_manager.invalidate(function)
+                for caller in callers:
+                    analysis_manager.invalidate(caller)
+
+        if removed > 0:
+            self.logger.debug(
+                "Removed %i arguments and return values", removed
+            )
+        return removed > 0
+
+    def remove_parameters(self, function, calls, unused):
+        """ Remove the unused parameters from a function and its calls """
+        self.logger.debug(
+            "Removing %s from %s",
+            ", ".join(p.name for p in unused),
+            function.name,
+        )
+        positions = [p.num for p in unused]
+        for call in calls:
+            removed = [call.arguments[i] for i in positions]
+            call.arguments[:] = [
+                argument
+                for i, argument in enumerate(call.arguments)
+                if i not in positions
+            ]
+            for argument in removed:
+                call.drop_use(argument)
+
+        function.arguments[:] = [
+            p for p in function.arguments if p not in unused
+        ]
+        for num, parameter in enumerate(function.arguments):
+            parameter.num = num
+
+    def remove_return_value(self, ir_module, function, calls):
+        """ Replace a function by a procedure, and its calls as well """
+        self.logger.debug("Removing return value of %s", function.name)
+        procedure = ir.Procedure(function.name, function.binding)
+        procedure.blocks = function.blocks
+        procedure.entry = function.entry
+        procedure.arguments = function.arguments
+        procedure.defined_names = function.defined_names
+        procedure.unique_counter = function.unique_counter
+        function.blocks = []
+        for block in procedure:
+            block.function = procedure
+            if isinstance(block.last_instruction, ir.Return):
+                block.last_instruction.remove_from_block()
+                block.add_instruction(ir.Exit())
+
+        # Replace the function by the procedure at the same position:
+        position = ir_module.functions.index(function)
+        ir_module.remove_function(function)
+        ir_module.add_function(procedure)
+        ir_module.functions.insert(position, ir_module.functions.pop())
+        if ir_module.debug_db:
+            ir_module.debug_db.map(function, procedure)
+
+        for call in calls:
+            new_call = ir.ProcedureCall(procedure, call.arguments)
+            call.block.insert_instruction(new_call, before_instruction=call)
+            call.remove_from_block()
+        return procedure
+
+
+def get_call_sites(ir_module):
+    """Get the functions of which all calls are known, together with these
+    calls.
+
+    These are the functions with local binding, which are only used as the
+    callee of calls with the right number and types of arguments.
+    """
+    # Initial values of variables and inline assembly refer to functions
+    # by their name:
+    names = set()
+    for value in chain(ir_module.variables, ir_module.functions):
+        names.update(get_name_references(value))
+
+    call_sites = {}
+    for function in ir_module.functions:
+        if (
+            function.binding != ir.Binding.LOCAL
+            or not function.blocks
+            or function.name in names
+        ):
+            continue
+        calls = list(function.used_by)
+        if calls and all(is_call(call, function) for call in calls):
+            call_sites[function] = calls
+    return call_sites
+
+
+def is_call(instruction, function):
+    """ Test if the instruction is a proper call of the function """
+    if isinstance(instruction, ir.FunctionCall):
+        if not (function.is_function and function.return_ty is instruction.ty):
+            return False
+    elif isinstance(instruction, ir.ProcedureCall):
+        if not function.is_procedure:
+            return False
+    else:
+        return False
+
+    if instruction.callee is not function:
+        return False
+    if any(argument is function for argument in instruction.arguments):
+        return False
+    if len(instruction.arguments) != len(function.arguments):
+        return False
+    return all(
+        a.ty is p.ty for a, p in zip(instruction.arguments, function.arguments)
+    )
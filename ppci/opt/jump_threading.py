@@ -0,0 +1,264 @@
+""" Jump threading.
+
+When the direction of a conditional jump is known on the edge from one of
+the predecessors of its block, this predecessor can jump to the right
+target at once. This happens for example when a phi of constants is
+compared to a constant, as generated for the ``&&`` and ``||`` operators,
+or for a state variable which is tested by a chain of comparisons.
+
+The direction is also known when the predecessor ends with the same test,
+since the values in the test cannot change in between.
+"""
+
+from .. import ir
+from .analysis import DominatorTreeAnalysis
+from .cjmp import CONDITIONS, replace_by_jump
+from .cjmp import NEGATED_CONDITIONS, SWAPPED_CONDITIONS
+from .transform import FunctionPass, same_value
+
+
+class JumpThreadingPass(FunctionPass):
+    """Let jumps skip blocks whose outcome is known for that jump.
+
+    A block can be skipped when it only contains phis, constants and the
+    jump at its end, and these values are only used in the skipped blocks
+    or by phis. Several blocks can be skipped at once, when the blocks
+    after the first one have no phis. Blocks with only a jump are skipped
+    as well, which folds chains of jumps.
+
+    Loop headers are not skipped, so that loops keep a single entry.
+
+    Afterwards, a conditional jump with the same target for both outcomes
+    is replaced by a jump.
+    """
+
+    requires = (DominatorTreeAnalysis,)
+
+    def on_function(self, function):
+        dominator_tree = self.get_analysis(DominatorTreeAnalysis, function)
+        reachable = function.calc_reachable_blocks()
+        self.loop_headers = {
+            block
+            for block in reachable
+            for predecessor in block.predecessors
+            if predecessor in reachable
+            and dominator_tree.dominates(block, predecessor)
+        }
+
+        threaded = 0
+        for block in list(function):
+            if (
+                block not in reachable
+                or block.is_entry
+                or block in self.loop_headers
+                or not self.is_skippable(block)
+            ):
+                continue
+            for predecessor in list(dict.fromkeys(block.predecessors)):
+                if predecessor is not block and self.thread(
+                    predecessor, block
+                ):
+                    threaded += 1
+
+        merged = 0
+        for block in function:
+            branch = block.last_instruction
+            if (
+                isinstance(branch, ir.CJump)
+                and branch.lab_yes is branch.lab_no
+            ):
+                replace_by_jump(branch, branch.lab_yes)
+                merged += 1
+
+        self.loop_headers = None
+        if threaded or merged:
+            function.delete_unreachable()
+            self.logger.debug(
+                "Threaded %i jumps, merged %i branches", threaded, merged
+            )
+        return bool(threaded or merged)
+
+    def is_skippable(self, block, allow_phis=True):
+        """Test if a block only contains phis, constants and a jump or a
+        conditional jump.
+        """
+        return isinstance(
+            block.last_instruction, (ir.Jump, ir.CJump)
+        ) and all(
+            isinstance(instruction, ir.Const)
+            or (allow_phis and isinstance(instruction, ir.Phi))
+            for instruction in block.instructions[:-1]
+        )
+
+    def thread(self, predecessor, block):
+        """Let the jump from predecessor to block skip block, and the
+        blocks after it, as far as their outcome is known.
+        """
+        if not isinstance(predecessor.last_instruction, (ir.Jump, ir.CJump)):
+            return False
+
+        knowledge, fact = self.get_knowledge(predecessor, block)
+        path = []
+        target = block
+        while target not in path and (
+            target is block
+            or (
+                not target.is_entry
+                and target not in self.loop_headers
+                and self.is_skippable(target, allow_phis=False)
+            )
+        ):
+            successor = self.evaluate(target.last_instruction, knowledge, fact)
+            if successor is None:
+                break
+            path.append(target)
+            target = successor
+
+        if not path or target in path:
+            return False
+
+        # The values of the skipped blocks may only be used in blocks which
+        # can only be reached through the skipped blocks, since the other
+        # blocks can now be reached from the predecessor:
+        for index, skipped in enumerate(path):
+            region = get_region(path, index)
+            for instruction in skipped.instructions[:-1]:
+                for user in instruction.used_by:
+                    if isinstance(user, ir.Phi):
+                        blocks = [
+                            incoming
+                            for incoming, value in user.inputs.items()
+                            if value is instruction
+                        ]
+                    else:
+                        blocks = [user.block]
+                    if not all(b in region for b in blocks):
+                        return False
+
+        # The phis in the target get the values which would have come
+        # through the skipped blocks:
+        last = path[-1]
+        inputs = []
+        for phi in target.phis:
+            value = phi.get_value(last)
+            if isinstance(value, ir.Phi) and value.block is block:
+                value = value.get_value(predecessor)
+            elif isinstance(value, ir.Const) and value.block in path:
+                value = ir.Const(value.value, value.name, value.ty)
+            inputs.append((phi, value))
+
+        new_target = target
+        if predecessor in target.predecessors:
+            # The values from both edges must be the same:
+            if not all(
+                same_value(phi.get_value(predecessor), value)
+                for phi, value in inputs
+            ):
+                return False
+        else:
+            source = predecessor
+            if inputs and isinstance(predecessor.last_instruction, ir.CJump):
+                # The values of phis are copied at the end of the incoming
+                # block, so a conditional jump needs a block on the edge.
+                # This block would only replace the skipped blocks when
+                # these all end with a jump:
+                if all(isinstance(b.last_instruction, ir.Jump) for b in path):
+                    return False
+                source = block.function.add_block(
+                    ir.Block("{}_edge".format(target.name))
+                )
+                source.add_instruction(ir.Jump(target))
+                new_target = source
+            for phi, value in inputs:
+                if isinstance(value, ir.Const) and value.block is None:
+                    source.insert_instruction(
+                        value, before_instruction=source.last_instruction
+                    )
+                phi.set_incoming(source, value)
+
+        self.logger.debug(
+            "Jump from %s to %s skips %s",
+            predecessor.name,
+            target.name,
+            ", ".join(b.name for b in path),
+        )
+        predecessor.change_target(block, new_target)
+        for phi in block.phis:
+            phi.del_incoming(predecessor)
+        return True
+
+    def get_knowledge(self, predecessor, block):
+        """Determine the values which are known to be constant on the
+        edge from predecessor to block, and the test which holds there.
+        """
+        knowledge = {}
+        for phi in block.phis:
+            value = phi.get_value(predecessor)
+            if isinstance(value, ir.Const):
+                knowledge[phi] = value.value
+
+        fact = None
+        branch = predecessor.last_instruction
+        # Floating point tests cannot be negated, because of NaN:
+        if (
+            isinstance(branch, ir.CJump)
+            and branch.lab_yes is not branch.lab_no
+            and (branch.a.ty.is_integer or branch.a.ty is ir.ptr)
+        ):
+            if branch.lab_yes is block:
+                cond = branch.cond
+            else:
+                cond = NEGATED_CONDITIONS[branch.cond]
+            fact = (branch.a, cond, branch.b)
+
+            # A value which is equal to a constant is that constant:
+            if cond == "==":
+                if isinstance(branch.b, ir.Const):
+                    knowledge.setdefault(branch.a, branch.b.value)
+                elif isinstance(branch.a, ir.Const):
+                    knowledge.setdefault(branch.b, branch.a.value)
+        return knowledge, fact
+
+    def evaluate(self, branch, knowledge, fact):
+        """ Determine the target of a jump, or None when it is not known """
+        if isinstance(branch, ir.Jump):
+            return branch.target
+
+        def get(value):
+            if isinstance(value, ir.Const):
+                return value.value
+            return knowledge.get(value)
+
+        a, b = get(branch.a), get(branch.b)
+        if a is not None and b is not None:
+            holds = CONDITIONS[branch.cond](a, b)
+        elif fact is None:
+            return None
+        else:
+            # The same test as the one on the edge into the block:
+            if (branch.a, branch.b) == (fact[0], fact[2]):
+                cond = branch.cond
+            elif (branch.b, branch.a) == (fact[0], fact[2]):
+                cond = SWAPPED_CONDITIONS[branch.cond]
+            else:
+                return None
+
+            if cond == fact[1]:
+                holds = True
+            elif cond == NEGATED_CONDITIONS[fact[1]]:
+                holds = False
+            else:
+                return None
+        return branch.lab_yes if holds else branch.lab_no
+
+
+def get_region(path, index):
+    """Get the blocks of a path which can only be reached through the
+    block at the given index.
+    """
+    region = {path[index]}
+    for block in path[index + 1:]:
+        if not all(p in region for p in block.predecessors):
+            break
+        region.add(block)
+    return region
@@ -0,0 +1,199 @@
+""" Loop invariant code motion.
+
+An instruction inside a loop is loop invariant when it computes the same
+value in each iteration. Such instructions are moved into the preheader of
+the loop, a block which is executed once before the loop is entered.
+"""
+
+from .. import ir
+from .analysis import DominatorTreeAnalysis, LoopAnalysis
+from .transform import FunctionPass
+
+
+# Instructions which might change the contents of memory:
+MEMORY_WRITES = (
+    ir.Store,
+    ir.CopyBlob,
+    ir.FunctionCall,
+    ir.ProcedureCall,
+    ir.InlineAsm,
+)
+
+
+class LoopInvariantCodeMotionPass(FunctionPass):
+    """Move loop invariant computations out of loops.
+
+    Binary and unary operations, casts and addresses are moved when their
+    operands are defined outside the loop, or are loop invariant
+    themselves. Divisions are only moved by a constant other than zero,
+    since they could trap. Constants are moved along with the values
+    which use them.
+
+    A load is moved when the loop does not write to memory at all, and the
+    load is executed in each iteration, so moving it cannot introduce a
+    load from an invalid address.
+
+    Inner loops are handled first, so an invariant can move out of several
+    loops, one preheader at a time.
+    """
+
+    requires = (LoopAnalysis,)
+
+    def on_function(self, function):
+        self.dominator_tree = self.get_analysis(
+            DominatorTreeAnalysis, function
+        )
+        self.preheaders = {}
+
+        # A loop with several back edges is found once for each:
+        loops = {}
+        for loop in self.get_analysis(LoopAnalysis, function):
+            loops.setdefault(loop.header, {loop.header}).update(loop.blocks)
+
+        count = 0
+        for header, blocks in sorted(loops.items(), key=lambda x: len(x[1])):
+            invariants = self.find_invariants(function, header, blocks)
+            if not invariants:
+                continue
+
+            preheader = self.get_preheader(header, blocks)
+            if preheader is None:
+                continue
+
+            # The preheader is part of the loops around this loop:
+            for other in loops.values():
+                if header in other and other is not blocks:
+                    other.add(preheader)
+
+            for instruction in invariants:
+                instruction.block.remove_instruction(instruction)
+                preheader.instructions.insert(-1, instruction)
+                instruction.block = preheader
+            count += len(invariants)
+
+        self.dominator_tree = None
+        self.preheaders = None
+        if count > 0:
+            self.logger.debug("Moved %i invariants out of loops", count)
+        return count > 0
+
+    def find_invariants(self, function, header, blocks):
+        """Find the loop invariant instructions of a loop, in an order in
+        which they can be moved.
+        """
+        instructions = [
+            instruction
+            for block in function
+            if block in blocks
+            for instruction in block
+        ]
+        writes_memory = any(
+            isinstance(instruction, MEMORY_WRITES)
+            for instruction in instructions
+        )
+        exits = [
+            block
+            for block in blocks
+            if any(s not in blocks for s in block.successors)
+        ]
+
+        invariants = []
+        invariant_set = set()
+
+        def is_invariant(value):
+            return (
+                not isinstance(value, ir.Instruction)
+                or value.block not in blocks
+                or value in invariant_set
+            )
+
+        change = True
+        while change:
+            change = False
+            for instruction in instructions:
+                if instruction in invariant_set:
+                    continue
+
+                if isinstance(instruction, ir.Load):
+                    if (
+                        writes_memory
+                        or instruction.volatile
+                        or not exits
+                        or not all(
+                            self.dominates(instruction.block, exit_block)
+                            for exit_block in exits
+                        )
+                    ):
+                        continue
+                elif isinstance(instruction, ir.Binop):
+                    if instruction.operation in ("/", "%") and not (
+                        isinstance(instruction.b, ir.Const)
+                        and instruction.b.value != 0
+                    ):
+                        continue
+                elif not isinstance(
+                    instruction, (ir.Const, ir.Unop, ir.Cast, ir.AddressOf)
+                ):
+                    continue
+
+                if all(is_invariant(value) for value in instruction.uses):
+                    invariants.append(instruction)
+                    invariant_set.add(instruction)
+                    change = True
+
+        # A constant is cheap to create, so keeping it in a register over
+        # the whole loop only pays off when it is used by a moved value:
+        return [
+            instruction
+            for instruction in invariants
+            if not isinstance(instruction, ir.Const)
+            or any(user in invariant_set for user in instruction.used_by)
+        ]
+
+    def dominates(self, one, another):
+        """ Test if block one dominates another, also for new preheaders """
+        one = self.preheaders.get(one, one)
+        return self.dominator_tree.dominates(one, another)
+
+    def get_preheader(self, header, blocks):
+        """Get the block which jumps to the header of a loop from outside
+        the loop, and create it when there is no such block.
+        """
+        function = header.function
+        outside = [p for p in header.predecessors if p not in blocks]
+        if not outside:
+            # The loop is entered at the start of the function:
+            return None
+
+        if len(outside) == 1 and isinstance(
+            outside[0].last_instruction, ir.Jump
+        ):
+            return outside[0]
+
+        preheader = function.add_block(
+            ir.Block("{}_preheader".format(header.name))
+        )
+        function.blocks.remove(preheader)
+        function.blocks.insert(function.blocks.index(header), preheader)
+
+        # Merge the values coming from outside the loop:
+        for phi in header.phis:
+            values = [phi.get_value(p) for p in outside]
+            if all(value is values[0] for value in values):
+                value = values[0]
+            else:
+                value = ir.Phi(phi.name, phi.ty)
+                preheader.add_instruction(value)
+                for predecessor in outside:
+                    value.set_incoming(predecessor, phi.get_value(predecessor))
+            for predecessor in outside:
+                phi.del_incoming(predecessor)
+            phi.set_incoming(preheader, value)
+
+        for predecessor in outside:
+            predecessor.change_target(header, preheader)
+        preheader.add_instruction(ir.Jump(header))
+
+        # The preheader dominates the same blocks as the header:
+        self.preheaders[preheader] = header
+        return preheader
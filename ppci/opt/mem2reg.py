@@ -6,7 +6,8 @@ also be stored into a register, to improve performance.
 
 from .transform import FunctionPass
 from .. import ir
-from ..graph.domtree import CfgInfo
+from .analysis import CFG_ANALYSES, CfgAnalysis, DominanceFrontierAnalysis
+from ..utils.collections import OrderedSet
 
 
 def is_alloc_promotable(alloc_inst: ir.Alloc):
@@ -61,27 +62,35 @@ class Mem2RegPromotor(FunctionPass):
     """Tries to find alloc instructions only used by load and store
     instructions and replace them with values and phi nodes"""
 
+    requires = (DominanceFrontierAnalysis,)
+    preserves = CFG_ANALYSES
+
     def place_phi_nodes(self, stores, phi_ty, name, cfg_info):
         """
         Step 1: place phi-functions where required:
         Each node in the df(x) requires a phi function,
         where x is a block where the variable is defined.
         """
-        defining_blocks = set(st.block for st in stores)
+        defining_blocks = OrderedSet(st.block for st in stores)
 
-        # Create worklist:
-        block_backlog = set(defining_blocks)
+        # Create worklist, visit blocks in a fixed order such that the
+        # phi names are the same from run to run:
+        block_order = {b: i for i, b in enumerate(cfg_info.function.blocks)}
+        block_backlog = list(defining_blocks)
 
         has_phi = set()
 
         phis = list()
         idx = 0
         while block_backlog:
-            defining_block = block_backlog.pop()
-            for frontier_block in cfg_info.df[defining_block]:
+            defining_block = block_backlog.pop(0)
+            frontier_blocks = sorted(
+                cfg_info.df[defining_block], key=block_order.__getitem__
+            )
+            for frontier_block in frontier_blocks:
                 if frontier_block not in has_phi:
                     has_phi.add(frontier_block)
-                    block_backlog.add(frontier_block)
+                    block_backlog.append(frontier_block)
                     phi_name = "phi_{}_{}".format(name, idx)
                     idx += 1
                     phi = ir.Phi(phi_name, phi_ty)
@@ -174,8 +183,9 @@ class Mem2RegPromotor(FunctionPass):
             phis = self.place_phi_nodes(stores, phi_ty, name, cfg_info)
 
             # Preserve debug info:
-            for phi in phis:
-                self.debug_db.map(alloc, phi)
+            if self.debug_db:
+                for phi in phis:
+                    self.debug_db.map(alloc, phi)
 
             # Create undefined value at start:
             initial_value = ir.Undefined("und_{}".format(name), phi_ty)
@@ -219,9 +229,13 @@ class Mem2RegPromotor(FunctionPass):
         alloc.remove_from_block()
 
     def on_function(self, function):
-        cfg_info = CfgInfo(function)
+        promoted = False
         for block in function.blocks:
             allocs = [i for i in block if isinstance(i, ir.Alloc)]
             for alloc in allocs:
                 if is_alloc_promotable(alloc):
+                    self.get_analysis(DominanceFrontierAnalysis, function)
+                    cfg_info = self.get_analysis(CfgAnalysis, function)
                     self.promote(alloc, cfg_info)
+                    promoted = True
+        return promoted
@@ -0,0 +1,77 @@
+""" Run a sequence of optimization passes over a module. """
+
+import logging
+from ..utils.timing import timed
+from .analysis import AnalysisManager
+from .transform import FunctionPass
+
+
+class PassManager:
+    """Runs passes in order, and shares the analyses between them.
+
+    An analysis which is used by several passes is only calculated again
+    when a pass in between changed the function and did not preserve it.
+
+    When max_iterations is larger than one, the sequence of passes is
+    repeated until no pass changes the module anymore, or until the
+    sequence was run max_iterations times. Each repetition only visits the
+    functions which were changed during the previous repetition.
+    """
+
+    logger = logging.getLogger("passmanager")
+
+    def __init__(self, passes=(), analysis_manager=None, max_iterations=1):
+        self.passes = list(passes)
+        if analysis_manager is None:
+            analysis_manager = AnalysisManager()
+        self.analysis_manager = analysis_manager
+        self.max_iterations = max_iterations
+
+    def add(self, opt_pass):
+        """ Append a pass to the sequence """
+        self.passes.append(opt_pass)
+
+    def run(self, ir_module):
+        """Run the passes over the module.
+
+        Returns whether any of the passes changed the module.
+        """
+        changed = False
+        dirty = set(ir_module.functions)
+        for iteration in range(self.max_iterations):
+            self.logger.debug(
+                "Iteration %s over %s functions", iteration + 1, len(dirty)
+            )
+            dirty = self.run_once(ir_module, dirty)
+            if not dirty:
+                break
+            changed = True
+        else:
+            self.logger.debug(
+                "No fixed point after %s iterations", self.max_iterations
+            )
+        return changed
+
+    def run_once(self, ir_module, dirty):
+        """Run each pass once over the functions in dirty.
+
+        Returns the set of functions which were changed.
+        """
+        changed = set()
+        for opt_pass in self.passes:
+            with timed(repr(opt_pass)):
+                if isinstance(opt_pass, FunctionPass):
+                    # Functions changed by earlier passes are visited too:
+                    functions = [
+                        f
+                        for f in ir_module.functions
+                        if f in dirty or f in changed
+                    ]
+                    changed.update(
+                        opt_pass.run_on_functions(
+                            ir_module, functions, self.analysis_manager
+                        )
+                    )
+                elif opt_pass.run(ir_module, self.analysis_manager):
+                    changed.update(ir_module.functions)
+        return changed
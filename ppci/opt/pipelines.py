@@ -0,0 +1,104 @@
+""" The optimization passes which are run for each optimization level.
+
+- 0: no optimization at all.
+- 1: cheap passes, which are each run once. This gives reasonable code
+  without spending much compilation time.
+- 2: all scalar passes, repeated until nothing changes anymore.
+- 3: like 2, with transformations which trade code size for speed.
+- s: like 2, without transformations which make the code larger. The code
+  generator also selects the smallest instructions at this level.
+"""
+
+from .adce import AggressiveDeadCodeEliminationPass
+from .cjmp import CJumpPass
+from .clean import CleanPass
+from .constantfolding import ConstantFolder
+from .cse import CommonSubexpressionEliminationPass
+from .dse import DeadStoreEliminationPass
+from .gvn import GlobalValueNumberingPass
+from .inline import InlinePass
+from .ipo import DeadArgumentEliminationPass
+from .ipo import InterproceduralConstantPropagationPass
+from .jump_threading import JumpThreadingPass
+from .licm import LoopInvariantCodeMotionPass
+from .mem2reg import Mem2RegPromotor
+from .pass_manager import PassManager
+from .rle import RedundantLoadEliminationPass
+from .sccp import SparseConditionalConstantPropagationPass
+from .sroa import ScalarReplacementOfAggregatesPass
+from .strength_reduction import StrengthReductionPass
+from .tailcall import TailCallOptimization
+from .transform import DeleteUnusedInstructionsPass, RemoveAddZeroPass
+from .unroll import LoopUnrollPass
+from .unused_globals import DeleteUnusedGlobalsPass
+
+
+OPT_LEVELS = ("0", "1", "2", "3", "s")
+
+
+def get_passes(level):
+    """ Create the optimization passes for the given level """
+    level = str(level)
+    if level not in OPT_LEVELS:
+        raise ValueError("Invalid optimization level {}".format(level))
+
+    if level == "0":
+        return []
+    elif level == "1":
+        return [
+            DeleteUnusedGlobalsPass(),
+            Mem2RegPromotor(),
+            ConstantFolder(),
+            CommonSubexpressionEliminationPass(),
+            DeleteUnusedInstructionsPass(),
+            CleanPass(),
+        ]
+
+    # Inline small functions, without growing the code at -Os:
+    inline_threshold = {"2": 10, "3": 40, "s": 0}[level]
+
+    passes = [
+        ScalarReplacementOfAggregatesPass(),
+        Mem2RegPromotor(),
+        InlinePass(threshold=inline_threshold),
+        DeleteUnusedGlobalsPass(),
+        InterproceduralConstantPropagationPass(),
+        SparseConditionalConstantPropagationPass(),
+        RemoveAddZeroPass(),
+        ConstantFolder(),
+        GlobalValueNumberingPass(),
+        LoopInvariantCodeMotionPass(),
+    ]
+    if level == "3":
+        passes.append(LoopUnrollPass())
+    if level != "s":
+        # Strength reduction adds code before loops, to speed them up:
+        passes.append(StrengthReductionPass())
+    passes += [
+        TailCallOptimization(),
+        RedundantLoadEliminationPass(),
+        DeadStoreEliminationPass(),
+        AggressiveDeadCodeEliminationPass(),
+        DeadArgumentEliminationPass(),
+        JumpThreadingPass(),
+        CJumpPass(),
+        CleanPass(),
+    ]
+    return passes
+
+
+def get_max_iterations(level):
+    """ Get how often the passes of a level are repeated at most """
+    return {"0": 1, "1": 1, "2": 10, "3": 20, "s": 10}[str(level)]
+
+
+def create_pass_manager(level):
+    """ Create a pass manager running the passes for the given level """
+    return PassManager(
+        get_passes(level), max_iterations=get_max_iterations(level)
+    )
+
+
+def get_codegen_goal(level):
+    """ Get what the code generator optimizes for at the given level """
+    return "size" if str(level) == "s" else "speed"
@@ -0,0 +1,203 @@
+""" Redundant load elimination.
+
+A load is redundant when the value at its address is already available,
+because it was loaded or stored before on each path to the load, and the
+memory was not changed in between. The alias analysis tells which stores
+and calls might change the memory.
+
+When the available value differs per predecessor of a block, a phi of
+these values is created, so that a field which is loaded in both branches
+of an if statement is not loaded again after it.
+"""
+
+from .. import ir
+from .alias import AliasAnalysis
+from .analysis import CFG_ANALYSES, LoopAnalysis, reverse_post_order
+from .transform import FunctionPass
+
+
+# Instructions which might change the contents of memory:
+MEMORY_WRITES = (
+    ir.Store,
+    ir.CopyBlob,
+    ir.FunctionCall,
+    ir.ProcedureCall,
+    ir.InlineAsm,
+)
+
+
+class RedundantLoadEliminationPass(FunctionPass):
+    """Replace loads of which the value is already available by this value.
+
+    The blocks are visited in reverse post order. For each block, the
+    values which are available on all paths into the block are known.
+    A value is available at the start of a loop when the loop does not
+    change the memory it was loaded from.
+    """
+
+    requires = (AliasAnalysis, LoopAnalysis)
+    preserves = CFG_ANALYSES
+
+    def on_function(self, function):
+        self.alias_info = self.get_analysis(AliasAnalysis, function)
+        loops = {}
+        for loop in self.get_analysis(LoopAnalysis, function):
+            loops.setdefault(loop.header, {loop.header}).update(loop.blocks)
+
+        count = 0
+        self.available = {}
+        for block in reverse_post_order(function):
+            values = self.get_available_values(block, loops.get(block))
+            count += self.on_block(block, values)
+            self.available[block] = values
+
+        self.alias_info = None
+        self.available = None
+        if count > 0:
+            self.logger.debug("Replaced %i redundant loads", count)
+        return count > 0
+
+    def get_available_values(self, block, loop):
+        """Get the values which are available on all paths into a block.
+
+        These map a location and a type to the value in memory at that
+        location, or to a :class:`MergedValue` when the value differs per
+        predecessor.
+        """
+        predecessors = list(dict.fromkeys(block.predecessors))
+        visited = [p for p in predecessors if p in self.available]
+        if not visited:
+            return {}
+        elif len(visited) < len(predecessors):
+            # The other predecessors are in a loop with this block as
+            # header, which must not change the memory:
+            if loop is None or not all(
+                p in loop for p in predecessors if p not in visited
+            ):
+                return {}
+            values = self.get_same_values(visited)
+            writes = self.get_memory_writes(loop)
+            return {
+                key: value
+                for key, value in values.items()
+                if not any(self.clobbers(w, key[0]) for w in writes)
+            }
+        elif len(visited) == 1:
+            return dict(self.available[visited[0]])
+        else:
+            keys = set(self.available[visited[0]])
+            for predecessor in visited[1:]:
+                keys.intersection_update(self.available[predecessor])
+            values = {}
+            for key in keys:
+                inputs = {p: self.available[p][key] for p in visited}
+                first = inputs[visited[0]]
+                if all(value is first for value in inputs.values()):
+                    values[key] = first
+                else:
+                    values[key] = MergedValue(block, key[1], inputs)
+            return values
+
+    def get_same_values(self, blocks):
+        """ Get the values which are available at the end of all blocks """
+        values = dict(self.available[blocks[0]])
+        for block in blocks[1:]:
+            other = self.available[block]
+            values = {
+                key: value
+                for key, value in values.items()
+                if other.get(key) is value
+            }
+        return values
+
+    def get_memory_writes(self, blocks):
+        """ Get the instructions in the blocks which might change memory """
+        return [
+            instruction
+            for block in blocks
+            for instruction in block
+            if isinstance(instruction, MEMORY_WRITES)
+        ]
+
+    def clobbers(self, instruction, location):
+        """ Test if an instruction might change the memory at location """
+        alias_info = self.alias_info
+        if isinstance(instruction, ir.Store):
+            written = alias_info.get_access_location(instruction)
+        elif isinstance(instruction, ir.CopyBlob):
+            written = alias_info.get_location(
+                instruction.dst, instruction.amount
+            )
+        else:
+            # Calls and inline assembly can change all memory, except for
+            # the allocations which they cannot access:
+            return not alias_info.is_local(location)
+        return alias_info.may_alias(written, location)
+
+    def on_block(self, block, values):
+        """Replace the redundant loads in a block, and update the available
+        values to those at the end of the block.
+
+        Returns the number of loads which were replaced.
+        """
+        count = 0
+        for instruction in block:
+            if isinstance(instruction, ir.Load):
+                if instruction.volatile:
+                    continue
+                location = self.alias_info.get_access_location(instruction)
+                key = (location, instruction.ty)
+                if key in values:
+                    if not instruction.is_used:
+                        continue
+                    value = materialize(values[key])
+                    values[key] = value
+                    instruction.replace_by(value)
+                    count += 1
+                else:
+                    values[key] = instruction
+            elif isinstance(instruction, ir.Store):
+                location = self.alias_info.get_access_location(instruction)
+                self.remove_clobbered(instruction, values)
+                if not (instruction.volatile or instruction.value.ty.is_blob):
+                    values[(location, instruction.value.ty)] = (
+                        instruction.value
+                    )
+            else:
+                self.remove_clobbered(instruction, values)
+        return count
+
+    def remove_clobbered(self, instruction, values):
+        """ Forget the values which might be changed by an instruction """
+        if isinstance(instruction, MEMORY_WRITES):
+            for key in list(values):
+                if self.clobbers(instruction, key[0]):
+                    del values[key]
+
+
+class MergedValue:
+    """A value which is available in each predecessor of a block, but which
+    is different per predecessor.
+
+    A phi is only created for it when the value is used.
+    """
+
+    def __init__(self, block, ty, inputs):
+        self.block = block
+        self.ty = ty
+        self.inputs = inputs
+        self.phi = None
+
+
+def materialize(value):
+    """ Get an ir value for an available value, creating phis if needed """
+    if isinstance(value, MergedValue):
+        if value.phi is None:
+            block = value.block
+            phi = ir.Phi("load_phi", value.ty)
+            block.insert_instruction(phi)
+            value.phi = phi
+            for predecessor, input_value in value.inputs.items():
+                phi.set_incoming(predecessor, materialize(input_value))
+        return value.phi
+    return value
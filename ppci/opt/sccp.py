@@ -0,0 +1,238 @@
+""" Sparse conditional constant propagation.
+
+This pass finds the values which are constant in a function in SSA form,
+also when they are defined in different blocks, or are phi nodes of which
+every executable input is the same constant. Branches which can never be
+taken are not followed, so constants found in one part of the function
+are not mixed up with values from code which is never executed.
+
+Afterwards, the constant values are replaced by constants, conditional
+jumps with a constant condition are replaced by jumps, and the blocks
+which can never be executed are deleted.
+
+The algorithm is described in:
+Wegman and Zadeck, "Constant propagation with conditional branches", 1991.
+"""
+
+from .. import ir
+from .cjmp import CONDITIONS, replace_by_jump
+from .constantfolding import OPERATIONS, cast
+from .transform import FunctionPass
+
+
+class _Lattice:
+    """ A lattice value which is not a constant """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+# The value is not known yet, because its definition was not executed:
+UNKNOWN = _Lattice("unknown")
+
+# The value can differ from run to run:
+VARYING = _Lattice("varying")
+
+
+class SparseConditionalConstantPropagationPass(FunctionPass):
+    """Propagate constants through phi nodes and over blocks, and remove
+    the branches which can never be taken.
+
+    This pass works on SSA form, so it should run after mem2reg.
+    """
+
+    def on_function(self, function):
+        self.values = {}
+        self.executable_blocks = set()
+        self.executable_edges = set()
+        self.flow_worklist = [(None, function.entry)]
+        self.ssa_worklist = []
+        self.propagate()
+
+        changed = self.replace_constants(function)
+        if self.fold_branches(function):
+            function.delete_unreachable()
+            changed = True
+        self.values = None
+        self.executable_blocks = None
+        self.executable_edges = None
+        return changed
+
+    def propagate(self):
+        """ Determine the executable blocks and the constant values """
+        while self.flow_worklist or self.ssa_worklist:
+            while self.flow_worklist:
+                edge = self.flow_worklist.pop()
+                if edge in self.executable_edges:
+                    continue
+                self.executable_edges.add(edge)
+                block = edge[1]
+                if block in self.executable_blocks:
+                    # Only the phis can change by the new edge:
+                    for phi in block.phis:
+                        self.visit(phi)
+                else:
+                    self.executable_blocks.add(block)
+                    for instruction in block:
+                        self.visit(instruction)
+
+            while self.ssa_worklist:
+                instruction = self.ssa_worklist.pop()
+                if instruction.block in self.executable_blocks:
+                    self.visit(instruction)
+
+    def visit(self, instruction):
+        """ Evaluate an instruction, given the current lattice values """
+        if isinstance(instruction, ir.FinalInstruction):
+            for target in self.get_targets(instruction):
+                self.flow_worklist.append((instruction.block, target))
+        elif isinstance(instruction, ir.Value):
+            value = self.evaluate(instruction)
+            old = self.values.get(instruction, UNKNOWN)
+            if old is not VARYING and value is not old and value != old:
+                self.values[instruction] = value
+                self.ssa_worklist.extend(instruction.used_by)
+
+    def get_lattice(self, value):
+        """ Get the lattice value of a value used by an instruction """
+        if isinstance(value, ir.Const):
+            return value.value
+        elif value in self.values:
+            return self.values[value]
+        elif isinstance(value, ir.Instruction) and value.block is not None:
+            return UNKNOWN
+        else:
+            # Parameters and global values:
+            return VARYING
+
+    def evaluate(self, instruction):
+        """ Determine the lattice value of a value """
+        if isinstance(instruction, ir.Const):
+            return instruction.value
+        elif isinstance(instruction, ir.Phi):
+            return self.evaluate_phi(instruction)
+        elif isinstance(instruction, ir.Binop):
+            if not (
+                instruction.ty.is_integer
+                and instruction.operation in OPERATIONS
+            ):
+                return VARYING
+            a = self.get_lattice(instruction.a)
+            b = self.get_lattice(instruction.b)
+            if a is VARYING or b is VARYING:
+                return VARYING
+            elif a is UNKNOWN or b is UNKNOWN:
+                return UNKNOWN
+            try:
+                return OPERATIONS[instruction.operation](
+                    instruction.ty, a, b
+                )
+            except (ArithmeticError, ValueError):
+                # For example a division by zero, leave it to run time:
+                return VARYING
+        elif isinstance(instruction, ir.Cast):
+            src = self.get_lattice(instruction.src)
+            if isinstance(src, _Lattice):
+                return src
+            return cast(src, instruction.ty)
+        else:
+            return VARYING
+
+    def evaluate_phi(self, phi):
+        """ A phi is constant if all executable inputs are the same """
+        result = UNKNOWN
+        for block, value in phi.inputs.items():
+            if (block, phi.block) not in self.executable_edges:
+                continue
+            value = self.get_lattice(value)
+            if value is UNKNOWN:
+                continue
+            elif value is VARYING:
+                return VARYING
+            elif result is UNKNOWN:
+                result = value
+            elif result != value:
+                return VARYING
+        return result
+
+    def get_targets(self, instruction):
+        """ Get the targets of a jump which can be taken """
+        if isinstance(instruction, ir.CJump):
+            a = self.get_lattice(instruction.a)
+            b = self.get_lattice(instruction.b)
+            if a is UNKNOWN or b is UNKNOWN:
+                return []
+            elif a is VARYING or b is VARYING:
+                return instruction.targets
+            elif CONDITIONS[instruction.cond](a, b):
+                return [instruction.lab_yes]
+            else:
+                return [instruction.lab_no]
+        elif isinstance(instruction, ir.JumpTable):
+            v = self.get_lattice(instruction.v)
+            if v is UNKNOWN:
+                return []
+            elif v is VARYING:
+                return instruction.targets
+            else:
+                return [instruction.get_target(v)]
+        else:
+            return instruction.targets
+
+    def replace_constants(self, function):
+        """ Replace values which are constant by a constant """
+        count = 0
+        for block in function:
+            if block not in self.executable_blocks:
+                continue
+
+            for instruction in list(block):
+                if (
+                    isinstance(instruction, ir.Const)
+                    or not isinstance(instruction, ir.Value)
+                    or not instruction.is_used
+                ):
+                    continue
+
+                value = self.values.get(instruction, UNKNOWN)
+                if isinstance(value, _Lattice):
+                    continue
+
+                cnst = ir.Const(value, "cnst", instruction.ty)
+                if isinstance(instruction, ir.Phi):
+                    position = len(block.phis)
+                    if position < len(block):
+                        block.insert_instruction(
+                            cnst, before_instruction=block[position]
+                        )
+                    else:  # pragma: no cover
+                        block.add_instruction(cnst)
+                else:
+                    block.insert_instruction(
+                        cnst, before_instruction=instruction
+                    )
+                instruction.replace_by(cnst)
+                count += 1
+        if count > 0:
+            self.logger.debug("Replaced %i values by constants", count)
+        return count > 0
+
+    def fold_branches(self, function):
+        """ Replace conditional jumps which can go only one way """
+        count = 0
+        for block in function:
+            if block not in self.executable_blocks:
+                continue
+
+            instruction = block.last_instruction
+            if isinstance(instruction, (ir.CJump, ir.JumpTable)):
+                targets = self.get_targets(instruction)
+                if len(targets) == 1:
+                    replace_by_jump(instruction, targets[0])
+                    count += 1
+        if count > 0:
+            self.logger.debug("Removed %i branches", count)
+        return count > 0
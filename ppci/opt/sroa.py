@@ -0,0 +1,257 @@
+""" Scalar replacement of aggregates.
+
+A local struct or array is allocated on the stack as a single blob of
+memory. When the blob is only accessed at constant offsets, each of these
+offsets can be given its own allocation instead. The new allocations hold
+a single scalar, so memory to register promotion can place them in
+registers.
+
+Copies between such aggregates are split into copies of the fields.
+"""
+
+from .. import ir
+from .analysis import CFG_ANALYSES
+from .mem2reg import is_alloc_promotable
+from .transform import FunctionPass, constant_value, delete_unused
+
+
+class Aggregate:
+    """ The accesses to an aggregate allocation """
+
+    def __init__(self, alloc):
+        self.alloc = alloc
+        self.fields = {}
+        self.accesses = []
+        self.addresses = []
+        self.copies = []
+
+    def add_field(self, offset, ty):
+        """ Register an access of a type at an offset """
+        if self.fields.setdefault(offset, ty) is not ty:
+            raise ValueError("Different types at offset {}".format(offset))
+        if offset < 0 or offset + self.field_size(ty) > self.alloc.amount:
+            raise ValueError("Access outside of {}".format(self.alloc.name))
+
+    def field_size(self, ty):
+        """Get the size of a field of the given type.
+
+        The size of a pointer depends on the target. A pointer is assumed
+        to be no larger than the alignment of the aggregate, or 2 bytes.
+        """
+        if ty is ir.ptr:
+            return max(self.alloc.alignment, 2)
+        return ty.size
+
+
+class ScalarReplacementOfAggregatesPass(FunctionPass):
+    """Split local aggregates into separate allocations for each field.
+
+    An allocation is split when its address is only used to load and store
+    values at constant offsets. The same offset must always be accessed
+    with the same type, and the accessed fields may not overlap.
+    Aggregates which are copied into each other using a blob store or a
+    memcpy are split into the same fields, such that the copy can be done
+    field by field. A copy from or to any other memory prevents splitting,
+    since this could also copy bytes which are not accessed as a field.
+    """
+
+    preserves = CFG_ANALYSES
+
+    def on_function(self, function):
+        aggregates = {}
+        for alloc in function.get_instructions_of_type(ir.Alloc):
+            if not is_alloc_promotable(alloc):
+                aggregates[alloc] = self.find_accesses(alloc)
+
+        groups = self.group_aggregates(aggregates)
+        count = 0
+        for group in groups:
+            if self.merge_fields(group):
+                self.split(group)
+                count += len(group)
+
+        if count > 0:
+            self.logger.debug("Split %i aggregates", count)
+        return count > 0
+
+    def find_accesses(self, alloc):
+        """Find the accesses to an allocation, or None when it cannot be
+        split.
+        """
+        aggregate = Aggregate(alloc)
+        worklist = []
+        for user in alloc.used_by:
+            if isinstance(user, ir.AddressOf):
+                worklist.append((user, 0))
+            elif (
+                isinstance(user, ir.Store) and user.value is alloc
+            ) or isinstance(user, ir.CopyBlob):
+                # The value of an allocation is its contents when stored,
+                # and its address when copied with memcpy:
+                aggregate.copies.append(user)
+            else:
+                return
+
+        try:
+            while worklist:
+                address, offset = worklist.pop()
+                aggregate.addresses.append(address)
+                for user in address.used_by:
+                    if isinstance(user, ir.Load) and not user.volatile:
+                        aggregate.add_field(offset, user.ty)
+                        aggregate.accesses.append((user, offset))
+                    elif (
+                        isinstance(user, ir.Store)
+                        and user.address is address
+                        and user.value is not address
+                        and not user.volatile
+                    ):
+                        if user.value.ty.is_blob:
+                            if offset != 0:
+                                return
+                            aggregate.copies.append(user)
+                        else:
+                            aggregate.add_field(offset, user.value.ty)
+                            aggregate.accesses.append((user, offset))
+                    elif isinstance(user, ir.CopyBlob) and offset == 0:
+                        aggregate.copies.append(user)
+                    elif (
+                        isinstance(user, ir.Binop)
+                        and user.operation == "+"
+                        and user.ty is ir.ptr
+                    ):
+                        other = user.b if user.a is address else user.a
+                        delta = constant_value(other)
+                        if other is address or delta is None:
+                            return
+                        worklist.append((user, offset + delta))
+                    else:
+                        return
+        except ValueError:
+            return
+        return aggregate
+
+    def group_aggregates(self, aggregates):
+        """Group the aggregates which are copied into each other.
+
+        Each copy must be between two aggregates which can be split.
+        """
+        groups = [
+            [aggregate]
+            for aggregate in aggregates.values()
+            if aggregate is not None
+        ]
+
+        def find(alloc):
+            for group in groups:
+                if any(aggregate.alloc is alloc for aggregate in group):
+                    return group
+
+        for aggregate in aggregates.values():
+            if aggregate is None:
+                continue
+            for copy in aggregate.copies:
+                source, destination = map(find, copy_operands(copy))
+                if source is None or destination is None:
+                    # Copied from or to memory which cannot be split:
+                    groups = [
+                        group
+                        for group in groups
+                        if group is not source and group is not destination
+                    ]
+                elif source is not destination:
+                    source.extend(destination)
+                    groups = [
+                        group for group in groups if group is not destination
+                    ]
+        return groups
+
+    def merge_fields(self, group):
+        """Determine the fields of a group of aggregates. Returns False
+        when the aggregates cannot be split into the same fields.
+        """
+        amount = group[0].alloc.amount
+        fields = {}
+        for aggregate in group:
+            if aggregate.alloc.amount != amount:
+                return False
+            for copy in aggregate.copies:
+                if isinstance(copy, ir.CopyBlob) and copy.amount != amount:
+                    return False
+                if isinstance(copy, ir.Store) and copy.value.ty.size != amount:
+                    return False
+            for offset, ty in aggregate.fields.items():
+                if fields.setdefault(offset, ty) is not ty:
+                    return False
+
+        # The fields may not overlap:
+        offsets = sorted(fields)
+        for offset, next_offset in zip(offsets, offsets[1:]):
+            if offset + group[0].field_size(fields[offset]) > next_offset:
+                return False
+
+        for aggregate in group:
+            aggregate.fields = fields
+        return True
+
+    def split(self, group):
+        """ Replace the aggregates of a group by their fields """
+        new_addresses = {}
+        for aggregate in group:
+            alloc = aggregate.alloc
+            addresses = {}
+            for offset, ty in sorted(aggregate.fields.items()):
+                size = aggregate.field_size(ty)
+                name = "{}_{}".format(alloc.name, offset)
+                field = ir.Alloc(name, size, min(size, alloc.alignment))
+                address = ir.AddressOf(field, "{}_addr".format(name))
+                alloc.block.insert_instruction(field, before_instruction=alloc)
+                alloc.block.insert_instruction(
+                    address, before_instruction=alloc
+                )
+                addresses[offset] = address
+            new_addresses[alloc] = addresses
+
+            for access, offset in aggregate.accesses:
+                access.address = addresses[offset]
+
+        # Copy field by field:
+        copies = []
+        for aggregate in group:
+            for copy in aggregate.copies:
+                if copy not in copies:
+                    copies.append(copy)
+        for copy in copies:
+            source, destination = copy_operands(copy)
+            for offset, ty in sorted(group[0].fields.items()):
+                value = ir.Load(
+                    new_addresses[source][offset],
+                    "{}_{}".format(source.name, offset),
+                    ty,
+                )
+                store = ir.Store(value, new_addresses[destination][offset])
+                copy.block.insert_instruction(value, before_instruction=copy)
+                copy.block.insert_instruction(store, before_instruction=copy)
+            copy.remove_from_block()
+
+        for aggregate in group:
+            for address in reversed(aggregate.addresses):
+                if isinstance(address, ir.AddressOf):
+                    address.remove_from_block()
+                else:
+                    delete_unused(address)
+            aggregate.alloc.remove_from_block()
+
+
+def copy_operands(copy):
+    """Get the source and destination of a copy. These are allocations
+    when the copy is between two allocations.
+    """
+    if isinstance(copy, ir.CopyBlob):
+        operands = copy.src, copy.dst
+    else:
+        operands = copy.value, copy.address
+    return tuple(
+        operand.src if isinstance(operand, ir.AddressOf) else operand
+        for operand in operands
+    )
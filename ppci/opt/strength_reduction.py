@@ -0,0 +1,261 @@
+""" Strength reduction of induction variables.
+
+A multiplication of an induction variable by a constant, such as the
+address ``a + i * 4`` of ``a[i]`` in a loop, changes by the same amount in
+each iteration. Strength reduction replaces such a value by a new
+induction variable, which is incremented by this amount in each iteration.
+
+Afterwards, the loop counter is often only used by the test of the loop.
+Linear function test replacement rewrites this test in terms of the new
+induction variable, such that the counter can be removed.
+"""
+
+from .. import ir
+from .analysis import CFG_ANALYSES, InductionVariable
+from .analysis import InductionVariableAnalysis, constant_trip_count
+from .transform import FunctionPass, delete_unused
+
+
+class StrengthReductionPass(FunctionPass):
+    """Replace multiplications of induction variables in loops by new
+    induction variables.
+
+    A multiplication is reduced together with the additions of loop
+    invariant values which use it, so ``a + i * 4`` becomes a single
+    pointer which is incremented by 4.
+
+    The test of a loop on a counter which is only used by the test is
+    replaced by a test on a reduced induction variable, when the loop
+    runs from a constant to a constant. The number of iterations is known
+    in that case, so the new test can check for the final value of the
+    new variable, without overflow changing the outcome.
+    """
+
+    requires = (InductionVariableAnalysis,)
+    preserves = CFG_ANALYSES
+
+    def on_function(self, function):
+        reduced = replaced = 0
+        for loop in self.get_analysis(InductionVariableAnalysis, function):
+            new_phis = self.reduce_loop(loop)
+            reduced += len(new_phis)
+            for basic in loop.basics.values():
+                if self.replace_test(loop, basic, new_phis):
+                    replaced += 1
+
+        if reduced > 0:
+            self.logger.debug("Reduced %i induction variables", reduced)
+        if replaced > 0:
+            self.logger.debug("Replaced %i loop tests", replaced)
+        return reduced + replaced > 0
+
+    def reduce_loop(self, loop):
+        """Replace multiplications in a loop by new induction variables.
+
+        Returns a map of the new phis to their induction variables.
+        """
+        new_phis = {}
+        for value in self.find_candidates(loop):
+            if value.block is None:
+                # Removed as part of another candidate
+                continue
+            induction_variable = loop.values[value]
+            phi = self.find_induction_variable(new_phis, induction_variable)
+            if phi is None:
+                phi = self.create_induction_variable(
+                    loop, induction_variable, value
+                )
+                new_phis[phi] = induction_variable
+                replacement = phi
+            else:
+                # Add the difference to a new variable with the same step:
+                offset = induction_variable.constant - new_phis[phi].constant
+                replacement = materialize(
+                    InductionVariable(None, 0, {phi: 1}, offset),
+                    value.ty,
+                    None,
+                    value,
+                )
+            value.replace_by(replacement)
+            delete_unused(value)
+        return new_phis
+
+    def find_induction_variable(self, new_phis, induction_variable):
+        """Find a new induction variable which differs by a constant from
+        the given induction variable.
+        """
+        for phi, other in new_phis.items():
+            if (
+                other.basic is induction_variable.basic
+                and other.factor == induction_variable.factor
+                and other.invariants == induction_variable.invariants
+            ):
+                return phi
+
+    def find_candidates(self, loop):
+        """ Find the values to replace by a new induction variable """
+        candidates = []
+        for value in loop.values:
+            if not (
+                isinstance(value, ir.Binop) and value.operation in ("*", "<<")
+            ):
+                continue
+
+            # Include the additions which use the multiplication:
+            while len(value.used_by) == 1:
+                (user,) = value.used_by
+                if isinstance(user, ir.Phi) or user not in loop.values:
+                    break
+                value = user
+
+            if (
+                value not in candidates
+                and value.is_used
+                and loop.values[value].factor != 1
+                and all(user.block in loop.blocks for user in value.used_by)
+            ):
+                candidates.append(value)
+        return candidates
+
+    def create_induction_variable(self, loop, induction_variable, value):
+        """ Create a phi with the same values as the given value """
+        basic = loop.basics[induction_variable.basic]
+        header = loop.header
+        ty = value.ty
+
+        phi = ir.Phi("{}_iv".format(value.name), ty)
+        header.insert_instruction(
+            phi, before_instruction=header.instructions[len(header.phis)]
+        )
+
+        init = materialize(
+            induction_variable,
+            ty,
+            basic.init,
+            loop.preheader.last_instruction,
+        )
+
+        # Increment the new variable where the basic variable is updated:
+        update = basic.update
+        after_update = update.block.instructions[update.position + 1]
+        step = induction_variable.factor * basic.step
+        increment = materialize(
+            InductionVariable(None, 0, {phi: 1}, step), ty, None, after_update
+        )
+
+        for predecessor in header.predecessors:
+            if predecessor is loop.preheader:
+                phi.set_incoming(predecessor, init)
+            else:
+                phi.set_incoming(predecessor, increment)
+        return phi
+
+    def replace_test(self, loop, basic, new_phis):
+        """Replace the loop test on a basic induction variable by a test
+        on one of the new induction variables, and remove the basic
+        induction variable.
+        """
+        phi, update = basic.phi, basic.update
+        replacements = [
+            (new_phi, induction_variable)
+            for new_phi, induction_variable in new_phis.items()
+            if induction_variable.basic is phi
+        ]
+        users = [user for user in phi.used_by if user is not update]
+        if not (
+            replacements
+            and list(update.used_by) == [phi]
+            and len(users) == 1
+            and isinstance(users[0], ir.CJump)
+            and users[0].block is loop.header
+        ):
+            return False
+
+        test = users[0]
+        iterations = constant_trip_count(loop, basic, test)
+        if iterations is None:
+            return False
+        stays = test.lab_yes in loop.blocks
+        init = basic.init.value
+        final = init + iterations * basic.step
+
+        # The new variable must not wrap around to its final value before
+        # the last iteration. Pointers have at least 16 bits:
+        new_phi, induction_variable = replacements[0]
+        bits = new_phi.ty.bits if new_phi.ty.is_integer else 16
+        if abs(induction_variable.factor * (final - init)) >= 2 ** bits:
+            return False
+
+        end = materialize(
+            induction_variable,
+            new_phi.ty,
+            final,
+            loop.preheader.last_instruction,
+        )
+        test.a = new_phi
+        test.b = end
+        test.cond = "!=" if stays else "=="
+
+        # Remove the old counter:
+        for block in list(phi.inputs):
+            phi.del_incoming(block)
+        delete_unused(update)
+        phi.remove_from_block()
+        return True
+
+
+def materialize(induction_variable, ty, basic_value, before):
+    """Insert instructions which calculate the value of an induction
+    variable before an instruction, given the value of its basic induction
+    variable, which is either an ir value or a number.
+    """
+    block = before.block
+
+    def insert(instruction):
+        block.insert_instruction(instruction, before_instruction=before)
+        return instruction
+
+    def const(value):
+        return insert(ir.Const(value, "num", ty))
+
+    terms = list(induction_variable.invariants.items())
+    constant = induction_variable.constant
+    if induction_variable.factor:
+        terms.insert(0, (basic_value, induction_variable.factor))
+
+    result = None
+    for value, coefficient in terms:
+        if isinstance(value, int):
+            constant += coefficient * value
+            continue
+        elif isinstance(value, ir.Const) and isinstance(value.value, int):
+            constant += coefficient * value.value
+            continue
+
+        if value.ty is not ty:
+            value = insert(ir.Cast(value, "cast", ty))
+        if abs(coefficient) != 1:
+            value = insert(
+                ir.Binop(value, "*", const(abs(coefficient)), "mul", ty)
+            )
+        if result is None and coefficient > 0:
+            result = value
+        else:
+            if result is None:
+                result = const(0)
+            operation = "+" if coefficient > 0 else "-"
+            result = insert(ir.Binop(result, operation, value, "add", ty))
+
+    if result is None:
+        if constant < 0 and not ty.is_signed:
+            result = insert(
+                ir.Binop(const(0), "-", const(-constant), "neg", ty)
+            )
+        else:
+            result = const(constant)
+    elif constant:
+        operation = "+" if constant > 0 else "-"
+        result = insert(
+            ir.Binop(result, operation, const(abs(constant)), "add", ty)
+        )
+    return result
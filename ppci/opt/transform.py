@@ -2,17 +2,27 @@
 
 import logging
 import abc
+import re
 from .. import ir
+from ..utils.timing import timed
+from .analysis import AnalysisManager, CFG_ANALYSES, depends_on
 
 
 class ModulePass(metaclass=abc.ABCMeta):
     """Base class of all optimizing passes.
 
     Subclass this class to implement your own optimization pass.
+
+    A pass lists the analyses it uses in requires, and the analyses
+    which remain valid after it changed a function in preserves.
     """
 
+    requires = ()
+    preserves = ()
+
     def __init__(self):
         self.logger = logging.getLogger(str(self.__class__.__name__))
+        self.analysis_manager = None
 
     def __repr__(self):
         return self.__class__.__name__
@@ -21,22 +31,61 @@ class ModulePass(metaclass=abc.ABCMeta):
         pass
 
     @abc.abstractmethod
-    def run(self, ir_module):  # pragma: no cover
-        """ Run this pass over a module """
+    def run(self, ir_module, analysis_manager=None):  # pragma: no cover
+        """Run this pass over a module.
+
+        Returns whether the module was changed. The analyses of the
+        changed functions must be invalidated in the analysis manager.
+        """
         raise NotImplementedError()
 
+    def get_analysis(self, analysis, function):
+        """Get the result of an analysis of the given function.
+
+        The analysis, or an analysis calculated from it, must be listed
+        in the requires of this pass.
+        """
+        if not any(depends_on(r, analysis) for r in self.requires):
+            raise ValueError(
+                "{} does not require {}".format(self, analysis.__name__)
+            )
+        return self.analysis_manager.get(analysis, function)
+
 
 class FunctionPass(ModulePass):
-    """ Base pass that loops over all functions in a module """
+    """Base pass that loops over all functions in a module.
 
-    def run(self, ir_module: ir.Module):
+    The on_function method returns whether the function was changed.
+    When it returns None, the function is assumed to be changed.
+    """
+
+    def run(self, ir_module: ir.Module, analysis_manager=None):
         """ Main entry point for the pass """
+        changed = self.run_on_functions(
+            ir_module, ir_module.functions, analysis_manager
+        )
+        return bool(changed)
+
+    def run_on_functions(self, ir_module, functions, analysis_manager=None):
+        """Run this pass over some of the functions of a module.
+
+        Returns the functions which were changed.
+        """
         self.prepare()
         self.debug_db = ir_module.debug_db
+        self.analysis_manager = analysis_manager or AnalysisManager()
         assert isinstance(ir_module, ir.Module)
-        for function in ir_module.functions:
-            self.on_function(function)
+        changed = []
+        for function in functions:
+            with timed(function=function.name):
+                if self.on_function(function) is not False:
+                    self.analysis_manager.invalidate(
+                        function, preserved=self.preserves
+                    )
+                    changed.append(function)
         self.debug_db = None
+        self.analysis_manager = None
+        return changed
 
     @abc.abstractmethod
     def on_function(self, function: ir.SubRoutine):  # pragma: no cover
@@ -49,8 +98,11 @@ class BlockPass(FunctionPass):
 
     def on_function(self, function):
         """ Loops over each block in the function """
+        changed = False
         for block in function.blocks:
-            self.on_block(block)
+            if self.on_block(block) is not False:
+                changed = True
+        return changed
 
     @abc.abstractmethod
     def on_block(self, block: ir.Block):  # pragma: no cover
@@ -63,8 +115,11 @@ class InstructionPass(BlockPass):
 
     def on_block(self, block):
         """ Loops over each instruction in the block """
+        changed = False
         for instruction in block:
-            self.on_instruction(instruction)
+            if self.on_instruction(instruction) is not False:
+                changed = True
+        return changed
 
     @abc.abstractmethod
     def on_instruction(self, instruction):  # pragma: no cover
@@ -77,30 +132,38 @@ class RemoveAddZeroPass(InstructionPass):
     Replace multiplication by 1 with value itself.
     """
 
+    preserves = CFG_ANALYSES
+
     def on_instruction(self, instruction):
-        if type(instruction) is ir.Binop:
+        if type(instruction) is ir.Binop and instruction.is_used:
             if instruction.operation == "+":
                 if (
                     type(instruction.b) is ir.Const
                     and instruction.b.value == 0
                 ):
                     instruction.replace_by(instruction.a)
+                    return True
                 elif (
                     type(instruction.a) is ir.Const
                     and instruction.a.value == 0
                 ):
                     instruction.replace_by(instruction.b)
+                    return True
             elif instruction.operation == "*":
                 if (
                     type(instruction.b) is ir.Const
                     and instruction.b.value == 1
                 ):
                     instruction.replace_by(instruction.a)
+                    return True
+        return False
 
 
 class DeleteUnusedInstructionsPass(BlockPass):
     """ Remove unused variables from a block """
 
+    preserves = CFG_ANALYSES
+
     def on_block(self, block):
         unused_instructions = [
             i
@@ -116,3 +179,56 @@ class DeleteUnusedInstructionsPass(BlockPass):
             instruction.remove_from_block()
         if count > 0:
             self.logger.debug("Deleted %i unused instructions", count)
+        return count > 0
+
+
+def delete_unused(value):
+    """ Delete a value, and the values it used, when they are unused """
+    worklist = [value]
+    while worklist:
+        value = worklist.pop()
+        if (
+            isinstance(value, (ir.Binop, ir.Unop, ir.Cast, ir.Const))
+            and value.block is not None
+            and not value.is_used
+        ):
+            worklist.extend(value.uses)
+            value.remove_from_block()
+
+
+def constant_value(value):
+    """ Evaluate an integer value made of constants, or return None """
+    if isinstance(value, ir.Const) and isinstance(value.value, int):
+        return value.value
+    elif isinstance(value, ir.Cast):
+        return constant_value(value.src)
+    elif isinstance(value, ir.Binop) and value.operation in ("+", "-", "*"):
+        a, b = constant_value(value.a), constant_value(value.b)
+        if a is not None and b is not None:
+            return {"+": a + b, "-": a - b, "*": a * b}[value.operation]
+
+
+def same_value(one, another):
+    """ Test if two values are the same, or are the same constant """
+    if one is another:
+        return True
+    return (
+        isinstance(one, ir.Const)
+        and isinstance(another, ir.Const)
+        and one.ty is another.ty
+        and one.value == another.value
+    )
+
+
+def get_name_references(value):
+    """Get the names which the initial value of a variable, or the inline
+    assembly in a function, refer to.
+    """
+    if isinstance(value, ir.Variable):
+        for part in value.value or ():
+            if isinstance(part, tuple):
+                yield part[1]
+    else:
+        for instruction in value.get_instructions_of_type(ir.InlineAsm):
+            # Assembly can refer to any symbol by its name:
+            yield from re.findall(r"[\w.$]+", instruction.template)
@@ -0,0 +1,355 @@
+""" Loop unrolling.
+
+Each iteration of a loop ends with a jump back to the header of the loop,
+where the loop test decides whether the loop continues. Unrolling places
+copies of the loop body after each other, such that one iteration of the
+new loop does the work of several iterations of the original loop.
+
+When a loop runs a constant number of times, and the loop is small, the
+loop is replaced entirely by copies of its body. The tests then disappear
+as well, and the passes which run afterwards can often calculate the
+values of the loop counter in each copy.
+"""
+
+from .. import ir
+from .analysis import InductionVariableAnalysis, LoopAnalysis
+from .analysis import constant_trip_count
+from .inline import copy_instruction
+from .transform import FunctionPass
+
+
+class LoopUnrollPass(FunctionPass):
+    """Unroll small inner loops.
+
+    A loop which runs a constant number of times is unrolled completely,
+    when its size times the number of iterations is at most the threshold.
+    The size of a loop is the number of instructions in it.
+
+    Other inner loops are unrolled by the given factor, when the unrolled
+    loop has at most threshold instructions. The test of the loop is kept
+    in each copy, unless the number of iterations is known to be a
+    multiple of the factor. A loop is only unrolled partially once.
+
+    Only loops which are left from their header, and which have a single
+    back edge, are unrolled.
+    """
+
+    requires = (InductionVariableAnalysis,)
+
+    def __init__(self, threshold=64, factor=4):
+        super().__init__()
+        self.threshold = threshold
+        self.factor = factor
+        self.unrolled = set()
+
+    def __repr__(self):
+        return "{}({}, {})".format(
+            self.__class__.__name__, self.threshold, self.factor
+        )
+
+    def on_function(self, function):
+        headers = {
+            loop.header for loop in self.get_analysis(LoopAnalysis, function)
+        }
+        loops = [
+            loop
+            for loop in self.get_analysis(InductionVariableAnalysis, function)
+            if not any(
+                block in headers
+                for block in loop.blocks
+                if block is not loop.header
+            )
+        ]
+
+        # Unrolling a loop changes the predecessors of the blocks after it,
+        # so a loop which starts there is left for the next run:
+        count = 0
+        changed = set()
+        for loop in loops:
+            if loop.header in changed or loop.preheader in changed:
+                continue
+            exits = {
+                successor
+                for block in loop.blocks
+                for successor in block.successors
+                if successor not in loop.blocks
+            }
+            if self.unroll(function, loop):
+                changed.update(exits)
+                count += 1
+
+        if count > 0:
+            function.delete_unreachable()
+            self.logger.debug("Unrolled %i loops", count)
+        return count > 0
+
+    def unroll(self, function, loop):
+        """ Unroll a single loop, if possible and profitable """
+        header, blocks = loop.header, loop.blocks
+        test = header.last_instruction
+        if not isinstance(test, ir.CJump):
+            return False
+        body, exit_block = get_targets(loop, test)
+        if body not in blocks or exit_block in blocks:
+            return False
+
+        latches = [p for p in header.predecessors if p in blocks]
+        if len(latches) != 1:
+            return False
+        for block in blocks:
+            if block is not header:
+                if any(s not in blocks for s in block.successors):
+                    return False
+                if any(
+                    isinstance(i, (ir.Alloc, ir.InlineAsm, ir.JumpTable))
+                    for i in block
+                ):
+                    return False
+
+        size = sum(len(block) for block in blocks)
+        iterations = None
+        for basic in loop.basics.values():
+            iterations = constant_trip_count(loop, basic, test)
+            if iterations is not None:
+                break
+
+        if iterations is not None and size * iterations <= self.threshold:
+            self.logger.debug(
+                "Unrolling loop %s %i times", header.name, iterations
+            )
+            self.copy_loop(function, loop, latches[0], iterations, True, False)
+            return True
+        elif (
+            header not in self.unrolled
+            and self.factor > 1
+            and size * self.factor <= self.threshold
+        ):
+            keep_tests = iterations is None or iterations % self.factor != 0
+            if keep_tests and not self.can_merge_exits(loop, exit_block):
+                return False
+            self.logger.debug(
+                "Unrolling loop %s by %i", header.name, self.factor
+            )
+            self.copy_loop(
+                function, loop, latches[0], self.factor - 1, False, keep_tests
+            )
+            self.unrolled.add(header)
+            return True
+        return False
+
+    def can_merge_exits(self, loop, exit_block):
+        """Test if the values of the header which are used after the loop
+        can be merged, when each copy of the header can leave the loop.
+        """
+        return exit_block.predecessors == [loop.header] or not any(
+            user.block not in loop.blocks and user.block is not exit_block
+            for instruction in loop.header
+            if isinstance(instruction, ir.Value)
+            for user in instruction.used_by
+        )
+
+    def copy_loop(self, function, loop, latch, copies, complete, keep_tests):
+        """Place copies of the loop body after the loop.
+
+        For a complete unroll, the last copy is only a copy of the header,
+        which leaves the loop. Otherwise, the last copy jumps back to the
+        header. The tests in the copies of the header are only kept when
+        keep_tests is true.
+        """
+        header = loop.header
+        test = header.last_instruction
+        body, exit_block = get_targets(loop, test)
+        order = self.get_block_order(loop)
+
+        # Create the blocks of all copies first, such that a jump can refer
+        # to the header of the next copy:
+        block_maps = []
+        for index in range(1, copies + 1):
+            originals = [header] if complete and index == copies else order
+            block_maps.append(
+                {
+                    block: function.add_block(
+                        ir.Block("{}_unroll".format(block.name))
+                    )
+                    for block in originals
+                }
+            )
+
+        def next_header(index):
+            if index < copies:
+                return block_maps[index][header]
+            return header
+
+        value_maps = [{}]
+        for index, block_map in enumerate(block_maps, 1):
+            previous = value_maps[-1]
+            value_map = {}
+
+            def get(value):
+                return value_map.get(value, value)
+
+            def target(block):
+                if block is header:
+                    return next_header(index)
+                return block_map.get(block, block)
+
+            # The phis of the header get the values of the previous copy:
+            for phi in header.phis:
+                value = phi.get_value(latch)
+                value_map[phi] = previous.get(value, value)
+
+            phis = []
+            for original in order:
+                if original not in block_map:
+                    continue
+                for instruction in original:
+                    if isinstance(instruction, ir.Phi):
+                        if original is header:
+                            continue
+                        new_instruction = ir.Phi(
+                            instruction.name, instruction.ty
+                        )
+                        phis.append((instruction, new_instruction))
+                    elif instruction is test and complete and index == copies:
+                        new_instruction = ir.Jump(exit_block)
+                    elif instruction is test and not keep_tests:
+                        new_instruction = ir.Jump(target(body))
+                    elif isinstance(instruction, ir.Jump):
+                        new_instruction = ir.Jump(target(instruction.target))
+                    elif isinstance(instruction, ir.CJump):
+                        new_instruction = ir.CJump(
+                            get(instruction.a),
+                            instruction.cond,
+                            get(instruction.b),
+                            target(instruction.lab_yes),
+                            target(instruction.lab_no),
+                        )
+                    else:
+                        new_instruction = copy_instruction(
+                            instruction, value_map
+                        )
+                    block_map[original].add_instruction(new_instruction)
+                    value_map[instruction] = new_instruction
+
+            for phi, new_phi in phis:
+                for incoming, value in phi.inputs.items():
+                    new_phi.set_incoming(block_map[incoming], get(value))
+            value_maps.append(value_map)
+
+        # Place the copies after the loop:
+        new_blocks = [
+            block_map[block]
+            for block_map in block_maps
+            for block in function.blocks
+            if block in block_map
+        ]
+        del function.blocks[-len(new_blocks):]
+        position = max(function.blocks.index(b) for b in loop.blocks) + 1
+        function.blocks[position:position] = new_blocks
+
+        latch.change_target(header, next_header(0))
+        blocks = set(loop.blocks) | set(new_blocks)
+        if complete:
+            final_header = block_maps[-1][header]
+            self.finish_complete(
+                loop, exit_block, blocks, final_header, value_maps[-1]
+            )
+        else:
+            last_latch = block_maps[-1][latch]
+            for phi in header.phis:
+                value = phi.get_value(latch)
+                phi.del_incoming(latch)
+                phi.set_incoming(last_latch, value_maps[-1].get(value, value))
+            if keep_tests:
+                self.merge_exits(
+                    loop, exit_block, blocks, block_maps, value_maps
+                )
+
+    def finish_complete(
+        self, loop, exit_block, blocks, final_header, final_map
+    ):
+        """ Connect a completely unrolled loop to the code around it """
+        header = loop.header
+        test = header.last_instruction
+
+        # The loop is left from the copy of the header after the last
+        # iteration:
+        for phi in exit_block.phis:
+            value = phi.get_value(header)
+            phi.del_incoming(header)
+            phi.set_incoming(final_header, final_map.get(value, value))
+        # The original header is the first iteration:
+        if test.lab_yes is exit_block:
+            body = test.lab_no
+        else:
+            body = test.lab_yes
+        header.remove_instruction(test)
+        test.delete()
+        header.add_instruction(ir.Jump(body))
+
+        for instruction in header:
+            if isinstance(instruction, ir.Value):
+                for user in list(instruction.used_by):
+                    if user.block not in blocks:
+                        user.replace_use(instruction, final_map[instruction])
+
+        # The header is only entered from before the loop:
+        for phi in header.phis:
+            phi.replace_by(phi.get_value(loop.preheader))
+            phi.remove_from_block()
+
+    def merge_exits(self, loop, exit_block, blocks, block_maps, value_maps):
+        """ Let the values of the header after the loop come from each copy """
+        header = loop.header
+        copy_headers = [block_map[header] for block_map in block_maps]
+        for phi in exit_block.phis:
+            value = phi.get_value(header)
+            for copy_header, value_map in zip(copy_headers, value_maps[1:]):
+                phi.set_incoming(copy_header, value_map.get(value, value))
+
+        for instruction in header:
+            if not isinstance(instruction, ir.Value):
+                continue
+            users = [
+                user
+                for user in instruction.used_by
+                if user.block not in blocks
+                and not (user.block is exit_block and isinstance(user, ir.Phi))
+            ]
+            if not users:
+                continue
+            merged = ir.Phi("{}_exit".format(instruction.name), instruction.ty)
+            exit_block.insert_instruction(merged)
+            merged.set_incoming(header, instruction)
+            for copy_header, value_map in zip(copy_headers, value_maps[1:]):
+                merged.set_incoming(copy_header, value_map[instruction])
+            for user in users:
+                user.replace_use(instruction, merged)
+
+    def get_block_order(self, loop):
+        """Get the blocks of a loop in reverse post order, such that values
+        are defined before they are used.
+        """
+        visited = {loop.header}
+        order = []
+        worklist = [(loop.header, iter(loop.header.successors))]
+        while worklist:
+            block, successors = worklist[-1]
+            for successor in successors:
+                if successor in loop.blocks and successor not in visited:
+                    visited.add(successor)
+                    worklist.append((successor, iter(successor.successors)))
+                    break
+            else:
+                worklist.pop()
+                order.append(block)
+        order.reverse()
+        return order
+
+
+def get_targets(loop, test):
+    """ Get the targets of a loop test inside and outside of the loop """
+    if test.lab_yes in loop.blocks:
+        return test.lab_yes, test.lab_no
+    else:
+        return test.lab_no, test.lab_yes
@@ -0,0 +1,63 @@
+""" Removal of functions and variables which are never used. """
+
+from itertools import chain
+from .. import ir
+from .transform import ModulePass, get_name_references
+
+
+class DeleteUnusedGlobalsPass(ModulePass):
+    """Remove the local functions and variables of a module which are
+    not referenced.
+
+    Functions and variables with global binding can be used by other
+    modules, so they are kept. So is everything they refer to, from an
+    instruction or from the initial value of a variable. Local functions
+    and variables which are not reached this way are removed, also when
+    they refer to each other.
+    """
+
+    def run(self, ir_module, analysis_manager=None):
+        values = {
+            value.name: value
+            for value in chain(ir_module.functions, ir_module.variables)
+        }
+        worklist = [
+            value
+            for value in values.values()
+            if value.binding != ir.Binding.LOCAL
+        ]
+        live = set(worklist)
+        while worklist:
+            value = worklist.pop()
+            for name in get_references(value):
+                referenced = values.get(name)
+                if referenced is not None and referenced not in live:
+                    live.add(referenced)
+                    worklist.append(referenced)
+
+        removed = 0
+        for function in list(ir_module.functions):
+            if function not in live:
+                if analysis_manager:
+                    analysis_manager.forget(function)
+                ir_module.remove_function(function)
+                removed += 1
+        for variable in list(ir_module.variables):
+            if variable not in live:
+                ir_module.remove_variable(variable)
+                removed += 1
+
+        if removed > 0:
+            self.logger.debug("Removed %i unused globals", removed)
+        return removed > 0
+
+
+def get_references(value):
+    """ Get the names of the global values used by a function or variable """
+    yield from get_name_references(value)
+    if isinstance(value, ir.SubRoutine):
+        for block in value:
+            for instruction in block:
+                for used in instruction.uses:
+                    if isinstance(used, ir.GlobalValue):
+                        yield used.name
@@ -0,0 +1,150 @@
+""" On-disk cache for compiled object files.
+
+The compilation result of a source is stored under a key, which is a hash
+of all inputs that influence the result, such as the source code, the
+compiler options, the target architecture and the ppci version itself.
+When the same compilation is requested again, the object file is loaded
+from disk instead of being compiled again.
+
+The cache is enabled by setting the ``PPCI_CACHE_DIR`` environment variable
+to a directory. Optionally, ``PPCI_CACHE_SIZE`` can be set to limit the
+size of the cache in megabytes. When the cache grows beyond this size,
+the least recently used objects are removed.
+
+.. doctest::
+
+    >>> import io, tempfile
+    >>> from ppci.api import asm
+    >>> from ppci.utils.cache import ObjectCache
+    >>> cache = ObjectCache(tempfile.mkdtemp())
+    >>> key = cache.make_key('asm', 'db 0x77', 'arm')
+    >>> cache.get(key) is None
+    True
+    >>> cache.put(key, asm(io.StringIO('db 0x77'), 'arm'))
+    >>> print(cache.get(key))
+    CodeObject of 1 bytes
+
+"""
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from .. import __version__
+from ..binutils.objectfile import ObjectFile
+
+DEFAULT_CACHE_SIZE = 256  # Megabytes
+
+
+class ObjectCache:
+    """ A size bounded directory with object files indexed by key """
+
+    logger = logging.getLogger("cache")
+    suffix = ".oj"
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self):
+        return "ObjectCache({})".format(self.directory)
+
+    @staticmethod
+    def make_key(*parts):
+        """Create a key from the given parts.
+
+        The ppci version is always part of the key, such that a new
+        version of the compiler does not use stale objects.
+        """
+        digest = hashlib.sha256()
+        for part in (__version__,) + parts:
+            if not isinstance(part, (str, bytes)):
+                part = repr(part)
+            if isinstance(part, str):
+                part = part.encode("utf8")
+            # Include the length, to make the key unambiguous:
+            digest.update(str(len(part)).encode("ascii"))
+            digest.update(b":")
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key, arch=None):
+        """Load the object stored under the given key.
+
+        Returns None when the key is not present. When arch is given, the
+        loaded object is attached to that architecture instance.
+        """
+        filename = self._filename(key)
+        try:
+            with open(filename, "r") as f:
+                obj = ObjectFile.load(f)
+        except (OSError, ValueError):
+            self.logger.debug("Cache miss for %s", key)
+            return
+
+        # Mark this object as recently used:
+        os.utime(filename)
+        self.logger.debug("Cache hit for %s", key)
+        if arch is not None:
+            obj.arch = arch
+        return obj
+
+    def put(self, key, obj):
+        """ Store the object under the given key """
+        output = io.StringIO()
+        obj.save(output)
+
+        # Write to a temporary file first, so that concurrent readers
+        # never see a partially written object:
+        handle, tmp_filename = tempfile.mkstemp(
+            dir=self.directory, suffix=".tmp"
+        )
+        with os.fdopen(handle, "w") as f:
+            f.write(output.getvalue())
+        os.replace(tmp_filename, self._filename(key))
+        self.logger.debug("Stored %s in cache", key)
+        self.evict()
+
+    def evict(self):
+        """ Remove least recently used objects until the cache fits """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(e[1] for e in entries)
+        entries.sort()
+        while entries and total_size > self.max_size:
+            _, size, filename = entries.pop(0)
+            self.logger.debug("Evicting %s from cache", filename)
+            try:
+                os.remove(filename)
+            except OSError:  # pragma: no cover
+                # Possibly removed by another process.
+                pass
+            total_size -= size
+
+    def clear(self):
+        """ Remove all objects from the cache """
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                os.remove(entry.path)
+
+
+def get_object_cache():
+    """Get the object cache configured via the environment.
+
+    Returns None when no cache directory is configured.
+    """
+    directory = os.environ.get("PPCI_CACHE_DIR")
+    if not directory:
+        return
+
+    size = int(os.environ.get("PPCI_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+    return ObjectCache(directory, max_size=size * 1024 * 1024)
@@ -6,7 +6,6 @@
 """
 
 import abc
-import cgitb
 from contextlib import contextmanager
 from datetime import datetime
 import logging
@@ -195,6 +194,8 @@ class TextReportGenerator(TextWritingReporter):
                 self.print("- {}".format(root))
 
     def dump_exception(self, einfo):
+        import cgitb
+
         self.print(cgitb.text(einfo))
 
     def dump_trees(self, trees):
@@ -457,6 +458,8 @@ class HtmlReportGenerator(TextWritingReporter):
                 self.print("- {}".format(root))
 
     def dump_exception(self, einfo):
+        import cgitb
+
         self.print(cgitb.html(einfo))
 
     def dump_trees(self, trees):
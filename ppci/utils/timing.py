@@ -0,0 +1,287 @@
+""" Record where compilation time is spent.
+
+The compiler marks its phases, such as parsing, each optimization pass,
+instruction selection and register allocation. When timings are being
+recorded, the wall time, cpu time and the number of allocated memory
+blocks is measured for each phase, and for each ir-function within the
+phase.
+
+Example usage:
+
+.. doctest::
+
+    >>> import io
+    >>> from ppci.api import c3c
+    >>> from ppci.utils.timing import Timings
+    >>> source = io.StringIO("module main; function int f() { return 2; }")
+    >>> with Timings() as timings:
+    ...     obj = c3c([source], [], 'arm')
+    >>> [t.function for t in timings if t.phase == 'selection']
+    ['main_f']
+
+When no timings are recorded, marking a phase costs next to nothing.
+"""
+
+import contextlib
+import json
+import sys
+import time
+
+
+class PhaseTiming:
+    """The measurements of a single phase, possibly for a single function.
+
+    The times and block counts include those of nested phases, the self
+    values exclude them.
+    """
+
+    def __init__(self, phase, function=None):
+        self.phase = phase
+        self.function = function
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.blocks = 0
+        self.self_wall = 0.0
+        self.self_cpu = 0.0
+        self.self_blocks = 0
+
+    def __repr__(self):
+        return "{}({}) {:.6f} s".format(self.phase, self.function, self.wall)
+
+    def as_dict(self):
+        return {
+            "phase": self.phase,
+            "function": self.function,
+            "count": self.count,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "blocks": self.blocks,
+            "self_wall": self.self_wall,
+            "self_cpu": self.self_cpu,
+            "self_blocks": self.self_blocks,
+        }
+
+    def add(self, other):
+        """ Accumulate the measurements of another timing """
+        self.count += other["count"]
+        self.wall += other["wall"]
+        self.cpu += other["cpu"]
+        self.blocks += other["blocks"]
+        self.self_wall += other["self_wall"]
+        self.self_cpu += other["self_cpu"]
+        self.self_blocks += other["self_blocks"]
+
+
+def _measure():
+    """ Take a sample of the wall time, cpu time and allocated blocks """
+    return (time.perf_counter(), time.process_time(), _allocated_blocks())
+
+
+# Not all python implementations can count the allocated memory blocks:
+_allocated_blocks = getattr(sys, "getallocatedblocks", lambda: 0)
+
+
+class _Frame:
+    """ A phase which is currently running """
+
+    __slots__ = ("timing", "start", "nested")
+
+    def __init__(self, timing):
+        self.timing = timing
+        self.start = _measure()
+        self.nested = [0.0, 0.0, 0]
+
+
+class Timings:
+    """A collection of phase timings.
+
+    Use this as a context manager to record the timings of all
+    compilation which is done within the context.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._stack = []
+
+    def __iter__(self):
+        return iter(self.timings.values())
+
+    def __len__(self):
+        return len(self.timings)
+
+    def __enter__(self):
+        _recorders.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _recorders.remove(self)
+
+    def get(self, phase, function=None):
+        """ Get the timing for the given phase and function """
+        key = (phase, function)
+        if key not in self.timings:
+            self.timings[key] = PhaseTiming(phase, function)
+        return self.timings[key]
+
+    @contextlib.contextmanager
+    def phase(self, name=None, function=None):
+        """Measure the phase with the given name.
+
+        When no name is given, the current phase is measured separately
+        for the given function. A nested phase inherits the function of
+        the phase around it.
+        """
+        if self._stack:
+            parent = self._stack[-1].timing
+            if name is None:
+                name = parent.phase
+            if function is None:
+                function = parent.function
+        elif name is None:
+            name = "other"
+
+        frame = _Frame(self.get(name, function))
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            self._stop(frame)
+
+    def _stop(self, frame):
+        """ Add the measurements of a finished phase """
+        wall, cpu, blocks = [
+            end - start for end, start in zip(_measure(), frame.start)
+        ]
+        timing = frame.timing
+        timing.count += 1
+        timing.wall += wall
+        timing.cpu += cpu
+        timing.blocks += blocks
+        timing.self_wall += wall - frame.nested[0]
+        timing.self_cpu += cpu - frame.nested[1]
+        timing.self_blocks += blocks - frame.nested[2]
+
+        # Exclude this phase from the self values of the phase around it:
+        if self._stack:
+            nested = self._stack[-1].nested
+            nested[0] += wall
+            nested[1] += cpu
+            nested[2] += blocks
+
+    def iterate(self, name, iterable):
+        """Measure the time spent in producing items for the given phase.
+
+        This is used for lazily produced values, such as the tokens
+        of the preprocessor.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def merge(self, data):
+        """ Add timings which were recorded elsewhere, for example in
+        a worker process.
+        """
+        for values in data["timings"]:
+            self.get(values["phase"], values["function"]).add(values)
+
+    def as_dict(self):
+        return {"timings": [timing.as_dict() for timing in self]}
+
+    def dump_json(self, output):
+        """ Write the timings as json to the given file """
+        json.dump(self.as_dict(), output, indent=2)
+        print(file=output)
+
+    def print_table(self, output):
+        """ Print the timings as a text table to the given file """
+        row = "{:<36} {:<24} {:>6} {:>10} {:>10} {:>10} {:>10}"
+        print(
+            row.format(
+                "phase", "function", "count", "wall", "self", "cpu", "blocks"
+            ),
+            file=output,
+        )
+        for timing in self:
+            print(
+                row.format(
+                    timing.phase,
+                    timing.function or "",
+                    timing.count,
+                    "{:.6f}".format(timing.wall),
+                    "{:.6f}".format(timing.self_wall),
+                    "{:.6f}".format(timing.cpu),
+                    timing.blocks,
+                ),
+                file=output,
+            )
+
+
+# The timings which are being recorded, the innermost is used:
+_recorders = []
+
+
+def current_timings():
+    """ Get the timings which are being recorded, if any """
+    if _recorders:
+        return _recorders[-1]
+
+
+def timed(name=None, function=None):
+    """Measure a phase of the compiler, if timings are being recorded.
+
+    Use this as a context manager around the code of the phase.
+    """
+    if _recorders:
+        return _recorders[-1].phase(name, function)
+    else:
+        return _NOT_TIMED
+
+
+def timed_iter(name, iterable):
+    """ Measure the production of the items of an iterable """
+    if _recorders:
+        return _recorders[-1].iterate(name, iterable)
+    else:
+        return iterable
+
+
+def merge_timings(data):
+    """ Add timings recorded elsewhere to the current timings, if any """
+    if data and _recorders:
+        _recorders[-1].merge(data)
+
+
+def call_timed(record, function, *args):
+    """Call a function, and record its timings when record is true.
+
+    This is intended for work done in a worker process. Returns the result
+    of the function and the timings as a dictionary, which can be merged
+    into the timings of the main process with :func:`merge_timings`.
+    """
+    if record:
+        with Timings() as timings:
+            result = function(*args)
+        return result, timings.as_dict()
+    else:
+        return function(*args), None
+
+
+class _NotTimed:
+    """ Context manager which does nothing """
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NOT_TIMED = _NotTimed()
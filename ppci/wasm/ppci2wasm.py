@@ -23,6 +23,7 @@ from ..codegen.irdag import SelectionGraphBuilder, prepare_function_info
 from ..codegen.irdag import FunctionInfo
 from ..codegen.dagsplit import DagSplitter
 from ..binutils import debuginfo
+from ..irutils import expand_jump_table
 from .arch import WasmArchitecture
 from .arch import I32Register, I64Register, F32Register, F64Register
 
@@ -247,6 +248,12 @@ class IrToWasmCompiler:
         self.stack = 0
         self.logger.debug("Generating wasm for %s", ir_function)
 
+        # Structured control flow has no indirect jumps:
+        for jump_table in list(
+            ir_function.get_instructions_of_type(ir.JumpTable)
+        ):
+            expand_jump_table(jump_table)
+
         # Generate function code:
         # Create a selection graph, so that we have expression trees
         arch = WasmArchitecture()
@@ -22,6 +22,7 @@ setup(
             'ppci-build = ppci.cli.build:build',
             'ppci-c3c = ppci.cli.c3c:c3c',
             'ppci-cc = ppci.cli.cc:cc',
+            'ppci-client = ppci.cli.client:client',
             'ppci-dbg = ppci.cli.dbg:dbg',
             'ppci-disasm = ppci.cli.disasm:disasm',
             'ppci-hexdump = ppci.cli.hexdump:hexdump',
@@ -38,6 +39,7 @@ setup(
             'ppci-pedump = ppci.cli.pedump:pedump',
             'ppci-pycompile = ppci.cli.pycompile:pycompile',
             'ppci-readelf = ppci.cli.readelf:readelf',
+            'ppci-server = ppci.cli.server:server',
             'ppci-wasm2wat = ppci.cli.wasm2wat:wasm2wat',
             'ppci-wasmcompile = ppci.cli.wasmcompile:wasmcompile',
             'ppci-wat2wasm = ppci.cli.wat2wasm:wat2wasm',
@@ -99,6 +99,11 @@ class XtensaAssemblyTestCase(AsmTestCaseBase):
         self.feed('label1: j label1')
         self.check('860000 c6ffff 06ffff')
 
+    def test_jx(self):
+        """ Test jump to the address in a register """
+        self.feed('jx a2')
+        self.check('a00200')
+
     def test_l8ui(self):
         self.feed('l8ui a3, a2, 4')
         self.check('320204')
@@ -7,8 +7,10 @@ from ppci.irutils import Builder, Writer
 from ppci.codegen.dagsplit import DagSplitter
 from ppci.codegen.irdag import SelectionGraphBuilder
 from ppci.codegen.irdag import FunctionInfo, prepare_function_info
+from ppci.codegen.codegen import CodeGenerator
 from ppci.arch.example import ExampleArch
 from ppci.binutils.debuginfo import DebugDb
+from ppci.utils.reporting import DummyReportGenerator
 from ppci.api import get_arch
 
 
@@ -189,5 +191,19 @@ class IrDagTestCase(unittest.TestCase):
         # self.assertTrue(sg_value.vreg)
 
 
+class InstructionSelectorTestCase(unittest.TestCase):
+    def test_shared_burg_system(self):
+        """ Code generators for the same target share the burg tables """
+        arch = get_arch('arm')
+        reporter = DummyReportGenerator()
+        cg1 = CodeGenerator(arch, reporter)
+        cg2 = CodeGenerator(arch, reporter)
+        cg3 = CodeGenerator(arch, reporter, optimize_for='speed')
+        self.assertIs(
+            cg1.instruction_selector.sys, cg2.instruction_selector.sys)
+        self.assertIsNot(
+            cg1.instruction_selector.sys, cg3.instruction_selector.sys)
+
+
 if __name__ == '__main__':
     unittest.main()
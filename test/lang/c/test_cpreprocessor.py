@@ -1,5 +1,7 @@
 import unittest
 import io
+import os
+import tempfile
 from unittest import mock
 from ppci.common import CompilerError
 from ppci.lang.c import CPreProcessor
@@ -456,6 +458,28 @@ class CPreProcessorTestCase(unittest.TestCase):
         2"""
         self.preprocess(src, expected)
 
+    def test_dependencies(self):
+        """ Test that included files are recorded """
+        directory = tempfile.mkdtemp()
+        files = {
+            "a.h": '#include "b.h"\n#include <c.h>',
+            "b.h": "",
+            "c.h": '#include "d.h"',
+            "d.h": '#include "b.h"',
+        }
+        for filename, content in files.items():
+            with open(os.path.join(directory, filename), "w") as f:
+                f.write(content)
+        self.preprocessor.coptions.add_include_path(directory)
+        src = '#include "a.h"\n#include "a.h"'
+        self.preprocess(src)
+
+        a, b, c, d = (os.path.join(directory, f) for f in sorted(files))
+        self.assertEqual([a, b, c, d], self.preprocessor.get_dependencies())
+        self.assertEqual(
+            [a, b], self.preprocessor.get_dependencies(system=False)
+        )
+
     @mock.patch("time.strftime", lambda fmt: '"mastah"')
     def test_builtin_time_macros(self):
         """ Test builtin macros __DATE__ and __TIME__ """
@@ -106,6 +106,7 @@ def build_sample_to_code(src, lang, bsp_c3, opt_level, march, debug, reporter):
             io.StringIO(src),
             march,
             coptions=coptions,
+            opt_level=opt_level,
             debug=debug,
             reporter=reporter,
         )
@@ -0,0 +1,30 @@
+/*
+ Test a char which is used as an array index, and which wraps around
+ while it is incremented in a loop.
+*/
+
+#include <stdio.h>
+
+int sum(int *a)
+{
+    int s = 0;
+    signed char c = 120;
+    int k;
+    for (k = 0; k < 16; k++)
+    {
+        s += a[c];
+        c++;
+    }
+    return s;
+}
+
+void main_main()
+{
+    int arr[512];
+    int i;
+    for (i = 0; i < 512; i++)
+    {
+        arr[i] = i;
+    }
+    printf("sum = %d\n", sum(arr + 256));
+}
@@ -0,0 +1,35 @@
+/*
+ Test a state machine, where a branch which does not change the state
+ jumps to a block with phis.
+*/
+
+#include <stdio.h>
+
+int state(const char *s)
+{
+    int st = 0, count = 0;
+    while (*s) {
+        char c = *s++;
+        switch (st) {
+            case 0:
+                if (c == 'a') st = 1;
+                break;
+            case 1:
+                if (c == 'b') st = 2;
+                else if (c != 'a') st = 0;
+                break;
+            case 2:
+                count++;
+                st = 0;
+                break;
+        }
+    }
+    return count * 10 + st;
+}
+
+void main_main()
+{
+    printf("aab = %d\n", state("aab"));
+    printf("abxab = %d\n", state("abxab"));
+    printf("ab = %d\n", state("ab"));
+}
@@ -0,0 +1,80 @@
+/*
+ Test switch statements with dense and sparse case values.
+
+ Dense cases can be selected with a jump table, sparse cases with
+ a tree of comparisons.
+*/
+
+#include <stdio.h>
+
+int dense(int x)
+{
+    int r = 0;
+    switch (x) {
+        case 1: r = 10; break;
+        case 2: r = 20; break;
+        case 3: r = 30;  // fall through
+        case 4: r += 40; break;
+        case 6: r = 60; break;
+        case 7: r = 70; break;
+        case 8: return 80;
+        default: r = -1; break;
+    }
+    return r;
+}
+
+int negative(int x)
+{
+    switch (x) {
+        case -3: return 3;
+        case -2: return 2;
+        case -1: return 1;
+        case 0: return 0;
+        case 1: return -1;
+        case 2: return -2;
+    }
+    return 100;
+}
+
+int sparse(unsigned int x)
+{
+    switch (x) {
+        case 5: return 1;
+        case 100: return 2;
+        case 1000: return 3;
+        case 2000: return 4;
+        case 50000: return 5;
+        case 0x80000000: return 6;
+        default: return 0;
+    }
+}
+
+int letter(char c)
+{
+    switch (c) {
+        case 'a': case 'e': case 'i': case 'o': case 'u':
+            return 1;
+        case 'y':
+            return 2;
+        default:
+            return 0;
+    }
+}
+
+void main_main()
+{
+    int i;
+    for (i = -1; i < 11; i++) {
+        printf("dense(%d) = %d\n", i, dense(i));
+    }
+    for (i = -5; i < 4; i++) {
+        printf("negative(%d) = %d\n", i, negative(i));
+    }
+    printf("sparse: %d %d %d %d %d %d %d %d\n",
+        sparse(5), sparse(100), sparse(1000), sparse(2000), sparse(50000),
+        sparse(0x80000000), sparse(6), sparse(0xffffffff));
+    for (i = 'a'; i <= 'z'; i++) {
+        printf("%d", letter(i));
+    }
+    printf("\n");
+}
@@ -0,0 +1,100 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ppci import api
+from ppci.lang.c import CPreProcessor
+from ppci.utils.cache import ObjectCache, get_object_cache
+
+
+class ObjectCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def test_key(self):
+        key1 = ObjectCache.make_key('a', 'bc')
+        key2 = ObjectCache.make_key('ab', 'c')
+        self.assertNotEqual(key1, key2)
+        self.assertEqual(key1, ObjectCache.make_key('a', 'bc'))
+
+    def test_eviction(self):
+        """ Test that the least recently used object is removed """
+        cache = ObjectCache(self.directory)
+        obj = api.asm(io.StringIO('db 0x77'), 'arm')
+        for key in ('a', 'b', 'c'):
+            cache.put(key, obj)
+            # Make sure the access times differ:
+            os.utime(cache._filename(key), (0, ord(key)))
+        cache.get('a')
+        cache.max_size = 2 * os.path.getsize(cache._filename('a'))
+        cache.evict()
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_environment(self):
+        with patch.dict(os.environ, {'PPCI_CACHE_DIR': ''}):
+            self.assertIsNone(get_object_cache())
+        with patch.dict(os.environ, {'PPCI_CACHE_DIR': self.directory}):
+            self.assertEqual(self.directory, get_object_cache().directory)
+
+
+class CompileCacheTestCase(unittest.TestCase):
+    """ Test that the compiler api functions use the cache """
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        patcher = patch.dict(os.environ, {'PPCI_CACHE_DIR': directory})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cc(self):
+        src = 'int add(int a, int b) { return a + b; }'
+        obj1 = api.cc(io.StringIO(src), 'arm', opt_level=2)
+        with patch('ppci.lang.c.CBuilder') as cbuilder:
+            obj2 = api.cc(io.StringIO(src), 'arm', opt_level=2)
+            self.assertFalse(cbuilder.called)
+        self.assertEqual(obj1, obj2)
+        self.assertIs(obj1.arch, obj2.arch)
+
+        # Other options must not hit the cache:
+        obj3 = api.cc(io.StringIO(src), 'arm', opt_level=0)
+        obj4 = api.cc(io.StringIO(src), 'riscv', opt_level=2)
+        self.assertNotEqual(obj1, obj3)
+        self.assertEqual('riscv', obj4.arch.name)
+
+    def test_cc_dependencies(self):
+        """ The included files are known when the cache is used """
+        directory = tempfile.mkdtemp()
+        header = os.path.join(directory, 'a.h')
+        with open(header, 'w') as f:
+            f.write('#define A 1')
+        src = '#include "{}"\nint a(void) {{ return A; }}'.format(header)
+        for _ in range(2):
+            dependencies = []
+            api.cc(io.StringIO(src), 'arm', dependencies=dependencies)
+            self.assertEqual([header], dependencies)
+
+    def test_cc_preprocess_once(self):
+        """ On a cache miss, the preprocessed source is compiled """
+        src = 'int sub(int a, int b) { return a - b; }'
+        process_file = CPreProcessor.process_file
+        with patch.object(
+                CPreProcessor, 'process_file', autospec=True,
+                side_effect=process_file) as mock:
+            obj = api.cc(io.StringIO(src), 'arm')
+        self.assertEqual(1, mock.call_count)
+        self.assertEqual(obj, api.cc(io.StringIO(src), 'arm'))
+
+    def test_c3c(self):
+        src = 'module main; var int a;'
+        obj1 = api.c3c([io.StringIO(src)], [], 'arm')
+        with patch('ppci.lang.c3.c3_to_ir') as c3_to_ir:
+            obj2 = api.c3c([io.StringIO(src)], [], 'arm')
+            self.assertFalse(c3_to_ir.called)
+        self.assertEqual(obj1, obj2)
+
+
+if __name__ == '__main__':
+    unittest.main()
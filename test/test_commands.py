@@ -3,13 +3,17 @@
 import unittest
 import tempfile
 import io
+import json
 import os
+import socket
+import threading
 from unittest.mock import patch
 
 from ppci.cli.asm import asm
 from ppci.cli.build import build
 from ppci.cli.c3c import c3c
 from ppci.cli.cc import cc
+from ppci.cli.client import client
 from ppci.cli.hexdump import hexdump
 from ppci.cli.java import java
 from ppci.cli.link import link
@@ -18,10 +22,12 @@ from ppci.cli.objcopy import objcopy
 from ppci.cli.ocaml import ocaml
 from ppci.cli.opt import opt
 from ppci.cli.pascal import pascal
+from ppci.cli.server import CompileServer, CompileRequestHandler, warm_up
 from ppci.cli.yacc import yacc
 from ppci import api
 from ppci.common import DiagnosticsManager, SourceLocation
 from ppci.binutils.objectfile import ObjectFile, Section, Image
+from ppci.codegen.instructionselector import InstructionSelector1
 from helper_util import relpath, do_long_tests
 
 
@@ -121,6 +127,63 @@ class CcTestCase(unittest.TestCase):
         oj_file = new_temp_file('.oj')
         cc(['-m', 'arm', '--ir', self.c_file, '-o', oj_file])
 
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_cc_command_m(self, mock_stdout, mock_stderr):
+        """ Test the generation of a makefile rule """
+        dep_file = new_temp_file('.d')
+        cc(['-m', 'arm', '-M', self.c_file, '-MF', dep_file])
+        std_h = relpath('..', 'examples', 'c', 'hello', 'std.h')
+        with open(dep_file) as f:
+            rule = f.read().replace(' \\\n', '')
+        self.assertEqual(
+            'std.o: {} {}\n'.format(self.c_file, std_h), rule)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_cc_command_md(self, mock_stdout, mock_stderr):
+        """ Test that -MD writes the dependencies while compiling """
+        oj_file = new_temp_file('.oj')
+        cc(['-m', 'arm', '-MD', '-c', self.c_file, '-o', oj_file])
+        std_h = relpath('..', 'examples', 'c', 'hello', 'std.h')
+        with open(os.path.splitext(oj_file)[0] + '.d') as f:
+            rule = f.read().replace(' \\\n', '')
+        self.assertEqual(
+            '{}: {} {}\n'.format(oj_file, self.c_file, std_h), rule)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_cc_command_jobs(self, mock_stdout, mock_stderr):
+        """ Check that a parallel build equals a serial build """
+        main_file = relpath('..', 'examples', 'c', 'hello', 'main.c')
+        sources = ['-m', 'arm', '-O', '2', '-g', self.c_file, main_file]
+        serial_file = new_temp_file('.oj')
+        parallel_file = new_temp_file('.oj')
+        cc(sources + ['-o', serial_file])
+        cc(sources + ['-j', '2', '-o', parallel_file])
+        with open(serial_file) as f1, open(parallel_file) as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_cc_command_timings(self, mock_stdout, mock_stderr):
+        """ Test the timings of the compilation phases as json """
+        oj_file = new_temp_file('.oj')
+        timings_file = new_temp_file('.json')
+        cc([
+            '-m', 'arm', '-O', '2', self.c_file, '-o', oj_file,
+            '--timings=json', '--timings-file', timings_file])
+        with open(timings_file) as f:
+            timings = json.load(f)['timings']
+        phases = {t['phase'] for t in timings}
+        for phase in [
+                'preprocess', 'parse', 'irgen', 'optimize', 'CleanPass',
+                'selection', 'register allocation', 'emission']:
+            self.assertIn(phase, phases)
+        functions = {
+            t['function'] for t in timings if t['phase'] == 'selection'}
+        self.assertIn('printf', functions)
+
     @patch('sys.stdout', new_callable=io.StringIO)
     def test_cc_command_help(self, mock_stdout):
         with self.assertRaises(SystemExit) as cm:
@@ -129,6 +192,74 @@ class CcTestCase(unittest.TestCase):
         self.assertIn('compiler', mock_stdout.getvalue())
 
 
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires unix sockets')
+class ServerTestCase(unittest.TestCase):
+    """ Test running tools via the compile server """
+    c_file = relpath('..', 'examples', 'c', 'hello', 'std.c')
+
+    def start_server(self):
+        path = os.path.join(tempfile.mkdtemp(), 'ppci.sock')
+        server = CompileServer(path, CompileRequestHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+        self.addCleanup(stop)
+        return path
+
+    def run_client(self, args):
+        with self.assertRaises(SystemExit) as cm:
+            client(args)
+        return cm.exception.code
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_compile(self, mock_stderr, mock_stdout):
+        """ Check that the server output equals the output of ppci-cc """
+        path = self.start_server()
+        server_file = new_temp_file('.oj')
+        local_file = new_temp_file('.oj')
+        args = ['-m', 'arm', '-c', self.c_file, '-o']
+        cc(args + [local_file])
+        status = self.run_client(
+            ['--socket', path, 'cc'] + args + [server_file])
+        self.assertEqual(0, status)
+        with open(server_file) as f1, open(local_file) as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+        # Errors are reported back:
+        status = self.run_client(['--socket', path, 'cc', 'no_such_file.c'])
+        self.assertEqual(2, status)
+        self.assertIn('no_such_file.c', mock_stderr.getvalue())
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_warm_up(self, mock_stderr, mock_stdout):
+        """ The tools use the instruction selection tables of the server """
+        warm_up(['arm'])
+        cache_info = InstructionSelector1.create_burg_system.cache_info
+        misses = cache_info().misses
+        obj_file = new_temp_file('.oj')
+        for level in ('-O2', '-Os'):
+            cc(['-m', 'arm', level, '-c', self.c_file, '-o', obj_file])
+        self.assertEqual(misses, cache_info().misses)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_no_server(self, mock_stderr, mock_stdout):
+        """ Without server, the client runs the tool itself """
+        path = os.path.join(tempfile.mkdtemp(), 'ppci.sock')
+        obj_file = new_temp_file('.oj')
+        status = self.run_client(
+            ['--socket', path, 'cc', '-m', 'arm', self.c_file, '-o', obj_file])
+        self.assertEqual(0, status)
+        self.assertTrue(os.path.getsize(obj_file))
+
+
 class PascalTestCase(unittest.TestCase):
     """ Test the pascal command-line program """
     @patch('sys.stdout', new_callable=io.StringIO)
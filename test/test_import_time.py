@@ -0,0 +1,108 @@
+""" Benchmark the time it takes to import ppci.
+
+The command line tools import the api module on startup, so this module
+must not import all frontends and targets. The timing itself is only
+checked when LONGTESTS includes importtime, since it is not reliable on a
+busy machine.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+from helper_util import relpath, do_long_tests
+
+
+frontends = [
+    'ppci.lang.c',
+    'ppci.lang.c3',
+    'ppci.lang.bf',
+    'ppci.lang.fortran',
+    'ppci.lang.llvmir',
+    'ppci.lang.pascal',
+    'ppci.lang.ws',
+    'ppci.lang.python',
+    'ppci.wasm',
+]
+
+targets = [
+    'ppci.arch.arm',
+    'ppci.arch.avr',
+    'ppci.arch.example',
+    'ppci.arch.m68k',
+    'ppci.arch.mcs6500',
+    'ppci.arch.microblaze',
+    'ppci.arch.mips',
+    'ppci.arch.msp430',
+    'ppci.arch.or1k',
+    'ppci.arch.riscv',
+    'ppci.arch.stm8',
+    'ppci.arch.x86_64',
+    'ppci.arch.xtensa',
+]
+
+
+def run_python(code):
+    """ Run code in a fresh interpreter, and return its output """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = relpath('..')
+    return subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        env=env, universal_newlines=True, check=True)
+
+
+def imported_modules(code):
+    """ Get the names of all modules imported by the given code """
+    code += '; import sys; print(" ".join(sys.modules))'
+    return set(run_python(code).stdout.split())
+
+
+def import_times(output, toplevel=False):
+    """Get the cumulative import time in microseconds per module.
+
+    When toplevel is True, only the modules imported by the code itself
+    are returned, and not the modules they import.
+    """
+    times = {}
+    for line in output.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if not cumulative.strip().isdigit():
+                continue
+            nested = name.startswith('   ')
+            if not (toplevel and nested):
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def test_lazy_modules(self):
+        """ Importing the api must not import frontends and targets """
+        imported = imported_modules('import ppci.api, ppci.cli.base')
+        for name in frontends + targets:
+            self.assertNotIn(name, imported)
+
+    def test_get_arch(self):
+        """ Only the requested target is imported """
+        imported = imported_modules(
+            'import ppci.api; ppci.api.get_arch("riscv")')
+        self.assertIn('ppci.arch.riscv', imported)
+        self.assertNotIn('ppci.arch.x86_64', imported)
+
+    @unittest.skipUnless(
+        do_long_tests('importtime'), 'timing depends on the machine load')
+    def test_import_time(self):
+        """ Compare the api import time with importing everything """
+        code = '; '.join(
+            ['import ppci.api'] + ['import ' + name for name in frontends] +
+            ['import ' + name for name in targets])
+        times = import_times(run_python(code).stderr, toplevel=True)
+        api_time = times['ppci.api']
+        total_time = sum(times.values())
+        self.assertLess(api_time, 0.75 * total_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
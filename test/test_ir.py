@@ -32,6 +32,42 @@ class IrCodeTestCase(unittest.TestCase):
         self.assertEqual({c3, c4}, add.uses)
         self.assertEqual(c4, add.b)
 
+    def test_use_twice(self):
+        """ A value used twice by an instruction is replaced at once """
+        c1 = ir.Const(1, "one", ir.i32)
+        c2 = ir.Const(2, "two", ir.i32)
+        add = ir.add(c1, c1, "add", ir.i32)
+        c1.replace_by(c2)
+        self.assertEqual({c2}, add.uses)
+        self.assertIs(c2, add.a)
+        self.assertIs(c2, add.b)
+        self.assertFalse(c1.is_used)
+        add.a = c1
+        self.assertEqual({c1, c2}, add.uses)
+        call = ir.ProcedureCall(
+            ir.ExternalProcedure("f", [ir.i32, ir.i32]), [c1, c1])
+        c1.replace_by(c2)
+        self.assertEqual([c2, c2], call.arguments)
+        self.assertFalse(c1.is_used)
+
+    def test_phi_use(self):
+        """ A phi can use the same value for several incoming blocks """
+        block1 = ir.Block("block1")
+        block2 = ir.Block("block2")
+        c1 = ir.Const(1, "one", ir.i32)
+        c2 = ir.Const(2, "two", ir.i32)
+        phi = ir.Phi("phi", ir.i32)
+        phi.set_incoming(block1, c1)
+        phi.set_incoming(block2, c1)
+        phi.replace_use(c1, c2)
+        self.assertEqual({c2}, phi.uses)
+        self.assertFalse(c1.is_used)
+        phi.set_incoming(block1, c1)
+        self.assertEqual({c1, c2}, phi.uses)
+        phi.del_incoming(block2)
+        self.assertEqual({c1}, phi.uses)
+        self.assertFalse(c2.is_used)
+
 
 class IrBuilderTestCase(unittest.TestCase):
     def setUp(self):
@@ -54,6 +90,75 @@ class IrBuilderTestCase(unittest.TestCase):
         # r = self.m.getFunction('add').call(1, 2)
         # self.assertEqual(3, r)
 
+    def make_switch(self, values, jump_tables=True):
+        """ Create a function which switches over the given values """
+        f = self.b.new_function("f", ir.Binding.GLOBAL, ir.i32)
+        self.b.set_function(f)
+        entry = self.b.new_block()
+        f.entry = entry
+        self.b.set_block(entry)
+        x = ir.Parameter("x", ir.i32)
+        f.add_parameter(x)
+        default = self.b.new_block()
+        table = []
+        for value in values:
+            block = self.b.new_block()
+            table.append((value, block))
+            self.b.set_block(block)
+            self.b.emit(ir.Return(self.b.emit_const(value, ir.i32)))
+        self.b.set_block(entry)
+        self.b.emit_switch(x, table, default, jump_tables=jump_tables)
+        self.b.set_block(default)
+        self.b.emit(ir.Return(x))
+        irutils.verify_module(self.m)
+        return f
+
+    def count(self, function, ty):
+        return sum(isinstance(i, ty) for i in function.get_instructions())
+
+    def test_switch_chain(self):
+        """ A few cases are tested one by one """
+        f = self.make_switch([4, 1, 9])
+        self.assertEqual(0, self.count(f, ir.JumpTable))
+        self.assertEqual(3, self.count(f, ir.CJump))
+        conditions = [i.cond for i in f.get_instructions_of_type(ir.CJump)]
+        self.assertEqual(["=="] * 3, conditions)
+
+    def test_switch_table(self):
+        """ Dense cases are selected by a jump table """
+        f = self.make_switch([3, 1, 2, 5, 7, 6])
+        jump_table, = f.get_instructions_of_type(ir.JumpTable)
+        self.assertEqual(0, self.count(f, ir.CJump))
+        self.assertEqual(
+            [1, 2, 3, 5, 6, 7], [value for value, _ in jump_table.table]
+        )
+
+    def test_switch_tree(self):
+        """ Sparse cases are selected by a tree of comparisons """
+        f = self.make_switch([1, 100, 1000, -5, 50, 70000, 20000])
+        self.assertEqual(0, self.count(f, ir.JumpTable))
+        conditions = [i.cond for i in f.get_instructions_of_type(ir.CJump)]
+        self.assertEqual(2, conditions.count("<"))
+        self.assertEqual(7, conditions.count("=="))
+
+    def test_switch_wrap(self):
+        """ Case values are converted to the type of the value """
+        f = self.make_switch([-1, 0xFFFFFFFF + 3, 0])
+        conditions = [
+            i.b.value for i in f.get_instructions_of_type(ir.CJump)
+        ]
+        self.assertEqual([-1, 0, 2], conditions)
+
+    def test_expand_jump_table(self):
+        """ A jump table can be replaced by a tree of comparisons """
+        f = self.make_switch(range(10))
+        jump_table, = f.get_instructions_of_type(ir.JumpTable)
+        irutils.expand_jump_table(jump_table)
+        irutils.verify_module(self.m)
+        self.assertEqual(0, self.count(f, ir.JumpTable))
+        self.assertTrue(self.count(f, ir.CJump))
+        self.assertEqual(set(f.blocks), f.calc_reachable_blocks())
+
 
 class ConstantFolderTestCase(unittest.TestCase):
     def setUp(self):
@@ -89,6 +194,25 @@ class ConstantFolderTestCase(unittest.TestCase):
         v3 = ir.add(v1, v2, "add", ir.i32)
         self.b.emit(v3)
 
+    def test_pointer(self):
+        """ Pointer arithmetic is folded when it cannot wrap around """
+        f = self.b.new_procedure("test", ir.Binding.GLOBAL)
+        self.b.set_function(f)
+        entry = self.b.new_block()
+        f.entry = entry
+        self.b.set_block(entry)
+        zero = self.b.emit(ir.Const(0, "zero", ir.ptr))
+        four = self.b.emit(ir.Const(4, "four", ir.ptr))
+        v1 = self.b.emit(ir.Binop(four, "*", four, "v1", ir.ptr))
+        v2 = self.b.emit(ir.Binop(zero, "-", four, "v2", ir.ptr))
+        self.b.emit(ir.Store(v1, v2))
+        self.b.emit(ir.Exit())
+        self.cf.run(self.m)
+        store = entry.instructions[-2]
+        self.assertIsInstance(store.value, ir.Const)
+        self.assertEqual(16, store.value.value)
+        self.assertIs(v2, store.address)
+
 
 class TestWriter(unittest.TestCase):
     def test_write(self):
@@ -112,6 +236,64 @@ class TestWriter(unittest.TestCase):
         self.assertEqual(f3.getvalue(), f.getvalue())
 
 
+class TestJumpTable(unittest.TestCase):
+    """ Test reading and writing of jump tables """
+    source = """
+    module test;
+    global function i32 f(i32 x) {
+      entry: {
+        jmp_table x [1: a, 3: b, -2: a] default c;
+      }
+      a: {
+        i32 one = 1;
+        jmp c;
+      }
+      b: {
+        jmp c;
+      }
+      c: {
+        i32 r = phi entry: x, a: one, b: x;
+        return r;
+      }
+    }
+    """
+
+    def test_read(self):
+        module = irutils.read_module(io.StringIO(self.source))
+        irutils.verify_module(module)
+        jump_table = module.functions[0].entry.last_instruction
+        self.assertIsInstance(jump_table, ir.JumpTable)
+        self.assertEqual(
+            [(1, "a"), (3, "b"), (-2, "a")],
+            [(value, block.name) for value, block in jump_table.table],
+        )
+        self.assertEqual("c", jump_table.get_target(2).name)
+        self.assertEqual("b", jump_table.get_target(3).name)
+
+    def test_write(self):
+        module = irutils.read_module(io.StringIO(self.source))
+        f = io.StringIO()
+        irutils.Writer(file=f).write(module)
+        module2 = irutils.read_module(io.StringIO(f.getvalue()))
+        f2 = io.StringIO()
+        irutils.Writer(file=f2).write(module2)
+        self.assertEqual(f.getvalue(), f2.getvalue())
+
+    def test_json(self):
+        module = irutils.read_module(io.StringIO(self.source))
+        module2 = irutils.from_json(irutils.to_json(module))
+        irutils.verify_module(module2)
+        self.assertEqual(irutils.to_json(module), irutils.to_json(module2))
+
+    def test_duplicate_value(self):
+        with self.assertRaises(ValueError):
+            ir.JumpTable(
+                ir.Parameter("x", ir.i32),
+                [(1, ir.Block("a")), (1, ir.Block("b"))],
+                ir.Block("c"),
+            )
+
+
 class TestReader(unittest.TestCase):
     def test_add_example(self):
         with open(relpath("data", "add.pi")) as f:
@@ -10,8 +10,33 @@ from ppci.binutils.debuginfo import DebugDb
 from ppci.irutils import verify_module
 from ppci.opt import Mem2RegPromotor
 from ppci.opt import CleanPass
-from ppci.opt.constantfolding import correct
+from ppci.opt import ConstantFolder, PassManager, FunctionPass
+from ppci.opt import CommonSubexpressionEliminationPass
+from ppci.opt import DeleteUnusedInstructionsPass
+from ppci.opt.adce import AggressiveDeadCodeEliminationPass
+from ppci.opt.alias import AliasAnalysis
+from ppci.opt.analysis import AnalysisManager, CfgAnalysis
+from ppci.opt.analysis import DominatorTreeAnalysis, LoopAnalysis
+from ppci.opt.analysis import InductionVariableAnalysis, UseDefAnalysis
+from ppci.opt.analysis import trip_count
+from ppci.opt.cjmp import CJumpPass
+from ppci.opt.constantfolding import correct, remainder
+from ppci.opt.dse import DeadStoreEliminationPass
+from ppci.opt.gvn import GlobalValueNumberingPass
+from ppci.opt.inline import InlinePass
+from ppci.opt.ipo import DeadArgumentEliminationPass
+from ppci.opt.ipo import InterproceduralConstantPropagationPass
+from ppci.opt.jump_threading import JumpThreadingPass
+from ppci.opt.licm import LoopInvariantCodeMotionPass
+from ppci.opt.pipelines import create_pass_manager, get_passes
+from ppci.opt.pipelines import get_codegen_goal
+from ppci.opt.rle import RedundantLoadEliminationPass
+from ppci.opt.sccp import SparseConditionalConstantPropagationPass
+from ppci.opt.sroa import ScalarReplacementOfAggregatesPass
+from ppci.opt.strength_reduction import StrengthReductionPass
 from ppci.opt.tailcall import TailCallOptimization
+from ppci.opt.unroll import LoopUnrollPass
+from ppci.opt.unused_globals import DeleteUnusedGlobalsPass
 
 
 class OptTestCase(unittest.TestCase):
@@ -76,6 +101,31 @@ class CleanTestCase(OptTestCase):
         self.clean_pass.run(self.module)
         self.assertNotIn(block4, self.function)
 
+    def test_keep_phi_values(self):
+        """ An empty block is kept when its predecessor also jumps to the
+        target with another value for a phi.
+        """
+        block_a = self.builder.new_block()
+        block_b = self.builder.new_block()
+        block_c = self.builder.new_block()
+        one = self.builder.emit(ir.Const(1, 'one', ir.i32))
+        two = self.builder.emit(ir.Const(2, 'two', ir.i32))
+        self.builder.emit(ir.CJump(one, '<', two, block_a, block_b))
+        self.builder.set_block(block_a)
+        self.builder.emit(ir.Jump(block_c))
+        self.builder.set_block(block_b)
+        self.builder.emit(ir.Jump(block_c))
+        self.builder.set_block(block_c)
+        phi = self.builder.emit(ir.Phi('phi', ir.i32))
+        phi.set_incoming(block_a, one)
+        phi.set_incoming(block_b, two)
+        self.builder.emit(ir.Exit())
+        verify_module(self.module)
+
+        self.clean_pass.run(self.module)
+        self.assertEqual([one, two], sorted(
+            phi.inputs.values(), key=lambda value: value.value))
+
 
 class Mem2RegTestCase(OptTestCase):
     """ Test the memory to register lifter """
@@ -136,6 +186,1480 @@ class Mem2RegTestCase(OptTestCase):
         self.mem2reg.run(self.module)
         self.assertIn(alloc, self.function.entry.instructions)
 
+    def test_without_debug_db(self):
+        """ Modules can be optimized without debug database """
+        self.module.debug_db = None
+        then = self.builder.new_block()
+        done = self.builder.new_block()
+        alloc = self.builder.emit(ir.Alloc('A', 4, 4))
+        addr = self.builder.emit(ir.AddressOf(alloc, 'addr'))
+        one = self.builder.emit(ir.Const(1, 'one', ir.i32))
+        self.builder.emit(ir.Store(one, addr))
+        self.builder.emit(ir.CJump(one, '<', one, then, done))
+        self.builder.set_block(then)
+        two = self.builder.emit(ir.Const(2, 'two', ir.i32))
+        self.builder.emit(ir.Store(two, addr))
+        self.builder.emit(ir.Jump(done))
+        self.builder.set_block(done)
+        self.builder.emit(ir.Load(addr, 'Ld', ir.i32))
+        self.builder.emit(ir.Exit())
+        self.mem2reg.run(self.module)
+        self.assertNotIn(alloc, self.function.entry.instructions)
+
+
+class PassManagerTestCase(OptTestCase):
+    """ Test the sharing of analyses between passes """
+    def make_loop(self):
+        loop = self.builder.new_block()
+        epilog = self.builder.new_block()
+        cnst = self.builder.emit(ir.Const(1, 'cnst', ir.i32))
+        self.builder.emit(ir.Jump(loop))
+        self.builder.set_block(loop)
+        two = self.builder.emit(ir.Const(2, 'two', ir.i32))
+        value = self.builder.emit(ir.add(cnst, two, 'value', ir.i32))
+        self.builder.emit(ir.CJump(value, '<', cnst, loop, epilog))
+        self.builder.set_block(epilog)
+        self.builder.emit(ir.Exit())
+        return loop
+
+    def test_analyses(self):
+        """ Test the loop and dominator tree analyses """
+        loop = self.make_loop()
+        analyses = AnalysisManager()
+        loops = analyses.get(LoopAnalysis, self.function)
+        self.assertEqual([(loop, [])], loops)
+        dominator_tree = analyses.get(DominatorTreeAnalysis, self.function)
+        self.assertTrue(dominator_tree.strictly_dominates(
+            self.function.entry, loop))
+        self.assertEqual(
+            self.function.blocks, dominator_tree.pre_order())
+        self.assertIs(loops, analyses.get(LoopAnalysis, self.function))
+
+    def test_invalidate(self):
+        """ Analyses which depend on an invalidated analysis are dropped """
+        self.make_loop()
+        analyses = AnalysisManager()
+        analyses.get(LoopAnalysis, self.function)
+        analyses.get(UseDefAnalysis, self.function)
+        analyses.invalidate(
+            self.function, preserved=(DominatorTreeAnalysis, LoopAnalysis))
+        self.assertFalse(analyses.is_cached(LoopAnalysis, self.function))
+        self.assertFalse(analyses.is_cached(UseDefAnalysis, self.function))
+        analyses.get(LoopAnalysis, self.function)
+        analyses.invalidate(
+            self.function,
+            preserved=(CfgAnalysis, DominatorTreeAnalysis, LoopAnalysis))
+        self.assertTrue(analyses.is_cached(LoopAnalysis, self.function))
+
+    def test_preserved_by_pass(self):
+        """ Analyses survive a pass which does not change the cfg """
+        self.make_loop()
+        pass_manager = PassManager([ConstantFolder(), Mem2RegPromotor()])
+        analyses = pass_manager.analysis_manager
+        cfg_info = analyses.get(CfgAnalysis, self.function)
+        analyses.get(UseDefAnalysis, self.function)
+        self.assertTrue(pass_manager.run(self.module))
+        self.assertIs(cfg_info, analyses.get(CfgAnalysis, self.function))
+        self.assertFalse(analyses.is_cached(UseDefAnalysis, self.function))
+
+    def test_invalidated_by_pass(self):
+        """ Analyses are invalidated by a pass which changes the cfg """
+        block = self.builder.new_block()
+        self.builder.emit(ir.Jump(block))
+        self.builder.set_block(block)
+        self.builder.emit(ir.Exit())
+        pass_manager = PassManager([CleanPass()])
+        analyses = pass_manager.analysis_manager
+        cfg_info = analyses.get(CfgAnalysis, self.function)
+        self.assertTrue(pass_manager.run(self.module))
+        self.assertIsNot(cfg_info, analyses.get(CfgAnalysis, self.function))
+
+        # Nothing left to clean up:
+        cfg_info = analyses.get(CfgAnalysis, self.function)
+        self.assertFalse(pass_manager.run(self.module))
+        self.assertIs(cfg_info, analyses.get(CfgAnalysis, self.function))
+
+    def test_verify_fresh_cfg(self):
+        """ The verifier does not trust a possibly outdated cfg """
+        loop = self.make_loop()
+        analyses = AnalysisManager()
+        cfg_info = analyses.get(CfgAnalysis, self.function)
+
+        # Change the cfg, without invalidating the analyses:
+        block = self.builder.new_block()
+        self.function.entry.last_instruction.change_target(loop, block)
+        self.builder.set_block(block)
+        self.builder.emit(ir.Jump(loop))
+        verify_module(self.module, analysis_manager=analyses)
+        self.assertIsNot(cfg_info, analyses.get(CfgAnalysis, self.function))
+
+    def test_undeclared_analysis(self):
+        """ A pass can only use the analyses it requires """
+        self.make_loop()
+        mem2reg = Mem2RegPromotor()
+        mem2reg.analysis_manager = AnalysisManager()
+        mem2reg.get_analysis(CfgAnalysis, self.function)
+        with self.assertRaises(ValueError):
+            mem2reg.get_analysis(LoopAnalysis, self.function)
+
+
+class CountdownPass(FunctionPass):
+    """ Pass which changes each function a fixed number of times """
+    def __init__(self, changes):
+        super().__init__()
+        self.changes = dict(changes)
+        self.visits = []
+
+    def on_function(self, function):
+        self.visits.append(function.name)
+        if self.changes.get(function.name, 0) > 0:
+            self.changes[function.name] -= 1
+            return True
+        return False
+
+
+class FixedPointTestCase(unittest.TestCase):
+    """ Test repeating passes until nothing changes """
+    def setUp(self):
+        builder = irutils.Builder()
+        self.module = ir.Module('test')
+        builder.set_module(self.module)
+        for name in ['f', 'g']:
+            function = builder.new_procedure(name, ir.Binding.GLOBAL)
+            builder.set_function(function)
+            function.entry = builder.new_block()
+            builder.set_block(function.entry)
+            builder.emit(ir.Exit())
+
+    def test_dirty_functions(self):
+        """ Only changed functions are visited again """
+        opt_pass = CountdownPass({'f': 2})
+        pass_manager = PassManager([opt_pass], max_iterations=10)
+        self.assertTrue(pass_manager.run(self.module))
+        self.assertEqual(['f', 'g', 'f', 'f'], opt_pass.visits)
+        self.assertFalse(pass_manager.run(self.module))
+
+    def test_iteration_cap(self):
+        """ The passes are repeated at most max_iterations times """
+        opt_pass = CountdownPass({'f': 5})
+        pass_manager = PassManager([opt_pass], max_iterations=3)
+        self.assertTrue(pass_manager.run(self.module))
+        self.assertEqual(['f', 'g', 'f', 'f'], opt_pass.visits)
+
+
+class CJumpTestCase(unittest.TestCase):
+    """ Test the folding of constant conditional jumps """
+    def test_remove_branch(self):
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 z) {
+          entry: {
+            i32 x = 1;
+            i32 y = 2;
+            cjmp x < y ? a : b;
+          }
+          a: {
+            jmp c;
+          }
+          b: {
+            cjmp z < y ? a : c;
+          }
+          c: {
+            i32 r = phi a: x, b: y;
+            return r;
+          }
+        }
+        """))
+        self.assertTrue(CJumpPass().run(module))
+        verify_module(module)
+        function = module.functions[0]
+        self.assertEqual(['entry', 'a', 'c'], [b.name for b in function])
+
+    def test_jump_table(self):
+        """ A jump table on a constant is replaced by a jump """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f() {
+          entry: {
+            i32 x = 2;
+            jmp_table x [1: a, 2: b, 3: a] default c;
+          }
+          a: {
+            jmp c;
+          }
+          b: {
+            jmp c;
+          }
+          c: {
+            i32 r = phi entry: x, a: x, b: x;
+            return r;
+          }
+        }
+        """))
+        self.assertTrue(CJumpPass().run(module))
+        verify_module(module)
+        function = module.functions[0]
+        self.assertEqual(['entry', 'b', 'c'], [b.name for b in function])
+
+
+class InlineTestCase(unittest.TestCase):
+    """ Test the inlining of functions """
+    def setUp(self):
+        self.module = irutils.read_module(io.StringIO("""
+        module test;
+        local function i32 inc(i32 a) {
+          inc_entry: {
+            i32 one = 1;
+            i32 b = a + one;
+            return b;
+          }
+        }
+        local function i32 pick(i32 a) {
+          pick_entry: {
+            i32 one = 1;
+            i32 b = a * a;
+            i32 c = b * b;
+            cjmp a < one ? pick_yes : pick_no;
+          }
+          pick_yes: {
+            return b;
+          }
+          pick_no: {
+            return c;
+          }
+        }
+        global function i32 main(i32 x) {
+          main_entry: {
+            i32 y = call inc(x);
+            i32 z = call inc(y);
+            i32 w = call pick(z);
+            return w;
+          }
+        }
+        """))
+
+    def test_inline(self):
+        """ Small functions and functions called once are inlined """
+        self.assertTrue(InlinePass(threshold=0).run(self.module))
+        verify_module(self.module)
+        self.assertEqual(['main'], [f.name for f in self.module.functions])
+        main = self.module.functions[0]
+        self.assertTrue(main.is_leaf())
+        self.assertIsInstance(main.blocks[-1].first_instruction, ir.Phi)
+
+    def test_inline_asm(self):
+        """ A function named by inline assembly must be kept """
+        main_entry = self.module['main'].entry
+        main_entry.insert_instruction(ir.InlineAsm('bl pick', []))
+        self.assertTrue(InlinePass(threshold=0).run(self.module))
+        verify_module(self.module)
+        self.assertEqual(
+            ['pick', 'main'], [f.name for f in self.module.functions])
+
+    def test_threshold(self):
+        """ Functions called more than once must be small enough """
+        self.module['pick'].binding = ir.Binding.GLOBAL
+        opt_pass = InlinePass(threshold=-1)
+        self.assertFalse(opt_pass.run(self.module))
+        self.assertEqual(3, len(self.module.functions))
+
+    def test_call_counts(self):
+        """ Hot functions may be larger, cold functions are not inlined """
+        self.module['pick'].binding = ir.Binding.GLOBAL
+        opt_pass = InlinePass(threshold=1, call_counts={'inc': 5})
+        self.assertTrue(opt_pass.run(self.module))
+        verify_module(self.module)
+        self.assertEqual(
+            ['pick'],
+            [c.callee.name for c in self.module['main'].get_out_calls()])
+        opt_pass = InlinePass(threshold=1, call_counts={'pick': 5})
+        self.assertTrue(opt_pass.run(self.module))
+        self.assertTrue(self.module['main'].is_leaf())
+
+    def test_recursion(self):
+        """ Recursive functions are not inlined into themselves """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        local function i32 f(i32 a) {
+          f_entry: {
+            i32 b = call f(a);
+            return b;
+          }
+        }
+        """))
+        self.assertFalse(InlinePass().run(module))
+
+
+class GvnTestCase(unittest.TestCase):
+    """ Test the global value numbering """
+    def test_dominating_block(self):
+        """ Values of a dominating block are reused, loads only when memory
+        is not written in between.
+        """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(ptr p, i32 n) {
+          entry: {
+            i32 a = n * n;
+            i32 b = load p;
+            cjmp n < a ? yes : no;
+          }
+          yes: {
+            i32 c = n * n;
+            i32 d = load p;
+            i32 e = c + d;
+            store e, p;
+            i32 g = load p;
+            jmp no;
+          }
+          no: {
+            i32 h = phi entry: a, yes: g;
+            i32 k = load p;
+            i32 m = h + k;
+            i32 x = n * n;
+            i32 y = m + x;
+            return y;
+          }
+        }
+        """))
+        opt_pass = GlobalValueNumberingPass()
+        self.assertTrue(opt_pass.run(module))
+        verify_module(module)
+        yes, no = module.functions[0].blocks[1:]
+        self.assertEqual(['a', 'b', 'e'], [
+            i.name for i in [yes[2].a, yes[2].b, no[0].inputs[yes]]])
+        self.assertEqual(['m', 'a'], [no[4].a.name, no[4].b.name])
+        self.assertIs(no[1], no[2].b)
+        self.assertFalse(opt_pass.run(module))
+
+    def test_constant_operands(self):
+        """ Expressions with constants of another block are reused """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(ptr a, i32 i) {
+          entry: {
+            i32 one = 1;
+            i32 j = i + one;
+            ptr k = cast j;
+            ptr four = 4;
+            ptr offset = k * four;
+            ptr address = a + offset;
+            i32 x = load address;
+            cjmp x < i ? yes : no;
+          }
+          yes: {
+            i32 one_1 = 1;
+            i32 j_1 = one_1 + i;
+            ptr k_1 = cast j_1;
+            ptr four_1 = 4;
+            ptr offset_1 = k_1 * four_1;
+            ptr address_1 = a + offset_1;
+            i32 y = load address_1;
+            jmp no;
+          }
+          no: {
+            i32 z = phi entry: i, yes: y;
+            return z;
+          }
+        }
+        """))
+        self.assertTrue(GlobalValueNumberingPass().run(module))
+        verify_module(module)
+        entry, yes, no = module.functions[0].blocks
+        self.assertIs(entry.instructions[6], no.instructions[0].inputs[yes])
+        self.assertFalse(any(
+            i.is_used for i in yes.instructions[:-1]
+            if not isinstance(i, ir.Const)))
+
+
+class LicmTestCase(unittest.TestCase):
+    """ Test the loop invariant code motion """
+    def setUp(self):
+        self.module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(ptr p, i32 n) {
+          entry: {
+            i32 zero = 0;
+            cjmp n < zero ? done : outer;
+          }
+          outer: {
+            i32 i = phi entry: zero, outer_latch: i2;
+            jmp inner;
+          }
+          inner: {
+            i32 j = phi outer: zero, inner: j2;
+            i32 four = 4;
+            i32 k = n * four;
+            i32 x = load p;
+            i32 y = x + k;
+            i32 j2 = j + y;
+            cjmp j2 < n ? inner : outer_latch;
+          }
+          outer_latch: {
+            i32 one = 1;
+            i32 i2 = i + one;
+            cjmp i2 < n ? outer : done;
+          }
+          done: {
+            i32 r = phi entry: zero, outer_latch: i2;
+            return r;
+          }
+        }
+        """))
+        self.function = self.module.functions[0]
+
+    def test_nested_loops(self):
+        """ Invariants move out of both loops, into a new preheader. A
+        constant only moves together with its users.
+        """
+        self.assertTrue(LoopInvariantCodeMotionPass().run(self.module))
+        verify_module(self.module)
+        preheader = self.function.blocks[1]
+        self.assertEqual('outer_preheader', preheader.name)
+        self.assertEqual(
+            ['four', 'k', 'x', 'y'],
+            [i.name for i in preheader.instructions[:-1]])
+        latch = self.function.blocks[4]
+        self.assertEqual(
+            ['one', 'i2'], [i.name for i in latch.instructions[:-1]])
+        self.assertFalse(LoopInvariantCodeMotionPass().run(self.module))
+
+    def test_store_in_loop(self):
+        """ Loads stay in a loop which writes memory """
+        inner = self.function.blocks[2]
+        inner.insert_instruction(
+            ir.Store(inner.instructions[1], self.function.arguments[0]),
+            before_instruction=inner.instructions[2])
+        self.assertTrue(LoopInvariantCodeMotionPass().run(self.module))
+        verify_module(self.module)
+        loads = [i for i in inner if isinstance(i, ir.Load)]
+        self.assertEqual(['x'], [i.name for i in loads])
+
+
+class StrengthReductionTestCase(unittest.TestCase):
+    """ Test the induction variables and strength reduction """
+    def make_module(self, limit):
+        """ Create a loop summing a[i] for i from 0 up to limit """
+        return irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(ptr a, i32 n) {{
+          entry: {{
+            i32 zero = 0;
+            i32 hundred = 100;
+            jmp loop;
+          }}
+          loop: {{
+            i32 i = phi entry: zero, body: i2;
+            i32 s = phi entry: zero, body: s2;
+            cjmp i < {} ? body : done;
+          }}
+          body: {{
+            ptr c = cast i;
+            ptr four = 4;
+            ptr offset = c * four;
+            ptr address = a + offset;
+            i32 x = load address;
+            i32 s2 = s + x;
+            i32 one = 1;
+            i32 i2 = i + one;
+            jmp loop;
+          }}
+          done: {{
+            return s;
+          }}
+        }}
+        """.format(limit)))
+
+    def test_analysis(self):
+        module = self.make_module('n')
+        function = module.functions[0]
+        (loop,) = AnalysisManager().get(InductionVariableAnalysis, function)
+        i, s = loop.header.phis
+        self.assertEqual([i], list(loop.basics))
+        self.assertEqual(1, loop.basics[i].step)
+        address = function.blocks[2].instructions[3]
+        induction_variable = loop.values[address]
+        self.assertIs(i, induction_variable.basic)
+        self.assertEqual(4, induction_variable.factor)
+        self.assertEqual({function.arguments[0]: 1},
+                         induction_variable.invariants)
+        self.assertNotIn(s, loop.values)
+
+    def test_narrow_counter(self):
+        """ A char counter wraps around, so its extension is not linear """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(ptr a, i32 n) {
+          entry: {
+            i32 zero = 0;
+            i8 start = 120;
+            jmp loop;
+          }
+          loop: {
+            i32 k = phi entry: zero, body: k2;
+            i8 c = phi entry: start, body: c2;
+            cjmp k < n ? body : done;
+          }
+          body: {
+            i32 w = cast c;
+            ptr p = cast w;
+            ptr four = 4;
+            ptr offset = p * four;
+            ptr address = a + offset;
+            i32 x = load address;
+            i8 one = 1;
+            i8 c2 = c + one;
+            i32 one_1 = 1;
+            i32 k2 = k + one_1;
+            jmp loop;
+          }
+          done: {
+            return k;
+          }
+        }
+        """))
+        function = module.functions[0]
+        (loop,) = AnalysisManager().get(InductionVariableAnalysis, function)
+        k, c = loop.header.phis
+        self.assertEqual({k, c}, set(loop.basics))
+        body = function.blocks[2]
+        self.assertFalse(
+            any(i in loop.values for i in body.instructions[:5]))
+        self.assertFalse(StrengthReductionPass().run(module))
+
+    def test_strength_reduction(self):
+        """ The multiplication is replaced by a pointer increment """
+        module = self.make_module('n')
+        self.assertTrue(StrengthReductionPass().run(module))
+        verify_module(module)
+        loop, body = module.functions[0].blocks[1:3]
+        self.assertEqual(
+            ['i', 's', 'address_iv'], [phi.name for phi in loop.phis])
+        self.assertFalse(any(
+            isinstance(i, ir.Binop) and i.operation == '*' for i in body))
+
+    def test_test_replacement(self):
+        """ With a constant limit, the counter is replaced """
+        module = self.make_module('hundred')
+        self.assertTrue(StrengthReductionPass().run(module))
+        verify_module(module)
+        loop = module.functions[0].blocks[1]
+        self.assertEqual(['s', 'address_iv'], [phi.name for phi in loop.phis])
+        self.assertEqual('!=', loop.last_instruction.cond)
+        self.assertFalse(StrengthReductionPass().run(module))
+
+    def test_shared_variable(self):
+        """ Addresses which differ by a constant share a new variable """
+        module = self.make_module('n')
+        function = module.functions[0]
+        body = function.blocks[2]
+        c, four, _, address = body.instructions[:4]
+        offset = ir.Binop(c, '*', four, 'offset2', ir.ptr)
+        eight = ir.Const(8, 'eight', ir.ptr)
+        offset2 = ir.Binop(offset, '+', eight, 'offset3', ir.ptr)
+        address2 = ir.Binop(
+            function.arguments[0], '+', offset2, 'address2', ir.ptr)
+        y = ir.Load(address2, 'y', ir.i32)
+        store = ir.Store(y, address)
+        for instruction in (offset, eight, offset2, address2, y, store):
+            body.insert_instruction(instruction, body.last_instruction)
+        self.assertTrue(StrengthReductionPass().run(module))
+        verify_module(module)
+        loop = module.functions[0].blocks[1]
+        self.assertEqual(
+            ['i', 's', 'address_iv'], [phi.name for phi in loop.phis])
+
+    def test_trip_count(self):
+        self.assertEqual(10, trip_count(0, 1, '<', 10))
+        self.assertEqual(4, trip_count(0, 3, '<', 10))
+        self.assertEqual(4, trip_count(0, 3, '<=', 9))
+        self.assertEqual(5, trip_count(10, -2, '>', 0))
+        self.assertEqual(5, trip_count(0, 2, '!=', 10))
+        self.assertIsNone(trip_count(0, 3, '!=', 10))
+        self.assertIsNone(trip_count(10, 1, '<', 0))
+        self.assertIsNone(trip_count(0, -1, '<', 10))
+
+
+class LoopUnrollTestCase(unittest.TestCase):
+    """ Test the unrolling of loops """
+    def make_module(self, limit):
+        """ Create a loop summing a[i] for i from 0 up to limit """
+        return irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(ptr a, i32 n) {{
+          entry: {{
+            i32 zero = 0;
+            i32 four = 4;
+            i32 hundred = 100;
+            jmp loop;
+          }}
+          loop: {{
+            i32 i = phi entry: zero, body: i2;
+            i32 s = phi entry: zero, body: s2;
+            cjmp i < {} ? body : done;
+          }}
+          body: {{
+            ptr offset = cast i;
+            ptr address = a + offset;
+            i32 x = load address;
+            i32 s2 = s + x;
+            i32 one = 1;
+            i32 i2 = i + one;
+            jmp loop;
+          }}
+          done: {{
+            return s;
+          }}
+        }}
+        """.format(limit)))
+
+    def count(self, function, ty):
+        return sum(isinstance(i, ty) for i in function.get_instructions())
+
+    def test_complete(self):
+        """ A short loop with a constant trip count is removed """
+        module = self.make_module('four')
+        self.assertTrue(LoopUnrollPass().run(module))
+        verify_module(module)
+        function = module['f']
+        self.assertEqual(0, self.count(function, ir.Phi))
+        self.assertEqual(0, self.count(function, ir.CJump))
+        self.assertEqual(4, self.count(function, ir.Load))
+
+    def test_partial(self):
+        """ Each copy of the loop body is followed by the test """
+        module = self.make_module('n')
+        self.assertTrue(LoopUnrollPass(factor=2).run(module))
+        verify_module(module)
+        function = module['f']
+        self.assertEqual(2, self.count(function, ir.CJump))
+        self.assertEqual(2, self.count(function, ir.Load))
+        self.assertEqual(
+            ['s_exit'], [phi.name for phi in function.blocks[-1].phis])
+
+    def test_partial_multiple(self):
+        """ The copies need no test when the trip count is a multiple of
+        the unroll factor.
+        """
+        module = self.make_module('hundred')
+        unroll_pass = LoopUnrollPass(factor=4)
+        self.assertTrue(unroll_pass.run(module))
+        verify_module(module)
+        function = module['f']
+        self.assertEqual(1, self.count(function, ir.CJump))
+        self.assertEqual(4, self.count(function, ir.Load))
+        self.assertFalse(unroll_pass.run(module))
+
+
+class JumpThreadingTestCase(unittest.TestCase):
+    """ Test jump threading """
+    def test_phi(self):
+        """ A flag which is tested right after it is set """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 x) {
+          entry: {
+            i32 zero = 0;
+            i32 one = 1;
+            cjmp x < zero ? negative : positive;
+          }
+          negative: {
+            jmp check;
+          }
+          positive: {
+            jmp check;
+          }
+          check: {
+            i32 flag = phi negative: one, positive: zero;
+            cjmp flag == one ? a : b;
+          }
+          a: {
+            return one;
+          }
+          b: {
+            return zero;
+          }
+        }
+        """))
+        self.assertTrue(JumpThreadingPass().run(module))
+        verify_module(module)
+        function = module['f']
+        self.assertEqual(1, self.count(function, ir.CJump))
+        self.assertEqual(0, self.count(function, ir.Phi))
+        self.assertNotIn('check', [b.name for b in function])
+
+    def test_split_edge(self):
+        """ A conditional jump gets a new block on a threaded edge into a
+        block with phis, to hold the values of these phis """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 x) {
+          entry: {
+            i32 zero = 0;
+            i32 one = 1;
+            cjmp x < zero ? check : other;
+          }
+          other: {
+            jmp check;
+          }
+          check: {
+            i32 flag = phi entry: one, other: zero;
+            cjmp flag == one ? done : add;
+          }
+          add: {
+            i32 y = x + one;
+            jmp done;
+          }
+          done: {
+            i32 result = phi check: one, add: y;
+            return result;
+          }
+        }
+        """))
+        self.assertTrue(JumpThreadingPass().run(module))
+        verify_module(module)
+        function = module['f']
+        entry = function.entry
+        edge = entry.last_instruction.lab_yes
+        self.assertEqual('done_edge', edge.name)
+        self.assertIsInstance(edge.last_instruction, ir.Jump)
+        result, = function.get_instructions_of_type(ir.Phi)
+        self.assertEqual(1, result.get_value(edge).value)
+
+        # The new block is not skipped again:
+        JumpThreadingPass().run(module)
+        self.assertFalse(JumpThreadingPass().run(module))
+        self.assertIs(edge, entry.last_instruction.lab_yes)
+
+    def test_same_test(self):
+        """ The outcome of a repeated test is known """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 x, i32 y) {
+          entry: {
+            i32 one = 1;
+            cjmp x < y ? first : join;
+          }
+          first: {
+            jmp join;
+          }
+          join: {
+            cjmp y > x ? a : b;
+          }
+          a: {
+            return one;
+          }
+          b: {
+            return y;
+          }
+        }
+        """))
+        self.assertTrue(JumpThreadingPass().run(module))
+        verify_module(module)
+        function = module['f']
+        self.assertEqual(['entry', 'a', 'b'], [b.name for b in function])
+        self.assertEqual(1, self.count(function, ir.CJump))
+
+    def test_used_value(self):
+        """ A block whose values are used elsewhere cannot be skipped """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 x) {
+          entry: {
+            i32 zero = 0;
+            i32 one = 1;
+            cjmp x < zero ? negative : check;
+          }
+          negative: {
+            jmp check;
+          }
+          check: {
+            i32 flag = phi entry: zero, negative: one;
+            cjmp flag == one ? a : b;
+          }
+          a: {
+            return one;
+          }
+          b: {
+            return flag;
+          }
+        }
+        """))
+        self.assertFalse(JumpThreadingPass().run(module))
+
+    def test_merge_targets(self):
+        """ A conditional jump with equal targets is replaced by a jump """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 x) {
+          entry: {
+            i32 zero = 0;
+            cjmp x < zero ? a : a;
+          }
+          a: {
+            return x;
+          }
+        }
+        """))
+        self.assertTrue(JumpThreadingPass().run(module))
+        verify_module(module)
+        self.assertEqual(0, self.count(module['f'], ir.CJump))
+
+    def count(self, function, ty):
+        return sum(isinstance(i, ty) for i in function.get_instructions())
+
+
+class AdceTestCase(unittest.TestCase):
+    """ Test the aggressive dead code elimination """
+    def test_dead_loop(self):
+        """ A loop computing a value which is never used is removed """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(ptr p, i32 n) {
+          entry: {
+            i32 zero = 0;
+            jmp loop;
+          }
+          loop: {
+            i32 i = phi entry: zero, body: i2;
+            i32 s = phi entry: zero, body: s2;
+            cjmp i < n ? body : done;
+          }
+          body: {
+            i32 one = 1;
+            i32 i2 = i + one;
+            i32 s2 = s + i;
+            jmp loop;
+          }
+          done: {
+            store n, p;
+            return zero;
+          }
+        }
+        """))
+        self.assertTrue(AggressiveDeadCodeEliminationPass().run(module))
+        verify_module(module)
+        function = module.functions[0]
+        self.assertEqual(['entry', 'loop', 'done'], [b.name for b in function])
+        self.assertEqual(['jmp done'], [str(i) for i in function.blocks[1]])
+        self.assertFalse(AggressiveDeadCodeEliminationPass().run(module))
+
+    def test_dead_phis(self):
+        """ Phis which only use each other are removed, the loop stays """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global procedure f(ptr p, i32 n) {
+          entry: {
+            i32 zero = 0;
+            jmp loop;
+          }
+          loop: {
+            i32 i = phi entry: zero, loop: i2;
+            i32 s = phi entry: zero, loop: s2;
+            i32 one = 1;
+            i32 i2 = i + one;
+            i32 s2 = s + one;
+            store i2, p;
+            cjmp i2 < n ? loop : done;
+          }
+          done: {
+            exit;
+          }
+        }
+        """))
+        self.assertTrue(AggressiveDeadCodeEliminationPass().run(module))
+        verify_module(module)
+        loop = module.functions[0].blocks[1]
+        self.assertEqual(['i'], [phi.name for phi in loop.phis])
+        self.assertEqual(5, len(loop))
+
+    def test_endless_loop(self):
+        """ A loop which never ends is kept """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global procedure f(i32 n) {
+          entry: {
+            i32 zero = 0;
+            cjmp n < zero ? loop : done;
+          }
+          loop: {
+            jmp loop;
+          }
+          done: {
+            exit;
+          }
+        }
+        """))
+        self.assertFalse(AggressiveDeadCodeEliminationPass().run(module))
+        self.assertEqual(3, len(module.functions[0].blocks))
+
+
+class DeleteUnusedGlobalsTestCase(unittest.TestCase):
+    """ Test the removal of unused local functions and variables """
+    def test_unused_globals(self):
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        local variable a (4 bytes aligned at 4)
+        local variable b (4 bytes aligned at 4)
+        global procedure main() {
+          entry: {
+            call used();
+            exit;
+          }
+        }
+        local procedure used() {
+          entry: {
+            i32 x = load a;
+            exit;
+          }
+        }
+        local procedure unused() {
+          entry: {
+            i32 x = load b;
+            call unused();
+            exit;
+          }
+        }
+        """))
+        self.assertTrue(DeleteUnusedGlobalsPass().run(module))
+        verify_module(module)
+        self.assertEqual(
+            ['main', 'used'], [f.name for f in module.functions])
+        self.assertEqual(['a'], [v.name for v in module.variables])
+        self.assertFalse(DeleteUnusedGlobalsPass().run(module))
+
+
+class InterproceduralTestCase(unittest.TestCase):
+    """ Test the constant propagation and removal of arguments over calls """
+    source = """
+    module test;
+    local variable v (4 bytes aligned at 4)
+    global function i32 main(i32 a) {
+      entry: {
+        i32 three = 3;
+        i32 x = call f(three, a, v);
+        i32 three2 = 3;
+        i32 y = call f(three2, x, v);
+        i32 z = call g(a, three);
+        call h(a);
+        return y;
+      }
+    }
+    local function i32 f(i32 n, i32 m, ptr p) {
+      entry: {
+        i32 r = n + m;
+        store r, p;
+        return r;
+      }
+    }
+    local function i32 g(i32 n, i32 m) {
+      entry: {
+        cjmp n < m ? recurse : done;
+      }
+      recurse: {
+        i32 one = 1;
+        i32 n2 = n + one;
+        i32 r = call g(n2, m);
+        jmp done;
+      }
+      done: {
+        return n;
+      }
+    }
+    global procedure h(i32 n) {
+      entry: {
+        exit;
+      }
+    }
+    """
+
+    def test_constant_argument(self):
+        """ Arguments which are the same for all calls are propagated """
+        module = irutils.read_module(io.StringIO(self.source))
+        opt_pass = InterproceduralConstantPropagationPass()
+        self.assertTrue(opt_pass.run(module))
+        verify_module(module)
+        f = module.get_function('f')
+        self.assertEqual(['m'], [p.name for p in f.arguments if p.is_used])
+        n, add, store, _ = f.entry
+        self.assertIsInstance(n, ir.Const)
+        self.assertEqual(3, n.value)
+        self.assertIs(n, add.a)
+        self.assertIs(module.variables[0], store.address)
+
+        # The recursive call to g passes the same value for m:
+        g = module.get_function('g')
+        self.assertEqual(['n'], [p.name for p in g.arguments if p.is_used])
+        self.assertFalse(opt_pass.run(module))
+
+    def test_dead_arguments(self):
+        """ Unused parameters and return values are removed """
+        module = irutils.read_module(io.StringIO(self.source))
+        InterproceduralConstantPropagationPass().run(module)
+        self.assertTrue(DeadArgumentEliminationPass().run(module))
+        verify_module(module)
+        f = module.get_function('f')
+        self.assertEqual(['m'], [p.name for p in f.arguments])
+        self.assertEqual([0], [p.num for p in f.arguments])
+        g = module.get_function('g')
+        self.assertTrue(g.is_procedure)
+        self.assertEqual(['n'], [p.name for p in g.arguments])
+        self.assertEqual(['main', 'f', 'g', 'h'], [
+            function.name for function in module.functions])
+
+        calls = module.get_function('main').get_out_calls()
+        self.assertEqual([1, 1, 1, 1], [len(c.arguments) for c in calls])
+        self.assertIsInstance(calls[2], ir.ProcedureCall)
+        self.assertFalse(DeadArgumentEliminationPass().run(module))
+
+    def test_address_taken(self):
+        """ A function of which the address is used is not changed """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function ptr main() {
+          entry: {
+            i32 one = 1;
+            call f(one);
+            return f;
+          }
+        }
+        local procedure f(i32 n) {
+          entry: {
+            exit;
+          }
+        }
+        """))
+        self.assertFalse(InterproceduralConstantPropagationPass().run(module))
+        self.assertFalse(DeadArgumentEliminationPass().run(module))
+
+    def test_local_argument(self):
+        """ A value of the caller is not propagated into the function """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global procedure main(i32 a) {
+          entry: {
+            call f(a);
+            call f(a);
+            exit;
+          }
+        }
+        local procedure f(i32 n) {
+          entry: {
+            call g(n);
+            exit;
+          }
+        }
+        external procedure g(i32);
+        """))
+        self.assertFalse(InterproceduralConstantPropagationPass().run(module))
+
+
+class SroaTestCase(unittest.TestCase):
+    """ Test the scalar replacement of aggregates """
+    def make_module(self, y_offset):
+        return irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 a) {{
+          entry: {{
+            blob<8:4> p = alloc 8 bytes aligned at 4;
+            ptr p_addr = &p;
+            blob<8:4> q = alloc 8 bytes aligned at 4;
+            ptr q_addr = &q;
+            ptr four = 4;
+            ptr y_offset = {};
+            ptr p_y = p_addr + four;
+            ptr q_y = q_addr + y_offset;
+            store a, p_addr;
+            store a, p_y;
+            store p, q_addr;
+            i32 x = load q_addr;
+            i32 y = load q_y;
+            i32 z = x + y;
+            return z;
+          }}
+        }}
+        """.format(y_offset)))
+
+    def test_split(self):
+        """ A struct which is copied into another struct is split """
+        module = self.make_module(4)
+        self.assertTrue(ScalarReplacementOfAggregatesPass().run(module))
+        verify_module(module)
+        function = module['f']
+        allocs = [
+            i for i in function.get_instructions()
+            if isinstance(i, ir.Alloc)]
+        self.assertEqual(4, len(allocs))
+        self.assertTrue(all(alloc.amount == 4 for alloc in allocs))
+        self.assertEqual(['z'], [
+            i.name for i in function.get_instructions()
+            if isinstance(i, ir.Binop)])
+
+        # The fields are promoted to registers:
+        Mem2RegPromotor().run(module)
+        verify_module(module)
+        self.assertFalse(any(
+            isinstance(i, (ir.Alloc, ir.Load, ir.Store))
+            for i in function.get_instructions()))
+
+    def test_overlap(self):
+        """ A struct is not split when fields overlap """
+        module = self.make_module(2)
+        self.assertFalse(ScalarReplacementOfAggregatesPass().run(module))
+
+    def test_escape(self):
+        """ A struct is not split when its address is used as a value """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        external procedure g(ptr);
+        global procedure f() {
+          entry: {
+            blob<8:4> p = alloc 8 bytes aligned at 4;
+            ptr p_addr = &p;
+            ptr four = 4;
+            ptr p_y = p_addr + four;
+            i32 one = 1;
+            store one, p_y;
+            call g(p_addr);
+            exit;
+          }
+        }
+        """))
+        self.assertFalse(ScalarReplacementOfAggregatesPass().run(module))
+
+
+class AliasTestCase(unittest.TestCase):
+    """ Test the alias analysis """
+    def test_alias(self):
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        external procedure g(ptr);
+        global variable v (8 bytes aligned at 4)
+        global procedure f(ptr p) {
+          entry: {
+            blob<8:4> a = alloc 8 bytes aligned at 4;
+            ptr a_addr = &a;
+            blob<8:4> b = alloc 8 bytes aligned at 4;
+            ptr b_addr = &b;
+            ptr four = 4;
+            ptr a_y = a_addr + four;
+            ptr v_y = v + four;
+            ptr p_y = p + four;
+            call g(b_addr);
+            exit;
+          }
+        }
+        """))
+        function = module['f']
+        alias_info = AnalysisManager().get(AliasAnalysis, function)
+        values = {
+            i.name: i for i in function.entry if isinstance(i, ir.Value)}
+        values['p'] = function.arguments[0]
+        values['v'] = module['v']
+        self.assertEqual({values['a']}, alias_info.local_objects)
+
+        def location(name, size=4):
+            return alias_info.get_location(values[name], size)
+
+        self.assertEqual((values['a'], 4, 4), location('a_y'))
+        self.assertEqual((values['v'], 4, 4), location('v_y'))
+        self.assertFalse(alias_info.may_alias(location('a_y'), location('a')))
+        self.assertTrue(
+            alias_info.may_alias(location('a_y'), location('a', 8)))
+        self.assertFalse(
+            alias_info.may_alias(location('v_y'), location('b_addr')))
+        self.assertTrue(alias_info.may_alias(location('v_y'), location('p')))
+        self.assertTrue(
+            alias_info.may_alias(location('p_y'), location('b_addr')))
+        self.assertFalse(alias_info.may_alias(location('p_y'), location('a')))
+        self.assertTrue(alias_info.is_local(location('a_y')))
+        self.assertFalse(alias_info.is_local(location('b_addr')))
+
+
+class RedundantLoadTestCase(unittest.TestCase):
+    """ Test the redundant load elimination """
+    def test_branches(self):
+        """ A field loaded in both branches is not loaded again """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(ptr p, ptr q, i32 n) {
+          entry: {
+            ptr four = 4;
+            ptr p_y = p + four;
+            store n, p;
+            cjmp n < n ? yes : no;
+          }
+          yes: {
+            ptr four_1 = 4;
+            ptr p_y_1 = p + four_1;
+            i32 a = load p_y_1;
+            i32 a2 = a + n;
+            jmp done;
+          }
+          no: {
+            i32 b = load p_y;
+            jmp done;
+          }
+          done: {
+            i32 c = load p_y;
+            i32 d = load p;
+            store c, q;
+            i32 e = load p;
+            i32 g = d + e;
+            return g;
+          }
+        }
+        """))
+        self.assertTrue(RedundantLoadEliminationPass().run(module))
+        verify_module(module)
+        done = module['f'].blocks[3]
+        phi = done.instructions[0]
+        self.assertIsInstance(phi, ir.Phi)
+        self.assertEqual(
+            ['a', 'b'], sorted(v.name for v in phi.inputs.values()))
+        self.assertIs(phi, done.instructions[-4].value)
+
+        # The store through q might change p:
+        self.assertEqual(['n', 'e'], [
+            done.instructions[-2].a.name, done.instructions[-2].b.name])
+        self.assertFalse(RedundantLoadEliminationPass().run(module))
+
+    def test_loop(self):
+        """ A load is reused in a loop which does not write its memory """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        external procedure g();
+        global function i32 f(ptr p, i32 n) {
+          entry: {
+            blob<4:4> a = alloc 4 bytes aligned at 4;
+            ptr a_addr = &a;
+            store n, a_addr;
+            i32 x = load p;
+            jmp loop;
+          }
+          loop: {
+            i32 i = phi entry: x, loop: j;
+            i32 y = load p;
+            i32 z = load a_addr;
+            call g();
+            i32 j = i + z;
+            cjmp j < y ? loop : done;
+          }
+          done: {
+            return j;
+          }
+        }
+        """))
+        self.assertTrue(RedundantLoadEliminationPass().run(module))
+        verify_module(module)
+        loop = module['f'].blocks[1]
+        self.assertEqual('n', loop.instructions[4].b.name)
+        self.assertEqual('y', loop.last_instruction.b.name)
+
+
+class DeadStoreTestCase(unittest.TestCase):
+    """ Test the dead store elimination """
+    def test_overwritten(self):
+        """ A store overwritten on all paths, before a read, is removed """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global procedure f(ptr p, ptr q, i32 n) {
+          entry: {
+            ptr four = 4;
+            ptr p_y = p + four;
+            store n, p_y;
+            store n, p;
+            cjmp n < n ? yes : no;
+          }
+          yes: {
+            store n, p;
+            jmp done;
+          }
+          no: {
+            store n, p_y;
+            store n, p;
+            i32 a = load q;
+            store a, q;
+            jmp done;
+          }
+          done: {
+            exit;
+          }
+        }
+        """))
+        self.assertTrue(DeadStoreEliminationPass().run(module))
+        verify_module(module)
+        stores = [
+            i for i in module['f'].get_instructions()
+            if isinstance(i, ir.Store)]
+        self.assertEqual(
+            ['p_y', 'p', 'p_y', 'p', 'q'],
+            [i.address.name for i in stores])
+        self.assertFalse(DeadStoreEliminationPass().run(module))
+
+    def test_local(self):
+        """ Stores into a local allocation which is not read anymore are
+        removed, also in a loop.
+        """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(ptr p, i32 n) {
+          entry: {
+            blob<4:4> a = alloc 4 bytes aligned at 4;
+            ptr a_addr = &a;
+            store n, a_addr;
+            i32 x = load a_addr;
+            jmp loop;
+          }
+          loop: {
+            ptr q = phi entry: p, loop: q2;
+            store x, q;
+            store x, a_addr;
+            ptr four = 4;
+            ptr q2 = q + four;
+            cjmp q2 < p ? loop : done;
+          }
+          done: {
+            return x;
+          }
+        }
+        """))
+        self.assertTrue(DeadStoreEliminationPass().run(module))
+        verify_module(module)
+        stores = [
+            i for i in module['f'].get_instructions()
+            if isinstance(i, ir.Store)]
+        self.assertEqual(['a_addr', 'q'], [i.address.name for i in stores])
+
+
+class SccpTestCase(unittest.TestCase):
+    """ Test the sparse conditional constant propagation """
+    def test_loop(self):
+        """ A value stays constant in a loop, when the branch which would
+        change it is never taken.
+        """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 n) {
+          entry: {
+            i32 one = 1;
+            i32 zero = 0;
+            jmp loop;
+          }
+          loop: {
+            i32 x = phi entry: one, merge: y;
+            i32 i = phi entry: zero, merge: i2;
+            cjmp i < n ? body : done;
+          }
+          body: {
+            i32 t = x * one;
+            cjmp t == one ? same : other;
+          }
+          other: {
+            i32 two = 2;
+            jmp merge;
+          }
+          same: {
+            jmp merge;
+          }
+          merge: {
+            i32 y = phi other: two, same: t;
+            i32 i2 = i + one;
+            jmp loop;
+          }
+          done: {
+            return x;
+          }
+        }
+        """))
+        opt_pass = SparseConditionalConstantPropagationPass()
+        self.assertTrue(opt_pass.run(module))
+        verify_module(module)
+        function = module.functions[0]
+        self.assertNotIn('other', [b.name for b in function])
+        result = function.blocks[-1].last_instruction.result
+        self.assertIsInstance(result, ir.Const)
+        self.assertEqual(1, result.value)
+        self.assertFalse(opt_pass.run(module))
+
+    def test_varying(self):
+        """ A phi with different inputs is not constant """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 n) {
+          entry: {
+            i32 one = 1;
+            i32 two = 2;
+            cjmp n < one ? a : b;
+          }
+          a: {
+            jmp b;
+          }
+          b: {
+            i32 x = phi entry: one, a: two;
+            return x;
+          }
+        }
+        """))
+        opt_pass = SparseConditionalConstantPropagationPass()
+        self.assertFalse(opt_pass.run(module))
+
+    def test_jump_table(self):
+        """ Only the target of a constant value in a jump table is taken """
+        module = irutils.read_module(io.StringIO("""
+        module test;
+        global function i32 f(i32 n) {
+          entry: {
+            i32 one = 1;
+            i32 x = one + one;
+            jmp_table x [1: a, 2: b] default a;
+          }
+          a: {
+            return n;
+          }
+          b: {
+            return one;
+          }
+        }
+        """))
+        opt_pass = SparseConditionalConstantPropagationPass()
+        self.assertTrue(opt_pass.run(module))
+        verify_module(module)
+        function = module.functions[0]
+        self.assertEqual(['entry', 'b'], [b.name for b in function])
+
+
+class PipelinesTestCase(unittest.TestCase):
+    """ Test the passes of the optimization levels """
+    def test_levels(self):
+        self.assertEqual([], get_passes(0))
+        cheap = {type(p) for p in get_passes(1)}
+        full = {type(p) for p in get_passes(2)}
+        self.assertLess(
+            cheap - {CommonSubexpressionEliminationPass,
+                     DeleteUnusedInstructionsPass}, full)
+        self.assertIn(GlobalValueNumberingPass, full)
+        self.assertIn(AggressiveDeadCodeEliminationPass, full)
+        self.assertIn(StrengthReductionPass, full)
+        self.assertIn(ScalarReplacementOfAggregatesPass, full)
+        self.assertIn(RedundantLoadEliminationPass, full)
+        self.assertIn(DeadStoreEliminationPass, full)
+        self.assertIn(LoopUnrollPass, {type(p) for p in get_passes(3)})
+        self.assertNotIn(LoopUnrollPass, full)
+        self.assertEqual(
+            [type(p) for p in get_passes(2)
+             if not isinstance(p, StrengthReductionPass)],
+            [type(p) for p in get_passes('s')])
+        self.assertEqual(1, create_pass_manager(1).max_iterations)
+        inline = [p for p in get_passes('s') if isinstance(p, InlinePass)]
+        self.assertEqual(0, inline[0].threshold)
+        with self.assertRaises(ValueError):
+            get_passes(4)
+
+    def test_codegen_goal(self):
+        self.assertEqual('size', get_codegen_goal('s'))
+        self.assertEqual('speed', get_codegen_goal(2))
+
 
 class TypedEvalTestCase(unittest.TestCase):
     """ Test various integer values wrapped at bitsizes and signedness """
@@ -158,6 +1682,10 @@ class TypedEvalTestCase(unittest.TestCase):
         self.assertEqual(-32767, correct(2+32767, ir.i16))
         self.assertEqual(32766, correct(-32767-3, ir.i16))
 
+    def test_remainder(self):
+        self.assertEqual(-1, remainder(-7, 2))
+        self.assertEqual(1, remainder(7, -2))
+
 
 class TailCallTestCase(unittest.TestCase):
     """ Test the tail call optimization """
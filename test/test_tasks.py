@@ -1,8 +1,27 @@
 import os
 import unittest
 import tempfile
+from unittest.mock import patch
 
+from ppci import api
 from ppci.build.tasks import TaskRunner, TaskError, Project, Target, Task
+from ppci.build.tasks import register_task
+
+
+@register_task
+class WriteFileTask(Task):
+    """ Test task which writes a message into a file """
+    def run(self):
+        filename = self.relpath(self.get_argument('output'))
+        with open(filename, 'w') as f:
+            f.write(self.get_argument('message'))
+
+
+@register_task
+class FailTask(Task):
+    """ Test task which always fails """
+    def run(self):
+        raise TaskError('Failed on purpose')
 
 
 class TaskTestCase(unittest.TestCase):
@@ -50,6 +69,56 @@ class TaskTestCase(unittest.TestCase):
         runner = TaskRunner()
         runner.run(proj, ['t1'])
 
+    def test_topological_order(self):
+        proj = Project('testproject')
+        t1 = Target('t1', proj)
+        t2 = Target('t2', proj)
+        t3 = Target('t3', proj)
+        t1.add_dependency(t2.name)
+        t1.add_dependency(t3.name)
+        t2.add_dependency(t3.name)
+        runner = TaskRunner()
+        order = runner.topological_order([t1, t2, t3])
+        self.assertEqual([t3, t2, t1], order)
+
+    def make_parallel_project(self):
+        """ Create a project with two independent targets """
+        proj = Project('testproject')
+        proj.default = None
+        proj.set_property('basedir', tempfile.mkdtemp())
+        for name in ('a', 'b', 'all'):
+            proj.add_target(Target(name, proj))
+        proj.get_target('a').add_task(
+            ('property', {'name': 'greeting', 'value': 'Hello'}))
+        proj.get_target('b').add_task(
+            ('writefile', {'output': 'b.txt', 'message': 'b'}))
+        proj.get_target('all').add_dependency('a')
+        proj.get_target('all').add_dependency('b')
+        proj.get_target('all').add_task(
+            ('writefile', {'output': 'all.txt', 'message': '${greeting}'}))
+        return proj
+
+    def test_parallel(self):
+        """ Test that properties reach dependent targets """
+        import ppci.build.buildtasks  # noqa: F401
+        proj = self.make_parallel_project()
+        runner = TaskRunner(jobs=2)
+        runner.run(proj, ['all'])
+        basedir = proj.get_property('basedir')
+        with open(os.path.join(basedir, 'all.txt')) as f:
+            self.assertEqual('Hello', f.read())
+
+    def test_parallel_failure(self):
+        """ Test that a failing target stops the build """
+        import ppci.build.buildtasks  # noqa: F401
+        proj = self.make_parallel_project()
+        proj.get_target('b').add_task(('fail', {}))
+        runner = TaskRunner(jobs=2)
+        with self.assertRaisesRegex(TaskError, 'on purpose'):
+            runner.run(proj, ['all'])
+        basedir = proj.get_property('basedir')
+        self.assertFalse(os.path.exists(os.path.join(basedir, 'all.txt')))
+
     def test_ensure_path(self):
         empty_dir = tempfile.mkdtemp()
         txt_filename = os.path.join('a', 'b', 'c.txt')
@@ -68,5 +137,78 @@ class TaskTestCase(unittest.TestCase):
             task.open_file_set('*.asm')
 
 
+class IncrementalBuildTestCase(unittest.TestCase):
+    """ Test that up to date outputs are not created again """
+    recipe = """
+    <project name="inc" default="all">
+        <import name="ppci.build.buildtasks" />
+        <target name="all">
+            <ccompile
+                arch="arm" optimize="0" sources="main.c" output="main.oj" />
+            <link objects="main.oj" output="main.elf.oj" />
+        </target>
+    </project>
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write('build.xml', self.recipe)
+        self.write('main.c', '#include "main.h"\nint f(void) { return X; }')
+        self.write('main.h', '#define X 1')
+
+    def write(self, filename, content):
+        with open(os.path.join(self.directory, filename), 'w') as f:
+            f.write(content)
+
+    def build(self):
+        """ Build the project, and return the amount of compilations """
+        with patch('ppci.api.cc', wraps=api.cc) as cc:
+            api.construct(os.path.join(self.directory, 'build.xml'))
+        return cc.call_count
+
+    def test_rebuild(self):
+        self.assertEqual(1, self.build())
+        self.assertEqual(0, self.build())
+
+        # Changing a header must trigger a new compilation:
+        self.write('main.h', '#define X 22')
+        self.assertEqual(1, self.build())
+        self.assertEqual(0, self.build())
+
+    def test_same_content(self):
+        """ Writing the same contents must not trigger a rebuild """
+        self.assertEqual(1, self.build())
+        self.write('main.c', '#include "main.h"\nint f(void) { return X; }')
+        self.assertEqual(0, self.build())
+
+    def test_changed_arguments(self):
+        self.assertEqual(1, self.build())
+        self.write(
+            'build.xml', self.recipe.replace('optimize="0"', 'optimize="2"'))
+        self.assertEqual(1, self.build())
+
+    def test_nested_header(self):
+        """ Headers included from other directories are tracked too """
+        os.mkdir(os.path.join(self.directory, 'sub'))
+        self.write('main.h', '#include "sub/x.h"')
+        self.write(os.path.join('sub', 'x.h'), '#define X 1')
+        self.assertEqual(1, self.build())
+        self.assertEqual(0, self.build())
+        self.write(os.path.join('sub', 'x.h'), '#define X 2')
+        self.assertEqual(1, self.build())
+
+    def test_removed_source(self):
+        """ Removing a source from the file set triggers a rebuild """
+        self.write('other.c', 'int g(void) { return 2; }')
+        self.write(
+            'build.xml', self.recipe.replace('main.c', 'main.c;other.c'))
+        self.assertEqual(2, self.build())
+        self.assertEqual(0, self.build())
+        self.write('build.xml', self.recipe.replace('main.c', '*.c'))
+        self.assertEqual(2, self.build())
+        os.remove(os.path.join(self.directory, 'other.c'))
+        self.assertEqual(1, self.build())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,83 @@
+import io
+import json
+import unittest
+
+from ppci.utils.timing import Timings, timed, timed_iter, call_timed
+from ppci.utils.timing import current_timings, merge_timings
+
+
+class TimingsTestCase(unittest.TestCase):
+    def test_not_recording(self):
+        """ Phases can be marked when no timings are recorded """
+        self.assertIsNone(current_timings())
+        with timed('parse'):
+            pass
+        self.assertEqual([1, 2], list(timed_iter('lex', [1, 2])))
+
+    def test_nested_phases(self):
+        """ Nested phases are excluded from the self time """
+        with Timings() as timings:
+            with timed('codegen', function='main'):
+                with timed('selection'):
+                    pass
+                with timed('selection'):
+                    pass
+        self.assertIsNone(current_timings())
+        codegen = timings.get('codegen', 'main')
+        selection = timings.get('selection', 'main')
+        self.assertEqual(2, len(timings))
+        self.assertEqual(1, codegen.count)
+        self.assertEqual(2, selection.count)
+        self.assertGreaterEqual(codegen.wall, selection.wall)
+        self.assertAlmostEqual(
+            codegen.self_wall, codegen.wall - selection.wall)
+
+    def test_function_breakdown(self):
+        """ A phase without a name is split per function """
+        with Timings() as timings:
+            with timed('optimize'):
+                with timed(function='f'):
+                    pass
+                with timed(function='g'):
+                    pass
+        self.assertEqual(
+            [('optimize', None), ('optimize', 'f'), ('optimize', 'g')],
+            [(t.phase, t.function) for t in timings])
+
+    def test_iterate(self):
+        """ The production of items is measured, not their use """
+        with Timings() as timings:
+            with timed('parse'):
+                items = list(timed_iter('lex', range(3)))
+        self.assertEqual([0, 1, 2], items)
+        self.assertEqual(4, timings.get('lex').count)
+
+    def test_merge(self):
+        """ Timings of a worker are added to the current timings """
+        def work(x):
+            with timed('work'):
+                return x + 1
+        result, data = call_timed(True, work, 1)
+        self.assertEqual(2, result)
+        self.assertEqual((3, None), call_timed(False, work, 2))
+        with Timings() as timings:
+            merge_timings(data)
+            merge_timings(data)
+        self.assertEqual(2, timings.get('work').count)
+
+    def test_output(self):
+        """ Test the json and text output """
+        with Timings() as timings:
+            with timed('link'):
+                pass
+        f = io.StringIO()
+        timings.dump_json(f)
+        data = json.loads(f.getvalue())
+        self.assertEqual('link', data['timings'][0]['phase'])
+        f = io.StringIO()
+        timings.print_table(f)
+        self.assertIn('link', f.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,118 +2,743 @@
 compiler internals.
 
 This can be used to verify a certain change yields a performance
-improvement or not.
+improvement or not. There are two kinds of benchmarks:
 
-Run the benchmarks with pytest with the benchmark plugin:
+- Corpora: real world C projects, the same ones as the compile_*.py
+  scripts in this folder, compiled for one or more targets.
+- Microbenchmarks: a single compiler stage, such as the lexer, the
+  preprocessor or the linker, on sources which come with ppci.
 
-python -m pytest benchmark.py
+Run the benchmarks, and store the results as a baseline:
+
+    $ python benchmark.py run -o baseline.json
+
+After a change, or an upgrade, run them again and compare the results:
+
+    $ python benchmark.py run -o current.json
+    $ python benchmark.py compare baseline.json current.json
+
+The compare command exits with a non-zero status when a benchmark became
+slower than the threshold allows.
+
+The corpora are looked up in the folder given by the PPCI_CORPORA
+environment variable, which defaults to ~/GIT. Some corpora can be placed
+elsewhere with their own environment variable, like LIBMAD_FOLDER. Corpora
+which cannot be found are skipped. Use the list command to see which
+benchmarks are available.
+
+The microbenchmarks can also be run with pytest and the benchmark plugin:
+
+    $ python -m pytest benchmark.py
 
 """
 
-import time
-import os
+import argparse
+import glob
+import io
+import json
 import logging
-from glob import glob
-from ppci import api
-from ppci.lang.c import COptions
+import os
+import platform
+import statistics
+import sys
+import time
+
+from ppci import api, __version__ as ppci_version
+from ppci.binutils.objectfile import ObjectFile
+from ppci.common import CompilerError, logformat
+from ppci.irutils import to_json, from_json
+from ppci.lang.c import COptions, CLexer, CPreProcessor, CParser, CContext
+from ppci.lang.c.lexer import SourceFile
+from ppci.lang.c.preprocessor import prepare_for_parsing
+from ppci.lang.c.semantics import CSemantics
+from ppci.utils.timing import Timings
+from ppci.wasm import Module, instantiate
 
 this_dir = os.path.abspath(os.path.dirname(__file__))
+root_dir = os.path.join(this_dir, "..")
+libc_folder = os.path.join(root_dir, "librt", "libc")
+libc_includes = os.path.join(libc_folder, "include")
+corpora_folder = os.environ.get(
+    "PPCI_CORPORA", os.path.join(os.path.expanduser("~"), "GIT")
+)
+logger = logging.getLogger("benchmark")
 
 
-def test_nos_on_riscv(benchmark):
-    benchmark(compile_nos_for_riscv)
+class Corpus:
+    """ A C project which is compiled as a benchmark """
 
+    def __init__(
+        self,
+        name,
+        folder,
+        sources,
+        include_paths=(),
+        defines=(),
+        archs=("x86_64",),
+        opt_level=0,
+        freestanding=False,
+        environment_variable=None,
+    ):
+        self.name = name
+        self.folder = folder
+        self.sources = sources
+        self.include_paths = include_paths
+        self.defines = defines
+        self.archs = archs
+        self.opt_level = opt_level
+        self.freestanding = freestanding
+        self.environment_variable = environment_variable
 
-def test_compile_8cc(benchmark):
-    benchmark(compile_8cc)
+    def locate(self):
+        """ Determine the folder of this corpus, None if it is missing """
+        variable = self.environment_variable
+        if variable and variable in os.environ:
+            folder = os.environ[variable]
+        else:
+            folder = os.path.join(corpora_folder, self.folder)
+        if os.path.isdir(folder):
+            return folder
 
+    def get_sources(self, folder):
+        filenames = []
+        for pattern in self.sources:
+            pattern = os.path.join(folder, pattern)
+            filenames.extend(sorted(glob.glob(pattern, recursive=True)))
+        return filenames
 
-def compile_nos_for_riscv():
-    """ Compile nOS for riscv architecture. """
-    logging.basicConfig(level=logging.INFO)
-    murax_folder = os.path.join(this_dir, "..", "examples", "riscvmurax")
-    arch = api.get_arch("riscv")
+    def get_coptions(self, folder):
+        coptions = COptions()
+        for path in self.include_paths:
+            for directory in sorted(
+                glob.glob(os.path.join(folder, path), recursive=True)
+            ):
+                if os.path.isdir(directory):
+                    coptions.add_include_path(directory)
+        for name, value in self.defines:
+            coptions.add_define(name, value)
+        if self.freestanding:
+            coptions.enable("freestanding")
+        return coptions
 
-    # Gather sources:
-    path = os.path.join(murax_folder, "csrc", "nos")
-    folders, srcs = get_sources(path, "*.c")
-    folders += [os.path.join(murax_folder, "csrc")]
-    print(srcs)
+    def compile(self, folder, arch, opt_level=None):
+        """Compile all sources of the corpus.
 
-    coptions = COptions()
-    for folder in folders:
-        coptions.add_include_path(folder)
+        Returns the number of sources which failed to compile, and the
+        total code size of the others. Most corpora use C features which
+        are not (yet) supported, so failures are expected.
+        """
+        if opt_level is None:
+            opt_level = self.opt_level
+        coptions = self.get_coptions(folder)
+        failed = 0
+        code_size = 0
+        for filename in self.get_sources(folder):
+            try:
+                with open(filename, "r") as f:
+                    obj = api.cc(
+                        f, arch, coptions=coptions, opt_level=opt_level
+                    )
+            except CompilerError as ex:
+                logger.debug("%s failed: %s", filename, ex)
+                failed += 1
+            else:
+                code_size += obj.byte_size
+        return failed, code_size
 
-    # Build code:
-    o1 = api.asm(os.path.join(murax_folder, "start.s"), arch)
-    o2 = api.asm(os.path.join(murax_folder, "nOSPortasm.s"), arch)
-    objs = [o1, o2]
 
-    for src in srcs:
-        with open(src) as f:
-            objs.append(api.cc(f, "riscv", coptions=coptions, debug=True))
+corpora = [
+    # The nOS real time os is included in the riscv murax example:
+    Corpus(
+        "nos",
+        os.path.join(root_dir, "examples", "riscvmurax"),
+        ["csrc/nos/**/*.c"],
+        include_paths=["csrc", "csrc/nos/**/"],
+        archs=("riscv",),
+    ),
+    Corpus(
+        "coremark",
+        "coremark",
+        ["*.c", "linux64/*.c", os.path.join(libc_folder, "*.c")],
+        include_paths=[".", "linux64", libc_includes],
+        defines=[
+            ("COMPILER_VERSION", '"ppci {}"'.format(ppci_version)),
+            ("FLAGS_STR", '"-O2"'),
+            ("MEM_METHOD", "MEM_STATIC"),
+            ("__x86_64__", "1"),
+        ],
+        opt_level=2,
+    ),
+    Corpus(
+        "micropython",
+        "micropython",
+        ["py/*.c"],
+        include_paths=[libc_includes, ".", "ports/unix"],
+        defines=[("NO_QSTR", "1")],
+        archs=("arm",),
+        freestanding=True,
+    ),
+    Corpus(
+        "libmad",
+        "libmad",
+        [
+            "layer3.c",
+            "version.c",
+            "fixed.c",
+            "bit.c",
+            "timer.c",
+            "stream.c",
+            "frame.c",
+            "synth.c",
+            "decoder.c",
+            "layer12.c",
+            "huffman.c",
+        ],
+        include_paths=[libc_includes, "."],
+        defines=[("FPM_DEFAULT", "1")],
+        environment_variable="LIBMAD_FOLDER",
+    ),
+    Corpus(
+        "softfloat",
+        "riscv32_lcc",
+        ["lcc/bin/libs/softfloat/softfloat.c"],
+    ),
+    Corpus(
+        "musl",
+        "musl",
+        ["src/regex/*.c"],
+        include_paths=[
+            "include",
+            "src/internal",
+            "obj/include",
+            "arch/x86_64",
+            "arch/generic",
+        ],
+    ),
+    Corpus(
+        "lcc",
+        "lcc",
+        ["src/*.c"],
+        include_paths=[libc_includes],
+        defines=[("FPM_DEFAULT", "1")],
+        environment_variable="LCC_FOLDER",
+    ),
+    Corpus(
+        "8cc",
+        "8cc",
+        [
+            "cpp.c",
+            "debug.c",
+            "dict.c",
+            "gen.c",
+            "lex.c",
+            "vector.c",
+            "parse.c",
+            "buffer.c",
+            "map.c",
+            "error.c",
+            "path.c",
+            "file.c",
+            "set.c",
+            "encoding.c",
+        ],
+        include_paths=[libc_includes, ".", "/usr/include"],
+        defines=[("BUILD_DIR", '"."')],
+    ),
+]
 
-    # Link code:
-    api.link(
-        objs,
-        os.path.join(murax_folder, "firmware.mmap"),
-        use_runtime=True,
-        debug=True,
-    )
 
+# Microbenchmarks, these use sources which come with ppci:
+micro_c_source = os.path.join(this_dir, "fatfs", "xprintf.c")
+micro_c_includes = [libc_includes, os.path.join(this_dir, "fatfs")]
+micro_wasm_module = os.path.join(root_dir, "examples", "wasm", "wasmboy.wasm")
 
-def get_sources(folder, extension):
-    resfiles = []
-    resdirs = []
-    for x in os.walk(folder):
-        subfolder = x[0]
-        for y in glob(os.path.join(subfolder, extension)):
-            resfiles.append(y)
-        resdirs.append(subfolder)
-    return (resdirs, resfiles)
+# Assembly snippets, repeated to form a larger assembly source:
+micro_asm_snippets = {
+    "x86_64": (
+        "label{0}:\nmov rax, rbx\nadd rax, 42\nsub rcx, rax\n"
+        "cmp rax, rcx\njmp label{0}\n"
+    ),
+    "riscv": (
+        "label{0}:\naddi x5, x6, 42\nadd x7, x5, x6\nsw x7, 8(x2)\n"
+        "lw x8, 8(x2)\nbeq x5, x7, label{0}\n"
+    ),
+}
 
 
-def compile_8cc():
-    """ Compile the 8cc compiler.
+class MicroBenchmarks:
+    """A set of benchmarks of the individual compiler stages.
 
-    8cc homepage:
-    https://github.com/rui314/8cc
+    Each benchmark consists of a setup method, which prepares fresh input
+    and is not measured, and a run method.
     """
 
-    home = os.environ['HOME']
-    _8cc_folder = os.path.join(home, 'GIT', '8cc')
-    libc_includes = os.path.join(this_dir, '..', 'librt', 'libc', 'include')
-    linux_include_dir = '/usr/include'
-    arch = api.get_arch('x86_64')
-    coptions = COptions()
-    include_paths = [
-        libc_includes,
-        _8cc_folder,
-        linux_include_dir,
-        ]
-    coptions.add_include_paths(include_paths)
-    coptions.add_define('BUILD_DIR', '"{}"'.format(_8cc_folder))
-
-    sources = [
-        'cpp.c',
-        'debug.c',
-        'dict.c',
-        'gen.c',
-        'lex.c',
-        'vector.c',
-        'parse.c',
-        'buffer.c',
-        'map.c',
-        'error.c',
-        'path.c',
-        'file.c',
-        'set.c',
-        'encoding.c',
+    names = [
+        "lexer",
+        "preprocessor",
+        "parser",
+        "optimize",
+        "ir_to_object",
+        "assembler",
+        "linker",
+        "wasm_instantiate",
     ]
-    objs = []
-    for filename in sources:
-        source_path = os.path.join(_8cc_folder, filename)
-        with open(source_path, 'r') as f:
-            objs.append(api.cc(f, arch, coptions=coptions))
 
-    # TODO: maybe link it?
\ No newline at end of file
+    def __init__(self, arch):
+        self.arch = api.get_arch(arch)
+        self.coptions = COptions()
+        self.coptions.add_include_paths(micro_c_includes)
+        with open(micro_c_source, "r") as f:
+            self.c_source = f.read()
+        self._ir_json = None
+        self._object_texts = None
+
+    def available(self, name):
+        if name == "assembler":
+            return self.arch.name in micro_asm_snippets
+        return True
+
+    def setup_lexer(self):
+        return (io.StringIO(self.c_source),)
+
+    def run_lexer(self, source):
+        lexer = CLexer(self.coptions)
+        return list(lexer.lex(source, SourceFile(micro_c_source)))
+
+    def setup_preprocessor(self):
+        return (io.StringIO(self.c_source),)
+
+    def run_preprocessor(self, source):
+        preprocessor = CPreProcessor(self.coptions)
+        return list(preprocessor.process_file(source, micro_c_source))
+
+    def setup_parser(self):
+        source = io.StringIO(self.c_source)
+        preprocessor = CPreProcessor(self.coptions)
+        tokens = preprocessor.process_file(source, micro_c_source)
+        context = CContext(self.coptions, self.arch.info)
+        parser = CParser(self.coptions, CSemantics(context))
+        return parser, list(prepare_for_parsing(tokens, parser.keywords))
+
+    def run_parser(self, parser, tokens):
+        return parser.parse(iter(tokens))
+
+    def get_ir_module(self):
+        """ Get a fresh copy of the ir-module of the C source """
+        if self._ir_json is None:
+            source = io.StringIO(self.c_source)
+            source.name = micro_c_source
+            ir_module = api.c_to_ir(source, self.arch, coptions=self.coptions)
+            self._ir_json = to_json(ir_module)
+        return from_json(self._ir_json)
+
+    def setup_optimize(self):
+        return (self.get_ir_module(),)
+
+    def run_optimize(self, ir_module):
+        api.optimize(ir_module, level=2)
+
+    def setup_ir_to_object(self):
+        return (self.get_ir_module(),)
+
+    def run_ir_to_object(self, ir_module):
+        return api.ir_to_object([ir_module], self.arch)
+
+    def setup_assembler(self):
+        snippet = micro_asm_snippets[self.arch.name]
+        text = "".join(snippet.format(i) for i in range(50))
+        return (io.StringIO(text),)
+
+    def run_assembler(self, source):
+        return api.asm(source, self.arch)
+
+    def setup_linker(self):
+        if self._object_texts is None:
+            self._object_texts = []
+            for index in range(10):
+                # Rename the symbols, such that each object defines its own:
+                ir_module = self.get_ir_module()
+                for value in ir_module.functions + ir_module.variables:
+                    value.name = "{}_{}".format(value.name, index)
+                obj = api.ir_to_object([ir_module], self.arch)
+                f = io.StringIO()
+                obj.save(f)
+                self._object_texts.append(f.getvalue())
+        objs = [ObjectFile.load(io.StringIO(t)) for t in self._object_texts]
+        return (objs,)
+
+    def run_linker(self, objs):
+        return api.link(objs, partial_link=True)
+
+    def setup_wasm_instantiate(self):
+        with open(micro_wasm_module, "rb") as f:
+            return (Module(f),)
+
+    def run_wasm_instantiate(self, wasm_module):
+        def log(a: int, b: int, c: int, d: int, e: int, f: int, g: int):
+            pass
+
+        imports = {"env": {"log": log}}
+        return instantiate(wasm_module, imports=imports, target="python")
+
+    def measure(self, name, repeat):
+        """ Run a benchmark repeatedly, return the measured times """
+        setup = getattr(self, "setup_" + name)
+        run = getattr(self, "run_" + name)
+        times = []
+        for _ in range(repeat):
+            args = setup()
+            start = time.perf_counter()
+            run(*args)
+            times.append(time.perf_counter() - start)
+        return times
+
+
+def summarize(times, **extra):
+    """ Create the result of a benchmark from the measured times """
+    result = {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "times": times,
+    }
+    result.update(extra)
+    return result
+
+
+def run_corpus(corpus, folder, arch, repeat):
+    """ Compile a corpus a number of times, and record the timings """
+    times = []
+    for _ in range(repeat):
+        with Timings() as timings:
+            start = time.perf_counter()
+            failed, _ = corpus.compile(folder, arch)
+            times.append(time.perf_counter() - start)
+
+    # The time spent per phase, of the last run:
+    phases = {}
+    for timing in timings:
+        phases[timing.phase] = phases.get(timing.phase, 0) + timing.self_wall
+    return summarize(times, failed=failed, phases=phases)
+
+
+def list_benchmarks(args):
+    for corpus in corpora:
+        folder = corpus.locate()
+        print(
+            "corpus/{:<20} {:<24} {}".format(
+                corpus.name, ",".join(corpus.archs), folder or "(not found)"
+            )
+        )
+    for name in MicroBenchmarks.names:
+        print("micro/{}".format(name))
+
+
+def run_benchmarks(args):
+    """ Run the selected benchmarks and save the results """
+    results = {
+        "version": 1,
+        "ppci": ppci_version,
+        "python": "{} {}".format(
+            platform.python_implementation(), platform.python_version()
+        ),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "benchmarks": {},
+    }
+    benchmarks = results["benchmarks"]
+
+    # When benchmarks are selected by name, only those are run:
+    if not (args.micro_only or (args.micro and not args.corpus)):
+        for corpus in corpora:
+            if args.corpus and corpus.name not in args.corpus:
+                continue
+            folder = corpus.locate()
+            if not folder:
+                logger.info("Skipping corpus %s, not found", corpus.name)
+                continue
+            for arch in args.machine or corpus.archs:
+                name = "corpus/{}/{}".format(corpus.name, arch)
+                logger.info("Running %s", name)
+                benchmarks[name] = run_corpus(
+                    corpus, folder, arch, args.corpus_repeat
+                )
+                report(name, benchmarks[name])
+
+    if not (args.corpus_only or (args.corpus and not args.micro)):
+        for arch in args.machine or ["x86_64"]:
+            micro = MicroBenchmarks(arch)
+            for bench in MicroBenchmarks.names:
+                if args.micro and bench not in args.micro:
+                    continue
+                if not micro.available(bench):
+                    continue
+                name = "micro/{}/{}".format(bench, arch)
+                logger.info("Running %s", name)
+                benchmarks[name] = summarize(micro.measure(bench, args.repeat))
+                report(name, benchmarks[name])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            print(file=f)
+
+
+def report(name, result):
+    print(
+        "{:<40} min {:10.4f} s median {:10.4f} s".format(
+            name, result["min"], result["median"]
+        )
+    )
+
+
+def compare_benchmarks(args):
+    """Compare the results of two runs.
+
+    Returns the number of benchmarks which are slower than allowed.
+    """
+    with open(args.baseline) as f:
+        baseline = json.load(f)["benchmarks"]
+    with open(args.current) as f:
+        current = json.load(f)["benchmarks"]
+
+    slower = 0
+    print(
+        "{:<40} {:>10} {:>10} {:>8}".format(
+            "benchmark", "baseline", "current", "change"
+        )
+    )
+    for name in sorted(set(baseline) | set(current)):
+        if name not in current:
+            print("{:<40} missing in current results".format(name))
+            continue
+        if name not in baseline:
+            print("{:<40} new".format(name))
+            continue
+        old = baseline[name][args.statistic]
+        new = current[name][args.statistic]
+        change = new / old - 1 if old else 0
+        if change > args.threshold:
+            verdict = "SLOWER"
+            slower += 1
+        elif change < -args.threshold:
+            verdict = "faster"
+        else:
+            verdict = ""
+        line = "{:<40} {:10.4f} {:10.4f} {:+7.1%} {}".format(
+            name, old, new, change, verdict
+        )
+        print(line.rstrip())
+        old_failed = baseline[name].get("failed")
+        new_failed = current[name].get("failed")
+        if old_failed != new_failed:
+            print(
+                "{:<40} failed sources changed from {} to {}".format(
+                    "", old_failed, new_failed
+                )
+            )
+    return slower
+
+
+# The allowed time spent in optimization and code generation, and the
+# allowed code size, of each optimization level, relative to compiling
+# without optimization:
+level_budgets = {
+    "0": (1.0, 1.0),
+    "1": (1.0, 0.95),
+    "2": (1.2, 0.9),
+    "3": (1.5, 1.0),
+    "s": (1.2, 0.9),
+}
+
+
+# The phases of the frontends, which do not depend on the optimization level:
+frontend_phases = ("preprocess", "parse", "semantics", "irgen")
+
+
+def backend_time(timings):
+    """ Get the time spent in optimization and code generation """
+    return sum(
+        timing.self_wall
+        for timing in timings
+        if timing.phase not in frontend_phases
+    )
+
+
+def check_levels(args):
+    """Compile corpora at each optimization level, and check that the
+    code size and the time spent after the frontend are within the
+    budgets of the level.
+
+    Returns the number of exceeded budgets.
+    """
+    exceeded = 0
+    print(
+        "{:<24} {:>5} {:>10} {:>8} {:>10} {:>8}".format(
+            "corpus", "level", "time", "ratio", "size", "ratio"
+        )
+    )
+    for corpus in corpora:
+        if corpus.name not in (args.corpus or ["nos"]):
+            continue
+        folder = corpus.locate()
+        if not folder:
+            logger.info("Skipping corpus %s, not found", corpus.name)
+            continue
+        for arch in args.machine or corpus.archs:
+            name = "{}/{}".format(corpus.name, arch)
+            base = None
+            for level in api.OPT_LEVELS:
+                times = []
+                for _ in range(args.repeat):
+                    with Timings() as timings:
+                        _, size = corpus.compile(folder, arch, opt_level=level)
+                    times.append(backend_time(timings))
+                if base is None:
+                    base = min(times), size
+                time_ratio = min(times) / base[0]
+                size_ratio = size / base[1] if base[1] else 1
+                time_budget, size_budget = level_budgets[level]
+                verdict = []
+                if time_ratio > time_budget:
+                    verdict.append("TOO SLOW")
+                if size_ratio > size_budget:
+                    verdict.append("TOO LARGE")
+                exceeded += len(verdict)
+                line = "{:<24} {:>5} {:10.4f} {:8.2f} {:10} {:8.2f} {}".format(
+                    name,
+                    "-O" + level,
+                    min(times),
+                    time_ratio,
+                    size,
+                    size_ratio,
+                    " ".join(verdict),
+                )
+                print(line.rstrip())
+    return exceeded
+
+
+parser = argparse.ArgumentParser(
+    description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+)
+parser.add_argument("--verbose", "-v", action="count", default=0)
+subparsers = parser.add_subparsers(dest="command")
+subparsers.required = True
+subparsers.add_parser("list", help="List the benchmarks")
+run_parser = subparsers.add_parser("run", help="Run benchmarks")
+run_parser.add_argument(
+    "--output", "-o", help="Save the results as json in this file"
+)
+run_parser.add_argument(
+    "--machine",
+    "-m",
+    action="append",
+    help="Run for this target, instead of the default targets",
+)
+run_parser.add_argument(
+    "--corpus", action="append", help="Only run the given corpus"
+)
+run_parser.add_argument(
+    "--micro", action="append", help="Only run the given microbenchmark"
+)
+run_parser.add_argument(
+    "--corpus-only", action="store_true", help="Skip the microbenchmarks"
+)
+run_parser.add_argument(
+    "--micro-only", action="store_true", help="Skip the corpora"
+)
+run_parser.add_argument(
+    "--repeat",
+    type=int,
+    default=5,
+    help="The number of runs of each microbenchmark",
+)
+run_parser.add_argument(
+    "--corpus-repeat",
+    type=int,
+    default=1,
+    help="The number of compilations of each corpus",
+)
+levels_parser = subparsers.add_parser(
+    "levels",
+    help="Check the compile time and code size of the optimization levels",
+)
+levels_parser.add_argument(
+    "--machine",
+    "-m",
+    action="append",
+    help="Compile for this target, instead of the default targets",
+)
+levels_parser.add_argument(
+    "--corpus", action="append", help="Compile this corpus, default nos"
+)
+levels_parser.add_argument(
+    "--repeat",
+    type=int,
+    default=3,
+    help="The number of compilations at each level",
+)
+compare_parser = subparsers.add_parser(
+    "compare", help="Compare results with a baseline"
+)
+compare_parser.add_argument("baseline", help="The baseline results")
+compare_parser.add_argument("current", help="The results to check")
+compare_parser.add_argument(
+    "--threshold",
+    type=float,
+    default=0.1,
+    help="The allowed slowdown, 0.1 means 10 percent",
+)
+compare_parser.add_argument(
+    "--statistic",
+    choices=["min", "median", "mean"],
+    default="median",
+    help="The value which is compared",
+)
+
+
+def main():
+    args = parser.parse_args()
+    level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=level, format=logformat)
+    # The compiler itself is rather talkative:
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+        logger.setLevel(logging.INFO)
+
+    if args.command == "list":
+        list_benchmarks(args)
+    elif args.command == "run":
+        run_benchmarks(args)
+    elif args.command == "levels":
+        if check_levels(args):
+            sys.exit(1)
+    else:
+        if compare_benchmarks(args):
+            sys.exit(1)
+
+
+# Entry points for pytest-benchmark:
+def pytest_generate_tests(metafunc):
+    if "micro_name" in metafunc.fixturenames:
+        metafunc.parametrize("micro_name", MicroBenchmarks.names)
+
+
+def test_micro(benchmark, micro_name):
+    micro = MicroBenchmarks("x86_64")
+    benchmark.pedantic(
+        getattr(micro, "run_" + micro_name),
+        setup=lambda: (getattr(micro, "setup_" + micro_name)(), {}),
+        rounds=5,
+    )
+
+
+def test_nos_on_riscv(benchmark):
+    corpus = corpora[0]
+    benchmark.pedantic(
+        corpus.compile, args=(corpus.locate(), "riscv"), rounds=1
+    )
+
+
+if __name__ == "__main__":
+    main()